@@ -0,0 +1,62 @@
+"""Compares the compiled kernels with the NumPy implementations on the bundled datasets scaled up 1000x. The ratings
+are normalised once, every run only recomputes the contingency tables and coincidence matrices the kernels count.
+
+    python benchmarks/kernels.py
+
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from pyirr import kappa2, kappam_light, kernels, kripp_alpha, read_data, stuart_maxwell_mh
+from pyirr.ratings import Ratings
+
+SCALE = 1000
+KERNEL_OUTPUTS = ["pairwise_tables", "coincidence_matrix"]  # intermediates counted by the kernels, cached on Ratings
+
+CASES = [
+    ("kappam_light", "diagnoses", kappam_light, {}),
+    ("kappa2", "vision", kappa2, {"weight": "squared"}),
+    ("stuart_maxwell_mh", "vision", stuart_maxwell_mh, {}),
+    ("kripp_alpha", "nmm", kripp_alpha, {"method": "ordinal"}),
+    ("kripp_alpha", "video", kripp_alpha, {"method": "interval"}),
+]
+
+
+def scaled(name):
+    """Repeats the subjects of a bundled dataset SCALE times"""
+    data = read_data(name)
+    return Ratings(pd.DataFrame(np.tile(data.values, (SCALE, 1)), columns=data.columns))
+
+
+def best_of(func, ratings, kwargs, repeat=3):
+    func(ratings, **kwargs)  # normalises the ratings
+    times = []
+    for _ in range(repeat):
+        for name in KERNEL_OUTPUTS:
+            ratings._cache.pop(name, None)
+        start = time.perf_counter()
+        value = func(ratings, **kwargs).value
+        times.append(time.perf_counter() - start)
+    return min(times), value
+
+
+def main():
+    if kernels._kernels is None:
+        raise SystemExit("The compiled kernels are not built, install Cython and run `python setup.py build_ext -i`.")
+
+    print(f"{'measure':<20}{'dataset':<12}{'subjects':>10}{'numpy (s)':>12}{'compiled (s)':>14}{'speedup':>9}")
+    for measure, name, func, kwargs in CASES:
+        ratings = scaled(name)
+        kernels.use_compiled(False)
+        numpy_time, expected = best_of(func, ratings, kwargs)
+        kernels.use_compiled(True)
+        compiled_time, value = best_of(func, ratings, kwargs)
+        assert np.isclose(value, expected)
+        print(f"{measure:<20}{name:<12}{ratings.ns:>10}{numpy_time:>12.4f}{compiled_time:>14.4f}"
+              f"{numpy_time / compiled_time:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,9 @@ class IRR_result:
     pvalue: float = None
     detail: Any = None
     error: str = None
+    conf_level: float = None
+    lower_bound: float = None
+    upper_bound: float = None
 
     def to_dict(self):
         return asdict(self)
@@ -29,6 +32,9 @@ class IRR_result:
             model_string += f"{self.stat_name:>8} = {self.statistic:.3f}\n"
             model_string += f" p-value = {self.pvalue:.3f}\n"
 
+        if self.lower_bound is not None:
+            model_string += f"{self.conf_level*100:.0f}%-CI = {self.lower_bound:.3f} - {self.upper_bound:.3f}\n"
+
         if self.detail is not None:
             model_string += f"\n{self.detail}\n"
 
@@ -1,20 +1,26 @@
 from .agree import agree
 from .bhapkar import bhapkar
+from .bootstrap import bootstrap
 from .finn import finn
-from .intraclass_correlation import intraclass_correlation
+from .grouped import grouped
+from .intraclass_correlation import ICCAccumulator, icc_reml, icc_table, intraclass_correlation
 from .iota import iota
-from .kappa2 import kappa2
-from .kappam_fleiss import kappam_fleiss
+from .kappa2 import Kappa2Accumulator, kappa2, kappa_matrix
+from .kappam_fleiss import kappam_fleiss, kappam_fleiss_batch
 from .kappam_light import kappam_light
-from .kendall import kendall
-from .kripp_alpha import kripp_alpha
+from .kendall import KendallAccumulator, kendall
+from .kripp_alpha import kripp_alpha, kripp_alpha_long
 from .maxwell import maxwell
 from .meancor import meancor
 from .meanrho import meanrho
 from .N2_cohen_kappa import N2_cohen_kappa
 from .N_cohen_kappa import N_cohen_kappa
+from .permutation import permutation_test
 from .rater_bias import rater_bias
+from .ratings import Ratings
 from .read_data import read_data
+from .report import report
 from .rel_inter_intra import rel_inter_intra
 from .robinson import robinson
+from .rolling import CoincidenceWindow, ContingencyWindow, rolling
 from .stuart_maxwell_mh import stuart_maxwell_mh
@@ -0,0 +1,75 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""Compiled counting kernels, see kernels.py for the NumPy implementations they replace"""
+import numpy as np
+
+
+def contingency_table(const Py_ssize_t[:] left, const Py_ssize_t[:] right, Py_ssize_t nlev):
+    """nlev * nlev contingency table of two vectors of integer codes"""
+    table_array = np.zeros((nlev, nlev), dtype=np.int64)
+    cdef long long[:, :] table = table_array
+    cdef Py_ssize_t s
+
+    with nogil:
+        for s in range(left.shape[0]):
+            table[left[s], right[s]] += 1
+    return table_array
+
+
+def pair_tables(const Py_ssize_t[:, :] codes, Py_ssize_t nrows, Py_ssize_t nlev):
+    """Contingency tables of the first nrows raters with all raters of a raters * subjects array of integer codes"""
+    cdef Py_ssize_t nr = codes.shape[0], ns = codes.shape[1]
+    tables_array = np.zeros((nrows, nr, nlev, nlev))
+    cdef double[:, :, :, :] tables = tables_array
+    cdef Py_ssize_t i, j, s, a, b
+
+    with nogil:
+        for i in range(nrows):
+            for j in range(i, nr):
+                for s in range(ns):
+                    tables[i, j, codes[i, s], codes[j, s]] += 1
+
+        # the tables of pairs within the block are transposes of each other
+        for i in range(nrows):
+            for j in range(i):
+                for a in range(nlev):
+                    for b in range(nlev):
+                        tables[i, j, a, b] = tables[j, i, b, a]
+    return tables_array
+
+
+def coincidence_matrix(const Py_ssize_t[:] units, const Py_ssize_t[:] codes, Py_ssize_t nval, bint normalise):
+    """Coincidence matrix of the value codes of pairable values, the values of a unit should be consecutive"""
+    cm_array = np.zeros((nval, nval))
+    cdef double[:, :] cm = cm_array
+    cdef double[:] counts = np.zeros(nval)
+    cdef Py_ssize_t[:] used = np.zeros(nval, dtype=np.intp)
+    cdef Py_ssize_t start = 0, stop, nused, k, a, b, n = units.shape[0]
+    cdef double weight
+
+    with nogil:
+        while start < n:
+            stop = start
+            nused = 0
+            while stop < n and units[stop] == units[start]:
+                if counts[codes[stop]] == 0:
+                    used[nused] = codes[stop]
+                    nused += 1
+                counts[codes[stop]] += 1
+                stop += 1
+
+            # every unit adds w_u (n_u n_u' - diag(n_u)), like irr pairs are weighted by 1 / (m_u - 1) if normalised
+            if not normalise:
+                weight = 1
+            elif stop - start > 1:
+                weight = 1. / (stop - start - 1)
+            else:
+                weight = 0
+
+            for a in range(nused):
+                for b in range(nused):
+                    cm[used[a], used[b]] += weight * counts[used[a]] * counts[used[b]]
+                cm[used[a], used[a]] -= weight * counts[used[a]]
+            for k in range(nused):
+                counts[used[k]] = 0
+            start = stop
+    return cm_array
@@ -1,7 +1,7 @@
 import numpy as np
-import pandas as pd
 
 from .IRR_result import IRR_result
+from .ratings import as_ratings
 
 
 def agree(ratings, tolerance=0, numeric=True):
@@ -17,19 +17,31 @@ def agree(ratings, tolerance=0, numeric=True):
         should data be treated as numeric or as categories
 
     """
-    ratings = pd.DataFrame(ratings)  # make sure ratings is not a list or DataFrame
-
-    ratings.dropna(inplace=True)  # drop nans
-
-    ns = ratings.shape[0]
-    nr = ratings.shape[1]
+    ratings = as_ratings(ratings)
 
     if numeric:
-        range_tab = np.max(ratings, axis=1) - np.min(ratings, axis=1)
+        values = ratings.dropna()  # drop nans
+        ns, nr = values.shape
+        range_tab = np.max(values, axis=1) - np.min(values, axis=1)
         coeff = 100 * np.sum(range_tab <= tolerance) / ns
     else:
-        range_tab = ratings.apply(lambda row: len(row.value_counts()), axis=1)
-        coeff = 100 * (np.sum(range_tab == 1) / ns)
+        codes, _ = ratings.complete_codes()
+        ns, nr = codes.shape
+        coeff = 100 * (np.sum(np.all(codes == codes[:, :1], axis=1)) / ns)  # subjects with a single category
         tolerance = 0
 
     return IRR_result(f"Percentage agreement (Tolerance={tolerance:.2f})", ns, nr, "%-agree", coeff)
+
+
+def agree_from_table(ttab, levels, tolerance=0, numeric=True):
+    """Calculates the percentage agreement of two raters from their contingency table over the (sorted) levels"""
+    ns = np.sum(ttab, axis=(-2, -1))
+    if numeric:
+        levels = np.asarray(levels, dtype=float)
+        agreeing = np.abs(levels[:, None] - levels[None, :]) <= tolerance
+    else:
+        agreeing = np.eye(len(levels), dtype=bool)
+        tolerance = 0
+    coeff = 100 * np.sum(ttab * agreeing, axis=(-2, -1)) / ns
+
+    return IRR_result(f"Percentage agreement (Tolerance={tolerance:.2f})", ns, 2, "%-agree", coeff)
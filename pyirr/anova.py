@@ -0,0 +1,166 @@
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from .backend import asarray, compute, drop_incomplete, get_namespace
+from .ratings import memoize
+
+
+@dataclass
+class AnovaSums:
+    """Sums of squares of the two-way subjects * raters ANOVA without replication"""
+    ns: int
+    nr: int
+    SS_total: float
+    SSr: float  # rows (subjects)
+    SSc: float  # columns (raters)
+    row_means: Any = None
+    col_means: Any = None
+
+    @property
+    def SSw(self):  # within rows
+        return self.SS_total - self.SSr
+
+    @property
+    def SSe(self):  # residual
+        return self.SS_total - self.SSr - self.SSc
+
+    @property
+    def MSr(self):
+        return self.SSr / (self.ns - 1)
+
+    @property
+    def MSw(self):
+        return self.SSw / (self.ns * (self.nr - 1))
+
+    @property
+    def MSc(self):
+        return self.SSc / (self.nr - 1)
+
+    @property
+    def MSe(self):
+        return self.SSe / ((self.ns - 1) * (self.nr - 1))
+
+    def compute(self):
+        """Evaluates lazy (Dask) sums of squares in one pass, row and column means stay lazy"""
+        SS_total, SSr, SSc = compute(self.SS_total, self.SSr, self.SSc)
+        return AnovaSums(self.ns, self.nr, SS_total, SSr, SSc, self.row_means, self.col_means)
+
+
+def two_way_anova(ratings, dtype=np.float64):
+    """Computes the two-way ANOVA sums of squares of a complete subjects * raters array in a fixed number of vectorized
+    reductions
+
+    Parameters
+    ----------
+    ratings: array_like
+        subjects * raters array, dataframe or Dask array without missing values
+    dtype: {np.float64, np.float32}
+        precision of the computation
+
+    Returns
+    -------
+    AnovaSums
+        sums of squares, row and column means. These are lazy for Dask arrays, see AnovaSums.compute
+
+    """
+    xp = get_namespace(ratings)
+    ratings = asarray(ratings, dtype=dtype)
+    ns, nr = ratings.shape
+
+    grand_mean = xp.mean(ratings)
+    row_means = xp.mean(ratings, axis=1)
+    col_means = xp.mean(ratings, axis=0)
+
+    centered = ratings - grand_mean
+    SS_total = xp.einsum("ij,ij->", centered, centered)
+    SSr = nr * xp.sum((row_means - grand_mean)**2)
+    SSc = ns * xp.sum((col_means - grand_mean)**2)
+
+    return AnovaSums(ns, nr, SS_total, SSr, SSc, row_means, col_means)
+
+
+def complete_anova(ratings):
+    """Computes the evaluated two-way ANOVA sums of the subjects without missing ratings, cached on Ratings so the
+    measures built on them (intraclass correlation, Finn, Robinson) share one pass"""
+    return memoize(ratings, "anova", lambda: two_way_anova(drop_incomplete(asarray(ratings, dtype=float))).compute())
+
+
+class AnovaAccumulator:
+    """Out-of-core variant of two_way_anova. Keeps the per-rater sums, sum of squares and sum of squared row sums, so
+    the sums of squares can be computed over row chunks in constant memory. Partial accumulators, e.g. from worker
+    processes, are combined with merge. Sums are kept relative to the mean of the first chunk for numerical stability.
+
+    Parameters
+    ----------
+    dtype: {np.float64, np.float32}
+        precision of the chunk reductions, the running sums are kept in float64
+
+    """
+
+    def __init__(self, dtype=np.float64):
+        self.dtype = dtype
+        self.ns = 0
+        self.nr = None
+        self.shift = 0.
+        self.col_sums = None
+        self.sum_squares = 0.
+        self.row_squares = 0.  # sum of squared row sums
+
+    @classmethod
+    def from_chunks(cls, chunks, **kwargs):
+        """Creates an accumulator from an iterable of subjects * raters row chunks"""
+        accumulator = cls(**kwargs)
+        for chunk in chunks:
+            accumulator.update(chunk)
+        return accumulator
+
+    def update(self, chunk):
+        """Adds a subjects * raters chunk (array or DataFrame), subjects with missing ratings are dropped"""
+        chunk = np.array(chunk, dtype=self.dtype)  # make sure ratings is not a list or DataFrame
+        chunk = chunk[~np.isnan(chunk).any(axis=1)]  # drop nans
+
+        if self.nr is None:
+            self.nr = chunk.shape[1]
+            self.col_sums = np.zeros(self.nr)
+            self.shift = float(np.mean(chunk)) if len(chunk) else 0.
+
+        chunk -= self.shift
+        row_sums = np.sum(chunk, axis=1)
+
+        self.ns += len(chunk)
+        self.col_sums += np.sum(chunk, axis=0)
+        self.sum_squares += float(np.einsum("ij,ij->", chunk, chunk))
+        self.row_squares += float(row_sums @ row_sums)
+        return self
+
+    def merge(self, other):
+        """Adds the statistics of another accumulator"""
+        if other.nr is None:
+            return self
+        if self.nr is None:
+            self.__dict__.update(deepcopy(other.__dict__))
+            return self
+
+        # express the sums of other relative to our shift
+        d = other.shift - self.shift
+        nr = self.nr
+        grand = np.sum(other.col_sums)
+
+        self.sum_squares += other.sum_squares + 2 * d * grand + other.ns * nr * d**2
+        self.row_squares += other.row_squares + 2 * nr * d * grand + other.ns * nr**2 * d**2
+        self.col_sums += other.col_sums + other.ns * d
+        self.ns += other.ns
+        return self
+
+    def sums(self):
+        """Returns the sums of squares of all rows seen so far, row means are not kept"""
+        ns, nr = self.ns, self.nr
+        correction = np.sum(self.col_sums)**2 / (ns * nr)
+
+        SS_total = self.sum_squares - correction
+        SSr = self.row_squares / nr - correction
+        SSc = self.col_sums @ self.col_sums / ns - correction
+        return AnovaSums(ns, nr, SS_total, SSr, SSc, col_means=self.col_sums / ns + self.shift)
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def is_lazy(array):
+    """Whether array is a Dask array, checked without importing Dask"""
+    return type(array).__module__.split(".")[:2] == ["dask", "array"]
+
+
+def get_namespace(*arrays):
+    """Returns the array module of the arrays: dask.array if any of them is a Dask array, numpy otherwise"""
+    if any(is_lazy(array) for array in arrays):
+        try:
+            import dask.array as da
+        except ImportError:
+            raise ImportError("Dask arrays need the dask package, install it with `pip install dask[array]`.")
+        return da
+    return np
+
+
+def asarray(ratings, dtype=None):
+    """Converts ratings to an array of the right namespace, Dask arrays stay lazy"""
+    if is_lazy(ratings):
+        return ratings if dtype is None else ratings.astype(dtype)
+    return np.asarray(ratings, dtype=dtype)
+
+
+def drop_incomplete(ratings):
+    """Drops subjects with missing ratings. For Dask arrays the mask is evaluated once, the number of complete subjects
+    is needed for the degrees of freedom."""
+    xp = get_namespace(ratings)
+    complete = ~xp.isnan(ratings).any(axis=1)
+    if xp is np:
+        return ratings if complete.all() else ratings[complete]  # no copy when nothing is missing
+
+    ratings = ratings[complete]
+    ratings.compute_chunk_sizes()
+    return ratings
+
+
+def compute(*values):
+    """Evaluates lazy values in a single pass over the data (with the active Dask scheduler, e.g. a local or
+    distributed cluster), NumPy values are returned as they are"""
+    if any(is_lazy(value) for value in values):
+        import dask
+        return dask.compute(*values)
+    return values
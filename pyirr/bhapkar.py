@@ -1,8 +1,9 @@
 import numpy as np
-import pandas as pd
 from scipy.stats import chi2
 
 from .IRR_result import IRR_result
+from .kappa2 import contingency_tables
+from .ratings import as_ratings
 
 
 def bhapkar(ratings):
@@ -19,26 +20,21 @@ def bhapkar(ratings):
         Bhapkar statistics in an IRR_result dataclass
 
     """
-    ratings = pd.DataFrame(ratings)  # make sure ratings is a DataFrame
+    ratings = as_ratings(ratings)
 
-    ratings.dropna(axis=0, inplace=True)
-
-    ns = ratings.shape[0]
     nr = ratings.shape[1]
 
     if nr > 2:
         raise ValueError("Number of raters exceeds 2. Try kappam_fleiss or kappam_light")
 
-    r1, r2 = ratings.iloc[:, 0], ratings.iloc[:, 1]
-
-    # find factor levels
-    levels = np.unique(ratings)
+    # compute table of the subjects without missing ratings over the levels they use
+    tables, _ = contingency_tables(ratings)
+    return bhapkar_from_table(tables[0, 1], nr)
 
-    r1 = pd.Categorical(r1, categories=levels)
-    r2 = pd.Categorical(r2, categories=levels)
 
-    # compute table
-    ttab = pd.crosstab(r1, r2, dropna=False)
+def bhapkar_from_table(ttab, nr=2):
+    """Computes Bhapkar's test from the contingency table of two raters over the levels used by either of them"""
+    ns = int(np.sum(ttab))
 
     # get marginals
     row_sums = ttab.sum(axis=1)[:-1]
@@ -52,7 +48,7 @@ def bhapkar(ratings):
     np.fill_diagonal(delta, row_sums + col_sums)
 
     # dump last category from smx table
-    smx = ttab.iloc[:-1, :-1]
+    smx = ttab[:-1, :-1]
 
     # compute w matrix
     w = delta - smx - smx.T - (dmat * dmat.T) / ns
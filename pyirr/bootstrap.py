@@ -0,0 +1,255 @@
+from dataclasses import replace
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import norm
+
+from .agree import agree
+from .anova import AnovaSums
+from .finn import finn
+from .kappa2 import kappa_from_tables, weight_table
+from .kappam_fleiss import category_counts, kappam_fleiss
+from .kappam_light import kappam_light
+from .meancor import meancor
+from .ratings import as_ratings
+from .robinson import robinson
+
+
+def fleiss_estimator(totals):
+    """Fleiss' Kappa from the summed subject statistics [pairable, agreement, category counts]"""
+    agreeP = totals[:, 1] / totals[:, 0]
+    pj = totals[:, 2:] / np.sum(totals[:, 2:], axis=1, keepdims=True)
+    chanceP = np.sum(pj**2, axis=1)
+    return (agreeP - chanceP) / (1 - chanceP)
+
+
+def fleiss_statistics(ratings, exact=False, detail=False, counts=False):
+    if exact or counts:
+        return None
+    ttab, _, _ = category_counts(ratings)
+    ni = np.sum(ttab, axis=1)
+    pairable = ni > 1
+    agree_i = np.where(pairable, (np.sum(ttab**2, axis=1) - ni) / np.where(pairable, ni * (ni - 1), 1), 0)
+    return np.column_stack([pairable, agree_i, ttab * pairable[:, None]]), fleiss_estimator
+
+
+def light_estimator(npairs, nlev, totals):
+    """Light's Kappa from the summed one-hot cells of the contingency table of every rater pair"""
+    tables = np.asarray(totals).reshape((-1, npairs, nlev, nlev))
+    return np.mean(kappa_from_tables(tables, weight_table("unweighted", nlev))[0], axis=1)
+
+
+def light_statistics(ratings):
+    codes, lev = as_ratings(ratings).complete_codes()
+    ns, nr = codes.shape
+    nlev = len(lev)
+    first, second = np.triu_indices(nr, k=1)
+    npairs = len(first)
+
+    cells = codes[:, first] * nlev + codes[:, second] + nlev**2 * np.arange(npairs)
+    stats = sparse.csr_matrix((np.ones(cells.size), (np.repeat(np.arange(ns), npairs), cells.ravel())),
+                              shape=(ns, npairs * nlev**2))
+    return stats, partial(light_estimator, npairs, nlev)
+
+
+def meancor_estimator(nr, fisher, totals):
+    """Mean correlation from the summed moments [1, x, x x^T] of every subject"""
+    n = totals[:, :1]
+    mean = totals[:, 1:nr + 1] / n
+    cov = totals[:, nr + 1:].reshape((-1, nr, nr)) / n[:, :, None] - mean[:, :, None] * mean[:, None, :]
+    sd = np.sqrt(np.einsum("bii->bi", cov))
+
+    first, second = np.triu_indices(nr, k=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.clip(cov[:, first, second] / (sd[:, first] * sd[:, second]), -1, 1)
+        if not fisher:
+            return np.mean(r, axis=1)
+        rz = np.where((r < 1) & (r > -1), np.arctanh(r), np.nan)  # perfect correlations are dropped
+        return np.tanh(np.nanmean(rz, axis=1))
+
+
+def meancor_statistics(ratings, fisher=True):
+    ratings = np.array(ratings, dtype=float)
+    ratings = ratings[~np.isnan(ratings).any(axis=1)]
+    ratings = ratings - np.mean(ratings, axis=0)  # correlations do not change, moments are better conditioned
+    ns, nr = ratings.shape
+    outer = np.einsum("si,sj->sij", ratings, ratings).reshape((ns, nr * nr))
+    return np.column_stack([np.ones(ns), ratings, outer]), partial(meancor_estimator, nr, fisher)
+
+
+def anova_sums(nr, totals):
+    """Two-way ANOVA sums of squares from the summed [1, row sum, squared row sum, sum of squares, ratings] of every
+    subject"""
+    ns = totals[:, 0]
+    correction = totals[:, 1]**2 / (ns * nr)
+    SS_total = totals[:, 3] - correction
+    SSr = totals[:, 2] / nr - correction
+    SSc = np.sum(totals[:, 4:]**2, axis=1) / ns - correction
+    return AnovaSums(ns, nr, SS_total, SSr, SSc)
+
+
+def anova_statistics(ratings):
+    ratings = np.asarray(ratings, dtype=float)
+    ratings = ratings[~np.isnan(ratings).any(axis=1)]
+    ratings = ratings - np.mean(ratings)  # sums of squares do not change, sums are better conditioned
+    row_sums = np.sum(ratings, axis=1)
+    return np.column_stack([np.ones(len(ratings)), row_sums, row_sums**2, np.sum(ratings**2, axis=1), ratings])
+
+
+def robinson_estimator(nr, totals):
+    sums = anova_sums(nr, totals)
+    return sums.SSr / (sums.SSr + sums.SSe)
+
+
+def robinson_statistics(ratings):
+    stats = anova_statistics(ratings)
+    return stats, partial(robinson_estimator, stats.shape[1] - 4)
+
+
+def finn_estimator(nr, s_levels, model, totals):
+    sums = anova_sums(nr, totals)
+    MSexp = 1 / 12 * (s_levels**2 - 1)
+    return 1 - (sums.MSw if model == "oneway" else sums.MSe) / MSexp
+
+
+def finn_statistics(ratings, s_levels, model):
+    stats = anova_statistics(ratings)
+    return stats, partial(finn_estimator, stats.shape[1] - 4, s_levels, model)
+
+
+def agree_estimator(totals):
+    return 100 * totals[:, 0] / totals[:, 1]
+
+
+def agree_statistics(ratings, tolerance=0, numeric=True):
+    ratings = as_ratings(ratings)
+    if numeric:
+        agreement = np.ptp(ratings.dropna().astype(float), axis=1) <= tolerance
+    else:
+        codes, _ = ratings.complete_codes()
+        agreement = np.all(codes == codes[:, :1], axis=1)
+    return np.column_stack([agreement, np.ones(len(agreement))]), agree_estimator
+
+
+STATISTICS = {
+    kappam_fleiss: fleiss_statistics,
+    kappam_light: light_statistics,
+    meancor: meancor_statistics,
+    robinson: robinson_statistics,
+    finn: finn_statistics,
+    agree: agree_statistics,
+}
+
+
+def register_statistics(func, prepare):
+    """Registers per-subject sufficient statistics for a measure
+
+    Parameters
+    ----------
+    func: callable
+        the measure, e.g. robinson
+    prepare: callable
+        called as prepare(ratings, **kwargs) and returns a subjects * statistics array (or sparse matrix) and an
+        estimator that maps a resamples * statistics array of weighted column sums to the coefficient of every
+        resample. It may return None for arguments it does not support, the measure is called for every resample then.
+
+    """
+    STATISTICS[func] = prepare
+
+
+def generic_estimator(func, ratings, kwargs, draws):
+    """Calls the measure on every resample, used for measures without sufficient statistics"""
+    subsets = (ratings.iloc[draw] if isinstance(ratings, pd.DataFrame) else ratings[draw] for draw in draws)
+    return np.array([func(subset, **kwargs).value for subset in subsets], dtype=float)
+
+
+def bootstrap(func, ratings, B=1000, conf_level=0.95, ci="percentile", seed=None, chunk_size=None, **kwargs):
+    """Computes a bootstrap confidence interval by resampling subjects with replacement. Measures with registered
+    sufficient statistics (kappam_fleiss, kappam_light, meancor, robinson, finn and agree) are computed from the
+    statistics of every subject once, a resample is then a weighted sum of these statistics and a batch of resamples
+    a single matrix product.
+
+    Parameters
+    ----------
+    func: callable
+        a measure that returns an IRR_result or ICC_result
+    ratings: array_like
+        subjects * raters array or dataframe
+    B: int
+        number of bootstrap resamples
+    conf_level: float
+        confidence level of the interval
+    ci: {"percentile", "bca"}
+        percentile interval or bias-corrected and accelerated interval (Efron, 1987), the acceleration is estimated
+        with the jackknife
+    seed: int
+        seed for the random number generator
+    chunk_size: int
+        number of resamples drawn at once, by default limited to ~4 million subject draws and summed statistics per
+        chunk
+    kwargs:
+        further arguments of func
+
+    Returns
+    -------
+    IRR_result
+        the result of func with conf_level, lower_bound and upper_bound of the bootstrap interval
+
+    """
+    if ci not in ("percentile", "bca"):
+        raise ValueError("ci should be either 'percentile' or 'bca'.")
+
+    result = func(ratings, **kwargs)
+    prepare = STATISTICS.get(func)
+    prepared = prepare(ratings, **kwargs) if prepare is not None else None
+
+    if prepared is None:
+        data = ratings if isinstance(ratings, pd.DataFrame) else np.asarray(ratings)
+        ns = data.shape[0]
+        estimator = partial(generic_estimator, func, data, kwargs)
+    else:
+        stats, estimator = prepared
+        ns = stats.shape[0]
+
+    if chunk_size is None:
+        # a chunk draws chunk_size * ns subjects and sums chunk_size * statistics columns
+        width = 1 if prepared is None else stats.shape[1]
+        chunk_size = max(1, min(B, 2**22 // max(ns, width, 1)))
+
+    rng = np.random.default_rng(seed)
+    replicates = []
+    for start in range(0, B, chunk_size):
+        size = min(chunk_size, B - start)
+        draws = rng.integers(0, ns, size=(size, ns))
+        if prepared is None:
+            replicates.append(estimator(draws))
+        else:
+            draws = draws + ns * np.arange(size)[:, None]
+            weights = np.bincount(draws.ravel(), minlength=size * ns).reshape((size, ns)).astype(float)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                replicates.append(estimator(np.asarray(weights @ stats)))
+    replicates = np.concatenate(replicates)
+
+    alpha = 1 - conf_level
+    quantiles = np.array([alpha / 2, 1 - alpha / 2])
+
+    if ci == "bca":
+        if prepared is None:
+            jackknife = estimator(np.delete(np.tile(np.arange(ns), (ns, 1)), np.arange(ns) * (ns + 1)).reshape(
+                (ns, ns - 1)))
+        else:
+            dense = stats.toarray() if sparse.issparse(stats) else stats
+            with np.errstate(divide="ignore", invalid="ignore"):
+                jackknife = estimator(np.sum(dense, axis=0) - dense)
+
+        ties = np.isclose(replicates, result.value)
+        z0 = norm.ppf(np.mean((replicates < result.value) & ~ties) + np.mean(ties) / 2)
+        deviations = np.nanmean(jackknife) - jackknife
+        acceleration = np.nansum(deviations**3) / (6 * np.nansum(deviations**2)**1.5)
+        z = norm.ppf(quantiles)
+        quantiles = norm.cdf(z0 + (z0 + z) / (1 - acceleration * (z0 + z)))
+
+    lower, upper = np.nanquantile(replicates, quantiles)
+    return replace(result, conf_level=conf_level, lower_bound=lower, upper_bound=upper)
@@ -0,0 +1,104 @@
+import numpy as np
+from scipy.stats import norm, rankdata
+
+from .backend import asarray, drop_incomplete, get_namespace
+from .parallel import SharedArray, row_blocks, run_shared
+from .ratings import memoize
+
+BLOCK_SIZE = 128  # raters per block of cross products, the blocks do not depend on n_jobs
+
+
+def cross_block(centered, rows):
+    """Cross products of the raters in rows with themselves and all later raters"""
+    return centered[:, rows].T @ centered[:, rows.start:]
+
+
+def cross_products(centered, n_jobs=1):
+    """Computes centered.T @ centered. Panels of more than BLOCK_SIZE raters are computed in blocks of rows of the
+    upper triangle, in-process or in n_jobs processes that share centered, so the result does not depend on n_jobs."""
+    nr = centered.shape[1]
+    if nr <= BLOCK_SIZE:
+        return centered.T @ centered
+
+    blocks = row_blocks(nr, BLOCK_SIZE)
+    if n_jobs == 1:
+        parts = [cross_block(centered, rows) for rows in blocks]
+    else:
+        with SharedArray(centered) as shared:
+            parts = run_shared(cross_block, shared.handle, blocks, n_jobs)
+
+    products = np.empty((nr, nr))
+    for rows, part in zip(blocks, parts):
+        products[rows, rows.start:] = part
+    lower = np.tril_indices(nr, k=-1)
+    products[lower] = products.T[lower]
+    return products
+
+
+def correlation_matrix(ratings, method="pearson", n_jobs=1):
+    """Computes the raters * raters correlation matrix with a single matrix product, in blocks for large panels
+
+    Parameters
+    ----------
+    ratings: np.ndarray
+        subjects * raters array or Dask array without missing values
+    method: {"pearson", "spearman"}
+        for Spearman's rho every column is ranked once (average ranks for ties), Dask arrays are rechunked to whole
+        columns for the ranking
+    n_jobs: int
+        number of processes for the cross products of large NumPy panels, results do not depend on n_jobs
+
+    Returns
+    -------
+    np.ndarray
+        raters * raters correlation matrix, lazy for Dask arrays
+
+    """
+    xp = get_namespace(ratings)
+    ratings = asarray(ratings, dtype=float)
+    if method == "spearman":
+        if xp is np:
+            ratings = rankdata(ratings, axis=0)
+        else:
+            ratings = ratings.rechunk({0: -1}).map_blocks(rankdata, axis=0, dtype=float)
+
+    centered = ratings - xp.mean(ratings, axis=0)
+    norms = xp.sqrt(xp.einsum("ij,ij->j", centered, centered))
+
+    products = centered.T @ centered if xp is not np else cross_products(centered, n_jobs)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = products / (norms[:, None] * norms[None, :])
+    return xp.clip(r, -1, 1)
+
+
+def complete_correlation(ratings, method="pearson", n_jobs=1):
+    """Computes the evaluated correlation matrix of the subjects without missing ratings and their number, cached on
+    Ratings"""
+    def compute():
+        values = drop_incomplete(asarray(ratings, dtype=float))
+        return np.asarray(correlation_matrix(values, method, n_jobs)), values.shape[0]
+    return memoize(ratings, f"correlation_{method}", compute)
+
+
+def fisher_average(r, ns):
+    """Averages correlation coefficients after Fisher z-standardization, perfect correlations are dropped
+
+    Returns
+    -------
+    tuple
+        mean correlation, z, p-value and the number of dropped correlations
+
+    """
+    delr = len(r) - len(r[(r < 1) & (r > -1)])
+    # Eliminate perfect correlations (r=1, r=-1)
+    r = r[(r < 1) & (r > -1)]
+
+    rz = 0.5 * np.log((1 + r) / (1 - r))
+    mrz = np.mean(rz)
+
+    coeff = (np.exp(2 * mrz) - 1) / (np.exp(2 * mrz) + 1)
+    SE = np.sqrt(1 / (ns - 3))
+
+    u = coeff / SE
+    pvalue = 2 * (1 - norm.cdf(np.abs(u)))
+    return coeff, u, pvalue, delr
@@ -1,6 +1,6 @@
-import numpy as np
 from scipy.stats import f
 
+from .anova import complete_anova
 from .IRR_result import IRR_result
 
 
@@ -26,18 +26,12 @@ def finn(ratings, s_levels, model):
     if model not in ("oneway", "twoway"):
         raise ValueError("Model should be either 'oneway' or 'twoway'.")
 
-    ratings = np.array(ratings)  # make sure ratings is not a list or DataFrame
+    sums = complete_anova(ratings)  # subjects with missing ratings are dropped
+    ns = sums.ns
+    nr = sums.nr
 
-    ratings = ratings[~np.isnan(ratings).any(axis=1)]  # drop nans
-
-    ns = ratings.shape[0]
-    nr = ratings.shape[1]
-
-    SS_total = np.cov(ratings.ravel()) * (ns * nr - 1)
-    MSr = np.cov(np.mean(ratings, axis=1)) * nr
-    MSw = np.sum(np.apply_along_axis(np.cov, axis=1, arr=ratings) / ns)
-    MSc = np.apply_along_axis(np.cov, axis=0, arr=np.mean(ratings, axis=0)) * ns
-    MSe = (SS_total - MSr * (ns - 1) - MSc * (nr - 1)) / ((ns - 1) * (nr - 1))
+    MSw = sums.MSw
+    MSe = sums.MSe
 
     MSexp = 1 / 12 * (s_levels**2 - 1)
 
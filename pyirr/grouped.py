@@ -0,0 +1,303 @@
+import inspect
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .agree import agree
+from .anova import AnovaSums
+from .intraclass_correlation import icc_from_anova, intraclass_correlation
+from .kappa2 import kappa2, kappa_from_tables, weight_table
+from .kappam_fleiss import fleiss_from_counts, kappam_fleiss
+from .kripp_alpha import METRICS, alpha_from_coincidences, kripp_alpha, unit_coincidences
+from .report import MEASURES, RESULT_COLUMNS, result_row
+
+
+@dataclass
+class Segments:
+    """Long ratings sorted by group, subject and rater. Subjects and raters are numbered consecutively within groups,
+    so every group is a contiguous segment of the ratings, the subjects and the raters."""
+    ngroups: int
+    keys: Any  # label of every group
+    unit: np.ndarray  # subject of every rating (numbered across groups)
+    rater: np.ndarray  # rater of every rating within its group
+    values: np.ndarray  # rating, missing ratings are dropped
+    unit_group: np.ndarray  # group of every subject
+    ns: np.ndarray  # number of subjects of every group
+    nr: np.ndarray  # number of raters of every group
+
+    @property
+    def group(self):
+        """Group of every rating"""
+        return self.unit_group[self.unit]
+
+    def complete(self):
+        """Mask of the ratings of subjects rated by all raters of their group"""
+        m = np.bincount(self.unit, minlength=len(self.unit_group))
+        return (m == self.nr[self.unit_group])[self.unit]
+
+    def codes(self):
+        """Codes of the sorted distinct ratings and the ratings"""
+        codes, levels = pd.factorize(self.values, sort=True)
+        return codes, np.asarray(levels)
+
+    def wide(self, group):
+        """subjects * raters array of one group, missing ratings are NaN"""
+        units = np.flatnonzero(self.unit_group == group)
+        rows = slice(*np.searchsorted(self.unit, [units[0], units[-1] + 1])) if len(units) else slice(0, 0)
+        values = self.values[rows]
+        array = np.full((len(units), self.nr[group]), np.nan, dtype=float if values.dtype.kind in "biuf" else object)
+        array[self.unit[rows] - (units[0] if len(units) else 0), self.rater[rows]] = values
+        return array
+
+
+def segments(df, by, subject="subject", rater="rater", value="value"):
+    """Sorts long ratings once and numbers subjects and raters within groups
+
+    Parameters
+    ----------
+    df: DataFrame
+        one row per rating
+    by: str or list
+        column(s) of the groups, rows with missing group labels are dropped
+    subject, rater, value: str
+        column names of the subjects, raters and ratings
+
+    Returns
+    -------
+    Segments
+        the sorted ratings
+
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    grouper = df.groupby(by, sort=True)
+    groups = grouper.ngroup().to_numpy()
+    keys = grouper.size().index
+    ngroups = len(keys)
+
+    labelled = groups >= 0
+    groups = groups[labelled]
+    subjects, _ = pd.factorize(df[subject].to_numpy()[labelled], sort=True)
+    raters, _ = pd.factorize(df[rater].to_numpy()[labelled], sort=True)
+    values = df[value].to_numpy()[labelled]
+
+    # subjects and raters of a group get consecutive numbers, the group order is kept
+    units, unit_keys = pd.factorize(groups * (subjects.max(initial=0) + 1) + subjects, sort=True)
+    raters, rater_keys = pd.factorize(groups * (raters.max(initial=0) + 1) + raters, sort=True)
+    unit_group = np.empty(len(unit_keys), dtype=np.intp)
+    unit_group[units] = groups
+    rater_group = np.empty(len(rater_keys), dtype=np.intp)
+    rater_group[raters] = groups
+    first_rater = np.searchsorted(rater_group, np.arange(ngroups))
+
+    order = np.lexsort((raters, units))
+    units, raters, values, groups = units[order], raters[order], values[order], groups[order]
+    if np.any((units[1:] == units[:-1]) & (raters[1:] == raters[:-1])):
+        raise ValueError("Every rater should rate a subject only once within a group.")
+
+    observed = ~pd.isna(values)
+    raters = raters - first_rater[groups]
+    return Segments(ngroups, keys, units[observed], raters[observed], values[observed], unit_group,
+                    np.bincount(unit_group, minlength=ngroups), np.bincount(rater_group, minlength=ngroups))
+
+
+def fleiss_segments(seg, exact=False, detail=False, counts=False):
+    """Fleiss' Kappa of every group from one stacked subject * category count table"""
+    if exact or detail or counts:
+        return None
+    codes, levels = seg.codes()
+    nlev = len(levels)
+    ttab = np.bincount(seg.unit * nlev + codes, minlength=len(seg.unit_group) * nlev).reshape((-1, nlev))
+    _, value, u, pvalue = fleiss_from_counts(ttab, seg.unit_group, seg.ngroups)
+    return {"method": "Fleiss` Kappa for m Raters", "subjects": seg.ns, "raters": seg.nr, "irr_name": "Kappa",
+            "value": value, "statistic": u, "stat_name": "z", "pvalue": pvalue}
+
+
+def kappa2_segments(seg, weight, sort_levels=False):
+    """Cohen's Kappa of every group of two raters from one stacked table, unweighted Kappa does not depend on levels
+    that are missing in a group"""
+    if not isinstance(weight, str) or weight != "unweighted":
+        return None
+    complete = seg.complete() & (seg.nr == 2)[seg.group]
+    codes, levels = seg.codes()
+    nlev = len(levels)
+
+    # ratings of complete subjects come in (first rater, second rater) pairs
+    first, second = codes[complete][0::2], codes[complete][1::2]
+    cells = seg.group[complete][0::2] * nlev**2 + first * nlev + second
+    tables = np.bincount(cells, minlength=seg.ngroups * nlev**2).reshape((seg.ngroups, nlev, nlev))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value, u, pvalue = kappa_from_tables(tables, weight_table(weight, nlev))
+
+    error = np.where(seg.nr > 2, "Number of raters exceeds 2. Try kappam_fleiss or kappam_light", None)
+    error = np.where(seg.nr < 2, "Cohen's Kappa needs 2 raters", error)
+    valid = seg.nr == 2
+    return {"method": f"Cohen's Kappa for 2 Raters (Weights: {weight})",
+            "subjects": np.where(valid, np.sum(tables, axis=(1, 2)), seg.ns).astype(int), "raters": seg.nr,
+            "irr_name": "Kappa", "value": np.where(valid, value, np.nan), "statistic": np.where(valid, u, np.nan),
+            "stat_name": "z", "pvalue": np.where(valid, pvalue, np.nan), "error": error}
+
+
+def agree_segments(seg, tolerance=0, numeric=True):
+    """Percentage agreement of every group from the range of the ratings of every complete subject"""
+    complete = seg.complete()
+    ratings = seg.values[complete].astype(float) if numeric else seg.codes()[0][complete]
+    units = seg.unit[complete]
+    starts = np.flatnonzero(np.diff(units, prepend=-1))
+    groups = seg.unit_group[units[starts]]
+
+    if len(starts):
+        agreement = np.maximum.reduceat(ratings, starts) - np.minimum.reduceat(ratings, starts) <= tolerance
+    else:
+        agreement = np.zeros(0, dtype=bool)
+    ns = np.bincount(groups, minlength=seg.ngroups)
+    tolerance = tolerance if numeric else 0
+    return {"method": f"Percentage agreement (Tolerance={tolerance:.2f})", "subjects": ns, "raters": seg.nr,
+            "irr_name": "%-agree", "value": 100 * np.bincount(groups, weights=agreement, minlength=seg.ngroups) / ns}
+
+
+def kripp_segments(seg, method="nominal", n_boot=0, conf_level=0.95, alpha_min=0.667, seed=None, n_jobs=1):
+    """Krippendorff's alpha of every group from the coincidences of every subject. Metrics that depend on the range of
+    the values of a group (circular, bipolar, custom metrics) are computed group by group."""
+    if n_boot or method not in ("nominal", "ordinal", "interval", "ratio"):
+        return None
+    values = seg.values.astype(float)
+    levx, codes = np.unique(values, return_inverse=True)
+    nunits, nval = len(seg.unit_group), len(levx)
+
+    # like the dense path, pairs are only weighted by 1 / (m_u - 1) in groups with missing ratings
+    mu = np.bincount(seg.unit, minlength=nunits)
+    normalise = (np.bincount(seg.group, minlength=seg.ngroups) < seg.ns * seg.nr)[seg.unit_group]
+    weights = np.where(normalise, np.divide(1, mu - 1, out=np.zeros(nunits), where=mu > 1), 1)
+
+    contributions = unit_coincidences(seg.unit, codes, nunits, nval, normalise=False)
+    membership = sparse.csr_matrix((weights, (seg.unit_group, np.arange(nunits))), shape=(seg.ngroups, nunits))
+    cm = np.asarray((membership @ contributions).todense()).reshape((seg.ngroups, nval, nval))
+    marginals = np.sum(cm, axis=2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = alpha_from_coincidences(cm, np.sum(cm, axis=(1, 2)), METRICS[method](levx, marginals))
+    nvalues = np.count_nonzero(np.bincount(seg.group * nval + codes, minlength=seg.ngroups * nval).reshape(
+        (seg.ngroups, nval)), axis=1)
+    return {"method": f"Krippendorff's alpha ({method})", "subjects": seg.ns, "raters": seg.nr, "irr_name": "alpha",
+            "value": np.where(nvalues < 2, 1., value)}
+
+
+def icc_segments(seg, model="oneway", mtype="consistency", unit="single", r0=0, conf_level=0.95, missing="drop"):
+    """Intraclass correlation of every group from the ANOVA sums of squares of all groups, computed with segment sums
+    of the centered ratings"""
+    if missing != "drop":
+        return None
+    complete = seg.complete()
+    ratings = seg.values[complete].astype(float)
+    units, raters, groups = seg.unit[complete], seg.rater[complete], seg.group[complete]
+    nunits, maxnr = len(seg.unit_group), max(seg.nr.max(initial=0), 1)
+
+    ns = np.bincount(seg.unit_group[np.unique(units)], minlength=seg.ngroups)
+    nr = seg.nr
+    with np.errstate(divide="ignore", invalid="ignore"):
+        centered = ratings - (np.bincount(groups, weights=ratings, minlength=seg.ngroups) / (ns * nr))[groups]
+        SS_total = np.bincount(groups, weights=centered**2, minlength=seg.ngroups)
+        SSr = np.bincount(seg.unit_group, weights=np.bincount(units, weights=centered, minlength=nunits)**2,
+                          minlength=seg.ngroups) / nr
+        col_sums = np.bincount(groups * maxnr + raters, weights=centered, minlength=seg.ngroups * maxnr)
+        SSc = np.sum(col_sums.reshape((seg.ngroups, maxnr))**2, axis=1) / ns
+
+    columns = {column: np.full(seg.ngroups, np.nan, dtype=object) for column in RESULT_COLUMNS}
+    for size in np.unique(nr):  # the name of the ICC depends on the number of raters
+        rows = nr == size
+        sums = AnovaSums(ns[rows], size, SS_total[rows], SSr[rows], SSc[rows])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = icc_from_anova(sums, model, mtype, unit, r0, conf_level)
+        columns["method"][rows] = f"Intraclass correlation ({model}, {mtype}, {result.name})"
+        columns["irr_name"][rows] = result.name
+        columns["stat_name"][rows] = [f"F({df1:.0f},{df2:.0f})" for df1, df2 in
+                                      np.broadcast(result.df1, result.df2)]
+        for column, values in [("subjects", ns[rows]), ("raters", size), ("value", result.value),
+                               ("statistic", result.Fvalue), ("pvalue", result.pvalue),
+                               ("lower_bound", result.lower_bound), ("upper_bound", result.upper_bound)]:
+            columns[column][rows] = values
+    return columns
+
+
+SEGMENTED = {
+    kappam_fleiss: fleiss_segments,
+    kappa2: kappa2_segments,
+    agree: agree_segments,
+    kripp_alpha: kripp_segments,
+    intraclass_correlation: icc_segments,
+}
+
+
+def register_segmented(func, segmented):
+    """Registers a segmented version of a measure for grouped
+
+    Parameters
+    ----------
+    func: callable
+        the measure, e.g. kappa2
+    segmented: callable
+        called as segmented(segments, **kwargs) with the sorted Segments of all groups and returns a dict with an array
+        (or a single value) for every result column (see report), e.g. value, subjects and raters. It may return None
+        for arguments it does not support, the measure is called for every group then.
+
+    """
+    SEGMENTED[func] = segmented
+
+
+def degenerate(error):
+    """Whether a measure failed because it does not apply to the ratings of a group (e.g. too few raters or equal
+    marginals), the measures raise ValueError or a plain Exception then"""
+    return isinstance(error, (ValueError, ZeroDivisionError)) or type(error) is Exception
+
+
+def grouped(df, by, subject="subject", rater="rater", value="value", measure="kappam_fleiss", **kwargs):
+    """Computes an agreement or reliability measure for every group of long format ratings, e.g. per annotation batch,
+    site or week. The ratings are sorted once, measures with a segmented version (kappam_fleiss, unweighted kappa2,
+    agree, kripp_alpha and intraclass_correlation) are then computed for all groups at once with segment sums of
+    stacked count tables, other measures are called with the subjects * raters array of every group.
+
+    Parameters
+    ----------
+    df: DataFrame
+        one row per rating with group, subject, rater and value columns
+    by: str or list
+        column(s) of the groups
+    subject, rater, value: str
+        column names of the subjects, raters and ratings
+    measure: str or callable
+        name of the measure (see report) or a function that returns an IRR_result or ICC_result
+    kwargs:
+        further arguments of the measure
+
+    Returns
+    -------
+    DataFrame
+        one row per group with the coefficient, test statistic, p-value and error message of the measure
+
+    """
+    func = MEASURES.get(measure) if isinstance(measure, str) else measure
+    if func is None:
+        raise ValueError(f"Unknown measure '{measure}', choose one of {', '.join(MEASURES)} or pass a function.")
+
+    seg = segments(df, by, subject, rater, value)
+    segmented = SEGMENTED.get(func)
+    columns = segmented(seg, **kwargs) if segmented is not None else None
+
+    if columns is None:
+        # the arguments are checked once, so a wrong keyword raises instead of filling every group with an error
+        inspect.signature(func).bind(None, **kwargs)
+        rows = []
+        for group in range(seg.ngroups):
+            try:
+                row = result_row(func(seg.wide(group), **kwargs))
+            except Exception as error:
+                if not degenerate(error):
+                    raise
+                row = {"subjects": seg.ns[group], "raters": seg.nr[group], "value": np.nan, "error": str(error)}
+            rows.append(row)
+        return pd.DataFrame(rows, index=seg.keys, columns=RESULT_COLUMNS)
+
+    return pd.DataFrame(columns, index=seg.keys).reindex(columns=RESULT_COLUMNS).infer_objects()
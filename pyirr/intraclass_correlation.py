@@ -1,7 +1,11 @@
 import numpy as np
-from scipy.stats import f
+import pandas as pd
+from scipy.stats import f, norm
 from dataclasses import dataclass, asdict
 
+from .anova import AnovaAccumulator, complete_anova
+from .reml import fit_variance_components, subject_f_test
+
 
 @dataclass
 class ICC_result:
@@ -35,7 +39,48 @@ class ICC_result:
         return model_string
 
 
-def intraclass_correlation(ratings, model="oneway", mtype="consistency", unit="single", r0=0, conf_level=0.95):
+ICC_FORMS = [("oneway", "consistency"), ("twoway", "consistency"), ("twoway", "agreement")]
+
+
+class ICCAccumulator(AnovaAccumulator):
+    """Keeps the sufficient statistics of the subjects * raters ANOVA (per-rater sums, sum of squares and sum of squared
+    row sums) so the intraclass correlation can be computed over row chunks in constant memory. Partial accumulators,
+    e.g. from worker processes, are combined with merge.
+
+    Examples
+    --------
+    >>> accumulator = ICCAccumulator.from_chunks(chunks)
+    >>> accumulator.result("twoway", "agreement")
+
+    """
+
+    def result(self, model="oneway", mtype="consistency", unit="single", r0=0, conf_level=0.95):
+        """Calculates the intraclass correlation for all ratings seen so far, see intraclass_correlation
+
+        Returns
+        -------
+        ICC_result
+            The intraclass correlation statistics in an ICC_result dataclass.
+
+        """
+        return icc_from_anova(self.sums(), model, mtype, unit, r0, conf_level)
+
+    def table(self, r0=0, conf_level=0.95):
+        """Calculates all six intraclass correlations for all ratings seen so far, see icc_table"""
+        return icc_table_from_anova(self.sums(), r0, conf_level)
+
+
+def icc_table_from_anova(sums, r0=0, conf_level=0.95):
+    results = [icc_from_anova(sums, model, mtype, unit, r0, conf_level)
+               for unit in ("single", "average") for model, mtype in ICC_FORMS]
+
+    columns = ["model", "mtype", "value", "Fvalue", "df1", "df2", "pvalue", "lower_bound", "upper_bound"]
+    table = pd.DataFrame([result.to_dict() for result in results], index=[result.name for result in results])
+    return table[columns]
+
+
+def intraclass_correlation(ratings, model="oneway", mtype="consistency", unit="single", r0=0, conf_level=0.95,
+                           missing="drop"):
     """Calculate the intraclass correlation for a set of ratings
 
     Parameters
@@ -52,6 +97,9 @@ def intraclass_correlation(ratings, model="oneway", mtype="consistency", unit="s
         specification of the null hypothesis
     conf_level: float
         confidence level
+    missing: {"drop", "reml"}
+        whether subjects with missing ratings are dropped, or all observed ratings are used to fit the variance
+        components by REML (see icc_reml)
 
     Returns
     -------
@@ -59,19 +107,33 @@ def intraclass_correlation(ratings, model="oneway", mtype="consistency", unit="s
         The intraclass correlation statistics in an ICC_result dataclass.
 
     """
-    ratings = np.array(ratings)  # make sure ratings is not a list or DataFrame
+    if missing == "reml":
+        ratings = np.asarray(ratings, dtype=float)
+        subjects, raters = np.nonzero(~np.isnan(ratings))
+        return icc_reml(subjects, raters, ratings[subjects, raters], model, mtype, unit, r0, conf_level)
 
-    alpha = 1 - conf_level
-    ratings = ratings[~np.isnan(ratings).any(axis=1)]  # drop nans
+    return icc_from_anova(complete_anova(ratings), model, mtype, unit, r0, conf_level)  # drops subjects with nans
 
-    ns = ratings.shape[0]
-    nr = ratings.shape[1]
 
-    SS_total = np.cov(np.ravel(ratings)) * (ns * nr - 1)
-    MSr = np.cov(np.mean(ratings, axis=1)) * nr
-    MSw = np.sum(np.apply_along_axis(np.cov, axis=1, arr=ratings) / ns)
-    MSc = np.apply_along_axis(np.cov, axis=0, arr=np.mean(ratings, axis=0)) * ns
-    MSe = (SS_total - MSr * (ns - 1) - MSc * (nr - 1)) / ((ns - 1) * (nr - 1))
+def icc_from_anova(sums, model="oneway", mtype="consistency", unit="single", r0=0, conf_level=0.95):
+    """Calculates the intraclass correlation from the sums of squares of the subjects * raters ANOVA
+
+    Parameters
+    ----------
+    sums: AnovaSums
+        sums of squares from two_way_anova or AnovaAccumulator
+    model, mtype, unit, r0, conf_level:
+        see intraclass_correlation
+
+    Returns
+    -------
+    ICC_result
+        The intraclass correlation statistics in an ICC_result dataclass.
+
+    """
+    alpha = 1 - conf_level
+    ns, nr = sums.ns, sums.nr
+    MSr, MSw, MSc, MSe = sums.MSr, sums.MSw, sums.MSc, sums.MSe
 
     if unit == "single":
         if model == "oneway":  # Assendorpf & Wallbot, S. 245, ICu, Bartko (1966) [3]
@@ -173,3 +235,85 @@ def intraclass_correlation(ratings, model="oneway", mtype="consistency", unit="s
                 ubound = (ns * (FU * MSr - MSe)) / (MSc - MSe + ns * FU * MSr)
 
     return ICC_result(ns, nr, model, mtype, name, coeff, r0, Fvalue, df1, df2, pvalue, conf_level, lbound, ubound)
+
+
+def icc_reml(subjects, raters, values, model="oneway", mtype="consistency", unit="single", r0=0, conf_level=0.95):
+    """Calculates the intraclass correlation for incomplete designs from variance components fitted by REML. Cost
+    scales with the number of observed ratings instead of subjects * raters.
+
+    The average unit refers to the mean number of ratings per subject (k). The F-test of the subject effect (adjusted
+    for raters in the twoway model) only supports r0 = 0 and the confidence interval is a delta method interval on the
+    logit scale.
+
+    Parameters
+    ----------
+    subjects, raters: array_like
+        subject and rater label of every observed rating
+    values: array_like
+        observed ratings
+    model, mtype, unit, r0, conf_level:
+        see intraclass_correlation
+
+    Returns
+    -------
+    ICC_result
+        The intraclass correlation statistics in an ICC_result dataclass.
+
+    """
+    if r0 != 0:
+        raise ValueError("The F-test of the REML intraclass correlation only supports r0 = 0.")
+
+    subjects, _ = pd.factorize(np.asarray(subjects))
+    raters, _ = pd.factorize(np.asarray(raters))
+    ns, nr = subjects.max() + 1, raters.max() + 1
+    twoway = model == "twoway"
+
+    theta, covariance, design = fit_variance_components(subjects, raters, values, ns, nr, twoway)
+    k = design.n / ns
+
+    def icc(theta):
+        variances = np.exp(theta)
+        var_s, var_e = variances[0], variances[-1]
+        var_r = variances[1] if twoway and mtype == "agreement" else 0
+        if unit == "single":
+            return var_s / (var_s + var_r + var_e)
+        return var_s / (var_s + (var_r + var_e) / k)
+
+    coeff = icc(theta)
+
+    # delta method on the logit scale
+    step = 1e-6
+    logit = lambda t: np.log(icc(t) / (1 - icc(t)))
+    gradient = np.array([(logit(theta + step * e) - logit(theta - step * e)) / (2 * step) for e in np.eye(len(theta))])
+    se = np.sqrt(gradient @ covariance @ gradient)
+    z = norm.ppf(1 - (1 - conf_level) / 2)
+    lbound, ubound = 1 / (1 + np.exp(-(logit(theta) + np.array([-z, z]) * se)))
+
+    Fvalue, df1, df2 = subject_f_test(design, twoway)
+    pvalue = 1 - f.cdf(Fvalue, df1, df2)
+
+    size = "1" if unit == "single" else f"{k:.3g}"
+    name = f"ICC({size})" if not twoway else f"ICC({'C' if mtype == 'consistency' else 'A'},{size})"
+    return ICC_result(ns, nr, model, mtype, name, coeff, r0, Fvalue, df1, df2, pvalue, conf_level, lbound, ubound)
+
+
+def icc_table(ratings, r0=0, conf_level=0.95):
+    """Calculates ICC(1), ICC(k), ICC(C,1), ICC(C,k), ICC(A,1) and ICC(A,k) from a single computation of the mean
+    squares
+
+    Parameters
+    ----------
+    ratings: array_like
+        subjects * raters array or dataframe
+    r0: int
+        specification of the null hypothesis
+    conf_level: float
+        confidence level
+
+    Returns
+    -------
+    DataFrame
+        coefficient, F-value, degrees of freedom, p-value and confidence interval of every form
+
+    """
+    return icc_table_from_anova(complete_anova(ratings), r0, conf_level)  # drops subjects with nans
@@ -1,9 +1,8 @@
-from copy import deepcopy
-
 import numpy as np
-import pandas as pd
 
+from .anova import two_way_anova
 from .IRR_result import IRR_result
+from .ratings import as_ratings
 
 
 def iota(ratings, scale_data="quantitative", standardize=False):
@@ -24,11 +23,8 @@ def iota(ratings, scale_data="quantitative", standardize=False):
     IRR_result
         Returns iota as an IRR_result dataclass.
     """
-    ratings = deepcopy(ratings)
     detail = None
-    for i, rating in enumerate(ratings):
-        rating = pd.DataFrame(rating)
-        ratings[i] = rating.dropna()
+    ratings = [as_ratings(rating).dropna() for rating in ratings]  # views of the inputs when nothing is missing
 
     ns = ratings[0].shape[0]
     nr = ratings[0].shape[1]
@@ -41,13 +37,13 @@ def iota(ratings, scale_data="quantitative", standardize=False):
                 x = np.ravel(rating)
                 ratings[i] = (rating - x.mean()) / x.std()
             detail = "Variables have been z-standardized before the computation"
-        ratinglist = [np.array(rating) for rating in ratings]  # Take original as new rating-structure
+        ratinglist = ratings  # Take original as new rating-structure
     elif scale_data == "nominal":
         ratinglist = []
         dummyn = 0
         for i, rating in enumerate(ratings):
             # How many levels were used?
-            levels = np.unique(rating.values)
+            levels = np.unique(rating)
 
             for level in levels:
                 # Build new rating-structure
@@ -61,12 +57,10 @@ def iota(ratings, scale_data="quantitative", standardize=False):
     doSS, deSS = 0, 0
 
     for rating in ratinglist:
-        SSt = np.cov(rating.ravel()) * (ns * nr - 1)
-        SSw = np.sum(np.apply_along_axis(np.cov, 1, rating) / ns) * ns * (nr - 1)
-        SSc = np.cov(np.mean(rating, 0)) * ns * (nr - 1)
+        sums = two_way_anova(rating)
 
-        doSS = doSS + SSw
-        deSS = deSS + ((nr - 1) * SSt + SSc)
+        doSS = doSS + sums.SSw
+        deSS = deSS + ((nr - 1) * sums.SS_total + sums.SSc)
 
     coeff = 1 - (nr * doSS) / deSS
 
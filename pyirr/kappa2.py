@@ -1,9 +1,135 @@
 import numpy as np
 import pandas as pd
-from pandas.api.types import is_numeric_dtype
 from scipy.stats import norm
 
+from .backend import drop_incomplete, get_namespace, is_lazy
 from .IRR_result import IRR_result
+from .kernels import contingency_table, pair_tables
+from .ratings import as_ratings
+
+
+def level_codes(block, levels):
+    codes = np.searchsorted(levels, block)
+    codes[np.isnan(block)] = -1
+    return codes
+
+
+def factorize(ratings):
+    """Factorizes a subjects * raters array into integer codes of the sorted levels, missing values get code -1. The
+    levels of a (numeric) Dask array are computed, its codes stay lazy."""
+    if is_lazy(ratings):
+        levels = np.unique(ratings[~get_namespace(ratings).isnan(ratings)].compute())
+        return ratings.map_blocks(level_codes, levels, dtype=np.intp), levels
+
+    ratings = np.asarray(ratings)
+    codes, levels = pd.factorize(ratings.ravel(), sort=True)
+    return codes.reshape(ratings.shape), np.asarray(levels)
+
+
+def weight_table(weight, nc):
+    """Builds the nc * nc agreement weights for {"unweighted", "equal", "squared"} or a vector of own weights"""
+    if not isinstance(weight, str):
+        w = 1 - (np.asarray(weight) - min(weight)) / (max(weight) - min(weight))
+    elif weight == "equal":
+        w = np.arange((nc-1), -1, -1) / (nc-1)
+    elif weight == "squared":
+        w = 1 - np.arange(0, nc, 1)**2 / (nc-1)**2
+    elif weight == "unweighted":
+        w = np.zeros(nc)
+        w[0] = 1
+    else:
+        raise ValueError("Weight should be 'unweighted', 'equal', 'squared' or a vector of weights.")
+
+    nw = len(w)
+    wvec = np.append(np.sort(w), w[1:])
+    weight_tab = np.zeros((nw, nw))
+
+    for i in range(nw):
+        weight_tab[i, :] = wvec[(nw - i - 1):(2 * nw - i - 1)]
+    return weight_tab
+
+
+def pairwise_tables(codes, nlev, block_size=2**16):
+    """Computes the contingency table of every pair of raters with one tensor contraction of the one-hot ratings, or
+    with the compiled kernel when it is available (see kernels.use_compiled)
+
+    Parameters
+    ----------
+    codes: array_like
+        subjects * raters integer codes, subjects with missing values (code -1) should be dropped beforehand
+    nlev: int
+        number of levels
+    block_size: int
+        number of subjects that are one-hot encoded at the same time, Dask arrays are contracted chunk by chunk
+
+    Returns
+    -------
+    np.ndarray
+        raters * raters * levels * levels array of contingency tables, lazy for Dask arrays
+
+    """
+    xp = get_namespace(codes)
+    if xp is not np:
+        onehot = (codes[:, :, None] == np.arange(nlev)).astype(float)
+        return xp.einsum("sil,sjm->ijlm", onehot, onehot)
+
+    codes = np.asarray(codes)
+    return pair_tables(codes, slice(0, codes.shape[1]), nlev, block_size)
+
+
+def contingency_tables(ratings):
+    """Contingency tables of every pair of raters over the subjects without missing ratings, and the levels these
+    subjects use. The tables are cached on Ratings, numeric Dask arrays are contracted chunk by chunk."""
+    if is_lazy(ratings):
+        codes, levels = factorize(drop_incomplete(ratings.astype(float)))
+        return np.asarray(pairwise_tables(codes, len(levels))), levels
+
+    ratings = as_ratings(ratings)
+    codes, levels = ratings.complete_codes()
+    return ratings.cached("pairwise_tables", lambda: pairwise_tables(codes, len(levels))), levels
+
+
+def trim_table(ttab):
+    """Drops the levels a rater did not use from a contingency table"""
+    return ttab[np.sum(ttab, axis=1) > 0][:, np.sum(ttab, axis=0) > 0]
+
+
+def crosstab(ratings):
+    """Contingency table of two raters with the levels each of them used, like pd.crosstab of the two columns"""
+    tables, _ = contingency_tables(ratings)
+    return trim_table(tables[0, 1])
+
+
+def kappa_from_tables(ttab, weight_tab):
+    """Computes (weighted) Cohen's Kappa, z and p-value for contingency tables, leading dimensions are broadcast"""
+    ttab = np.asarray(ttab, dtype=float)
+    ns = np.sum(ttab, axis=(-2, -1))
+    nsx = ns[..., None]  # for broadcasting against marginals
+
+    agreeP = np.sum(ttab * weight_tab, axis=(-2, -1)) / ns
+
+    tm1 = np.sum(ttab, -1)
+    tm2 = np.sum(ttab, -2)
+
+    eij = tm1[..., :, None] * tm2[..., None, :] / nsx[..., None]
+    chanceP = np.sum(eij * weight_tab, axis=(-2, -1)) / ns
+
+    # Kappa for 2 raters
+    value = (agreeP - chanceP) / (1 - chanceP)
+
+    # Compute statistics
+    wi = (tm2 / nsx) @ weight_tab
+    wj = (tm1 / nsx) @ weight_tab.T
+
+    var_matrix = (eij / nsx[..., None]) * (weight_tab - (wi[..., :, None] + wj[..., None, :])) ** 2
+
+    var_kappa = (np.sum(var_matrix, axis=(-2, -1)) - chanceP ** 2) / (ns * (1 - chanceP) ** 2)
+
+    SE_kappa = np.sqrt(var_kappa)
+    u = value / SE_kappa
+
+    pvalue = 2 * (1 - norm.cdf(abs(u)))
+    return value, u, pvalue
 
 
 def kappa2(ratings, weight, sort_levels=False):
@@ -16,79 +142,128 @@ def kappa2(ratings, weight, sort_levels=False):
     weight: {"unweighted", "equal", "squared"} or array_like
         either a character string specifying one predefined set of weights or a numeric vector with own weights.
     sort_levels: bool
+        levels are always sorted, kept for compatibility with irr
 
     Returns
     -------
     IRR_result
         Returns Cohen's Kappa as an IRR_result dataclass.
     """
-    ratings = pd.DataFrame(ratings)  # make sure ratings is a DataFrame
-
-    ratings.dropna(inplace=True)
-
-    ns = ratings.shape[0]
+    ratings = ratings if is_lazy(ratings) else as_ratings(ratings)
     nr = ratings.shape[1]
 
     if nr > 2:
         raise Exception("Number of raters exceeds 2. Try kappam_fleiss or kappam_light")
 
-    r1, r2 = ratings.iloc[:, 0], ratings.iloc[:, 1]
+    tables, _ = contingency_tables(ratings)
+    return kappa2_from_table(tables[0, 1], weight)
 
-    if is_numeric_dtype(r1) or is_numeric_dtype(r2):
-        sort_levels = True
 
-    levels = np.unique(ratings)
+def kappa2_from_table(ttab, weight):
+    """Computes Cohen's Kappa from the contingency table of two raters over the levels used by either of them"""
+    ns = int(np.sum(ttab))  # subjects without missing ratings
+    value, u, pvalue = kappa_from_tables(ttab, weight_table(weight, len(ttab)))
 
-    if sort_levels:
-        levels = np.sort(levels)
+    method = f"Cohen's Kappa for 2 Raters (Weights: {weight})"
+    return IRR_result(method, ns, 2, "Kappa", value, u, "z", pvalue)
 
-    r1 = pd.Categorical(r1, categories=levels)
-    r2 = pd.Categorical(r2, categories=levels)
 
-    ttab = pd.crosstab(r1, r2, dropna=False).values
-    nc = ttab.shape[1]
+def kappa_matrix(ratings, weight="unweighted"):
+    """Computes Cohen's Kappa between every pair of raters. Weights are defined on the levels used by all raters.
 
-    if not isinstance(weight, str):
-        w = 1 - (np.asarray(weight) - min(weight)) / (max(weight) - min(weight))
-    elif weight == "equal":
-        w = np.arange((nc-1), -1, -1) / (nc-1)
-    elif weight == "squared":
-        w = 1 - np.arange(0, nc, 1)**2 / (nc-1)**2
-    elif weight == "unweighted":
-        w = np.zeros(nc)
-        w[0] = 1
+    Parameters
+    ----------
+    ratings: array_like
+        subjects * raters array or dataframe
+    weight: {"unweighted", "equal", "squared"} or array_like
+        either a character string specifying one predefined set of weights or a numeric vector with own weights.
 
-    nw = len(w)
-    wvec = np.append(np.sort(w), w[1:])
-    weight_tab = np.zeros((nw, nw))
+    Returns
+    -------
+    DataFrame
+        raters * raters matrix of Kappas
 
-    for i in range(nw):
-        weight_tab[i, :] = wvec[(nw - i - 1):(2 * nw - i - 1)]
+    """
+    ratings = as_ratings(ratings)
 
-    agreeP = np.sum(ttab * weight_tab) / ns
+    tables, levels = contingency_tables(ratings)
+    value, _, _ = kappa_from_tables(tables, weight_table(weight, len(levels)))
 
-    tm1 = np.sum(ttab, 1)
-    tm2 = np.sum(ttab, 0)
+    return pd.DataFrame(value, index=ratings.columns, columns=ratings.columns)
 
-    eij = np.outer(tm1, tm2) / ns
-    chanceP = np.sum(eij * weight_tab) / ns
 
-    # Kappa for 2 raters
-    value = (agreeP - chanceP) / (1 - chanceP)
+class Kappa2Accumulator:
+    """Accumulates the contingency table of two raters over chunks of ratings, so Cohen's Kappa can be computed over
+    data that does not fit in memory. Memory is O(c^2) for c categories.
 
-    # Compute statistics
-    wi = np.sum(np.broadcast_to(tm2/ns, (nc, nc)).T * weight_tab, 0)
-    wj = np.sum(np.repeat(tm1/ns, nc).reshape((nc, nc)).T * weight_tab, 1)
+    Parameters
+    ----------
+    weight: {"unweighted", "equal", "squared"} or array_like
+        either a character string specifying one predefined set of weights or a numeric vector with own weights.
+    levels: array_like
+        known levels, new levels are added when they are encountered
+
+    Examples
+    --------
+    >>> accumulator = Kappa2Accumulator("squared")
+    >>> for chunk in chunks:
+    ...     accumulator.update(chunk)
+    >>> accumulator.result()
 
-    var_matrix = (eij / ns) * (weight_tab - np.sum(np.meshgrid(wi, wj), axis=0).T) ** 2
+    """
 
-    var_kappa = (np.sum(var_matrix) - chanceP ** 2) / (ns * (1 - chanceP) ** 2)
+    def __init__(self, weight="unweighted", levels=None):
+        self.weight = weight
+        self.levels = []
+        self.lookup = {}
+        self.table = np.zeros((0, 0), dtype=np.int64)
+        if levels is not None:
+            self.add_levels(levels)
 
-    SE_kappa = np.sqrt(var_kappa)
-    u = value / SE_kappa
+    def add_levels(self, levels):
+        """Adds new levels and returns the table index of every level"""
+        new = [level for level in levels if level not in self.lookup]
+        for level in new:
+            self.lookup[level] = len(self.levels)
+            self.levels.append(level)
 
-    pvalue = 2 * (1 - norm.cdf(abs(u)))
+        if new:
+            table = np.zeros((len(self.levels), len(self.levels)), dtype=np.int64)
+            table[:len(self.table), :len(self.table)] = self.table
+            self.table = table
+        return np.array([self.lookup[level] for level in levels], dtype=int)
 
-    # return kappa2_result(ns, nr, value, u, p_value, weight)
-    method = f"Cohen's Kappa for 2 Raters (Weights: {weight})"
-    return IRR_result(method, ns, nr, "Kappa", value, u, "z", pvalue)
+    def update(self, chunk):
+        """Adds a subjects * 2 chunk (array or DataFrame) of ratings, subjects with missing ratings are dropped"""
+        codes, levels = as_ratings(chunk).complete_codes()
+
+        if codes.shape[1] > 2:
+            raise Exception("Number of raters exceeds 2. Try kappam_fleiss or kappam_light")
+
+        index = self.add_levels(levels)[codes]
+
+        nc = len(self.levels)
+        self.table += contingency_table(index[:, 0], index[:, 1], nc)
+        return self
+
+    def merge(self, other):
+        """Adds the contingency table of another accumulator"""
+        index = self.add_levels(other.levels)
+        self.table[np.ix_(index, index)] += other.table
+        return self
+
+    def result(self):
+        """Computes Cohen's Kappa for all ratings seen so far
+
+        Returns
+        -------
+        IRR_result
+            Returns Cohen's Kappa as an IRR_result dataclass.
+
+        """
+        order = np.argsort(self.levels)
+        ttab = self.table[np.ix_(order, order)]
+        value, u, pvalue = kappa_from_tables(ttab, weight_table(self.weight, len(order)))
+
+        method = f"Cohen's Kappa for 2 Raters (Weights: {self.weight})"
+        return IRR_result(method, int(np.sum(ttab)), 2, "Kappa", value, u, "z", pvalue)
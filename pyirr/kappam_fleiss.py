@@ -1,23 +1,169 @@
+import os
+
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from scipy.stats import norm
 
 from .IRR_result import IRR_result
+from .ratings import as_ratings
+
+
+def category_counts(ratings):
+    """Builds the subject * category count table (and the rater * category table) from factorized ratings
+
+    Parameters
+    ----------
+    ratings: array_like
+        subjects * raters array, dataframe or Ratings, missing values are not counted
+
+    Returns
+    -------
+    tuple
+        subject * category counts, rater * category counts and the sorted categories, cached on Ratings
+
+    """
+    ratings = as_ratings(ratings)
+
+    def compute():
+        ns, nr = ratings.shape
+
+        codes, lev = ratings.factorize()
+        nlev = len(lev)
+        missing = codes < 0
+
+        # cell index of every rating, missing ratings are counted in an extra bin that is dropped
+        cells = codes + (np.arange(ns) * nlev)[:, None]
+        cells[missing] = ns * nlev
+        ttab = np.bincount(cells.ravel(), minlength=ns * nlev + 1)[:ns * nlev].reshape((ns, nlev))
+
+        np.add(codes, (np.arange(nr) * nlev)[None, :], out=cells)
+        cells[missing] = nr * nlev
+        rtab = np.bincount(cells.ravel(), minlength=nr * nlev + 1)[:nr * nlev].reshape((nr, nlev))
+        return ttab, rtab, np.asarray(lev)
+    return ratings.cached("category_counts", compute)
+
+
+def read_counts(counts):
+    """Reads a subject * category count table from an array, DataFrame, sparse matrix or .npy file
+
+    Returns
+    -------
+    tuple
+        count table (dense, memory-mapped or sparse) and the categories
+
+    """
+    if isinstance(counts, (str, os.PathLike)):
+        counts = np.load(counts, mmap_mode="r")
+
+    if isinstance(counts, pd.DataFrame):
+        return counts.values, np.asarray(counts.columns)
+    if sparse.issparse(counts):
+        counts = sparse.csr_matrix(counts)
+    else:
+        counts = np.asarray(counts)
+    return counts, np.arange(counts.shape[1])
+
+
+def row_sums(ttab, square=False):
+    if sparse.issparse(ttab):
+        return np.asarray((ttab.multiply(ttab) if square else ttab).sum(axis=1), dtype=float).ravel()
+    return np.einsum("ij,ij->i", ttab, ttab, dtype=float) if square else np.sum(ttab, axis=1, dtype=float)
+
+
+def fleiss_from_counts(ttab, groups=None, ngroups=1):
+    """Computes Fleiss' Kappa, z and p-value for one or more groups of subjects from a subject * category count table.
+    The number of raters may vary between subjects (Fleiss' unbalanced form), subjects with less than two ratings are
+    ignored.
+
+    Parameters
+    ----------
+    ttab: array_like or sparse matrix
+        subject * category count table
+    groups: array_like
+        group (task) index of every subject, all subjects belong to a single group by default
+    ngroups: int
+        number of groups
+
+    Returns
+    -------
+    tuple
+        arrays with the number of subjects, Kappa, z and p-value of every group
+
+    """
+    nsubj = ttab.shape[0]
+    groups = np.zeros(nsubj, dtype=int) if groups is None else np.asarray(groups)
+
+    ni = row_sums(ttab)
+    pairable = ni > 1
+    npair = np.where(pairable, ni * (ni - 1), 1)
+
+    # observed agreement per subject, averaged within groups
+    agree_i = np.where(pairable, (row_sums(ttab, square=True) - ni) / npair, 0)
+    ns = np.bincount(groups, weights=pairable, minlength=ngroups)
+    agreeP = np.bincount(groups, weights=agree_i, minlength=ngroups) / ns
+
+    # category proportions per group
+    membership = sparse.csr_matrix((pairable.astype(float), (groups, np.arange(nsubj))), shape=(ngroups, nsubj))
+    totals = membership @ ttab
+    totals = totals.toarray() if sparse.issparse(totals) else np.asarray(totals, dtype=float)
+    pj = totals / np.sum(totals, axis=1, keepdims=True)
+    qj = 1 - pj
+    chanceP = np.sum(pj**2, axis=1)
+
+    value = (agreeP - chanceP) / (1 - chanceP)
+
+    # ns * nr * (nr - 1) when every subject has nr ratings
+    npairs = np.bincount(groups, weights=np.where(pairable, npair, 0), minlength=ngroups)
+    pq = np.sum(pj * qj, axis=1)
+    varkappa = (2 / (pq**2 * npairs)) * (pq**2 - np.sum(pj * qj * (qj - pj), axis=1))
+    u = value / np.sqrt(varkappa)
+    pvalue = 2 * (1 - norm.cdf(np.abs(u)))
+
+    return ns.astype(int), value, u, pvalue
+
+
+def category_kappas(ttab, lev):
+    """Computes the category-wise Kappas, z and p-values from a subject * category count table"""
+    ni = row_sums(ttab)
+    pairable = (ni > 1).astype(float)
+
+    totals = np.asarray(ttab.T @ pairable, dtype=float).ravel()
+    squares = ttab.multiply(ttab) if sparse.issparse(ttab) else np.square(ttab, dtype=float)
+    agreeing = np.asarray(squares.T @ pairable, dtype=float).ravel() - totals  # sum of n_ij * (n_ij - 1)
+    possible = np.asarray(ttab.T @ (pairable * (ni - 1)), dtype=float).ravel()  # sum of n_ij * (n_i - 1)
+
+    pj = totals / np.sum(totals)
+    pjk = agreeing / possible
+
+    kappaK = (pjk - pj) / (1 - pj)
+
+    varkappaK = 2 / np.sum(pairable * ni * (ni - 1))
+    SEkappaK = np.sqrt(varkappaK)
+
+    uK = kappaK / SEkappaK
+    p_valueK = 2 * (1 - norm.cdf(np.abs(uK)))
+
+    tableK = pd.DataFrame([kappaK, uK, p_valueK], columns=lev, index=["Kappa", "z", "p.value"])
+    return tableK.round(3).T
 
 
-def kappam_fleiss(ratings, exact=False, detail=False):
+def kappam_fleiss(ratings, exact=False, detail=False, counts=False):
     """Computes Fleiss' Kappa as an index of interrater agreement between m raters on categorical data. Additionally,
     category-wise Kappas could be computed.
 
     Parameters
     ----------
     ratings: array_like
-        subjects * raters array or dataframe
+        subjects * raters array or dataframe, or a subjects * categories count table when counts is True
     exact: bool
         a boolean indicating whether the exact Kappa (Conger, 1980) or the Kappa described by Fleiss (1971) should be
         computed.
     detail: bool
         a boolean indicating whether category-wise Kappas should be computed
+    counts: bool
+        a boolean indicating whether ratings is a count table (array, DataFrame, sparse matrix or path to a .npy file
+        that is memory-mapped). The number of raters may differ between subjects.
 
     Returns
     -------
@@ -25,62 +171,74 @@ def kappam_fleiss(ratings, exact=False, detail=False):
         Returns Fleiss' Kappa as an IRR_result dataclass.
 
    """
-    ratings = pd.DataFrame(ratings)
-    ns = ratings.shape[0]
-    nr = ratings.shape[1]
-
-    lev = np.unique(ratings)
-
-    ttab = ratings.apply(lambda row: pd.Categorical(row, lev).value_counts(), axis=1)
-
-    ttab = ttab.values
-
-    agreeP = np.sum((np.sum(ttab**2, axis=1) - nr) / (nr * (nr - 1)) / ns)
+    if counts:
+        if exact:
+            raise ValueError("The exact Kappa needs the ratings of every rater and cannot be computed from counts.")
+        ttab, lev = read_counts(ratings)
+        ni = row_sums(ttab)
+        ns = int(np.sum(ni > 1))
+        nr = int(np.max(ni))
+    else:
+        ratings = as_ratings(ratings)
+        ns = ratings.shape[0]
+        nr = ratings.shape[1]
+        ttab, rtab, lev = category_counts(ratings)
 
     if exact:
         method = "Fleiss` Kappa for m Raters (exact value)"
-        rtab = ratings.apply(lambda col: pd.Categorical(col, lev).value_counts(), axis=0)
-        rtab /= ns
+        agreeP = np.sum((np.sum(ttab**2, axis=1) - nr) / (nr * (nr - 1)) / ns)
 
-        cov = np.apply_along_axis(np.cov, 1, rtab)
+        rtab = rtab.T / ns
+        cov = np.var(rtab, axis=1, ddof=1)
         chanceP = np.sum(np.sum(ttab, axis=0)**2) / (ns * nr)**2 - np.sum(cov * (nr - 1) / nr) / (nr - 1)
-    else:
-        method = "Fleiss` Kappa for m Raters"
-        chanceP = np.sum(np.sum(ttab, axis=0)**2) / (ns * nr)**2
-
-    value = (agreeP - chanceP) / (1 - chanceP)
 
-    if not exact:
-        pj = np.sum(ttab, axis=0) / (ns * nr)
-        qj = 1 - pj
+        value = (agreeP - chanceP) / (1 - chanceP)
+        return IRR_result(method, ns, nr, "Kappa", value)
 
-        varkappa = (2 / (sum(pj * qj)**2 * (ns * nr * (nr - 1)))) * (sum(pj * qj)**2 - sum(pj * qj * (qj - pj)))
-        SEkappa = np.sqrt(varkappa)
+    method = "Fleiss` Kappa for m Raters"
+    _, value, u, pvalue = fleiss_from_counts(ttab)
+    tableK = category_kappas(ttab, lev) if detail else None
 
-        u = value/SEkappa
-        pvalue = 2 * (1 - norm.cdf(np.abs(u)))
+    return IRR_result(method, ns, nr, "Kappa", value[0], u[0], "z", pvalue[0], detail=tableK)
 
-        if detail:
-            pj = np.sum(ttab, axis=0) / (ns * nr)
-            pjk = (np.sum(ttab**2, axis=0) - ns * nr * pj) / (ns * nr * (nr - 1) * pj)
 
-            kappaK = (pjk - pj) / (1 - pj)
+def kappam_fleiss_batch(ratings, task="task", subject="subject", value="value"):
+    """Computes Fleiss' Kappa for many tasks at once from a single count tensor.
 
-            varkappaK = 2 / (ns * nr * (nr-1))
-            SEkappaK = np.sqrt(varkappaK)
-
-            uK = kappaK / SEkappaK
-            p_valueK = 2 * (1 - norm.cdf(np.abs(uK)))
-
-            tableK = pd.DataFrame([kappaK, uK, p_valueK], columns=lev, index=["Kappa", "z", "p.value"])
-            tableK = tableK.round(3).T
+    Parameters
+    ----------
+    ratings: array_like or DataFrame
+        tasks * subjects * raters array, or a long DataFrame with one row per rating and task, subject and value
+        columns
+    task, subject, value: str
+        column names used when ratings is a DataFrame
 
-    rval = {"method": method, "subjects": ns, "raters": nr, "irr_name": "Kappa", "value": value}
+    Returns
+    -------
+    DataFrame
+        number of subjects, Kappa, z and p-value for every task
+
+    """
+    if isinstance(ratings, pd.DataFrame):
+        tasks, task_labels = pd.factorize(ratings[task])
+        subjects, _ = pd.factorize(ratings[subject])
+        subjects, _ = pd.factorize(tasks * (subjects.max() + 1) + subjects)  # subjects within tasks
+        codes, _ = pd.factorize(ratings[value], sort=True)
+        groups = np.zeros(subjects.max() + 1, dtype=int)
+        groups[subjects] = tasks
+    else:
+        ratings = np.asarray(ratings)
+        ntasks, ns, nr = ratings.shape
+        task_labels = np.arange(ntasks)
+        codes, _ = pd.factorize(ratings.ravel(), sort=True)
+        subjects = np.repeat(np.arange(ntasks * ns), nr)
+        groups = np.repeat(np.arange(ntasks), ns)
 
-    if not exact:
-        if detail:
-            rval = {**rval, "detail": tableK}
+    observed = codes >= 0
+    codes, subjects = codes[observed], subjects[observed]
+    nsubjects, nlev = len(groups), codes.max() + 1
 
-        rval = {**rval, "stat_name": "z", "statistic": u, "pvalue": pvalue}
+    ttab = np.bincount(subjects * nlev + codes, minlength=nsubjects * nlev).reshape((nsubjects, nlev))
+    ns, kappa, u, pvalue = fleiss_from_counts(ttab, groups, len(task_labels))
 
-    return IRR_result(**rval)
+    return pd.DataFrame({"subjects": ns, "Kappa": kappa, "z": u, "p.value": pvalue}, index=task_labels)
@@ -1,19 +1,24 @@
 import numpy as np
-import pandas as pd
-from scipy.special import comb
 from scipy.stats import norm
 
-from .kappa2 import kappa2
+from .backend import is_lazy
+from .kappa2 import contingency_tables, kappa_from_tables, weight_table
 from .IRR_result import IRR_result
+from .kernels import pair_tables
+from .parallel import SharedArray, row_blocks, run_shared
+from .ratings import as_ratings
 
 
-def kappam_light(ratings):
+def kappam_light(ratings, n_jobs=1):
     """Computes Light's Kappa as an index of interrater agreement between m raters on categorical data.
 
     Parameters
     ----------
     ratings: array_like
         subjects * raters array or dataframe
+    n_jobs: int
+        number of processes that count the contingency tables of blocks of rater pairs, the subjects * raters codes are
+        shared with them. The counts are exact, so results match the serial computation bit for bit.
 
     Returns
     -------
@@ -21,42 +26,42 @@ def kappam_light(ratings):
         Returns Light's Kappa as an IRR_result dataclass.
 
    """
-    ratings = pd.DataFrame(ratings)
+    ratings = ratings if is_lazy(ratings) else as_ratings(ratings)
     ns = ratings.shape[0]
     nr = ratings.shape[1]
 
-    ratings.dropna(inplace=True)  # drop nans
+    pairs = np.triu_indices(nr, k=1)
+    if n_jobs == 1 or nr < 2 or is_lazy(ratings):
+        tables, lev = contingency_tables(ratings)  # tables of the subjects without missing ratings
+        pair_tabs = tables[pairs]
+        rtab = np.einsum("iill->il", tables)  # raters * levels marginals
+    else:
+        codes, lev = ratings.complete_codes()
+        blocks = row_blocks(nr, -(-nr // (2 * n_jobs)))  # blocks of rows of the upper triangle with as many pairs
+        with SharedArray(codes) as shared:
+            parts = run_shared(pair_tables, shared.handle, blocks, n_jobs, len(lev))
 
-    kappas = []
-    for i in range(nr - 1):
-        for j in range(i + 1, nr):
-            kappas.append(kappa2(ratings.iloc[:, [i, j]], weight="unweighted").value)
+        pair_tabs = np.empty((len(pairs[0]), len(lev), len(lev)))
+        rtab = np.empty((nr, len(lev)))
+        for rows, part in zip(blocks, parts):
+            block = (pairs[0] >= rows.start) & (pairs[0] < rows.stop)
+            pair_tabs[block] = part[pairs[0][block] - rows.start, pairs[1][block] - rows.start]
+            rtab[rows] = np.einsum("iill->il", part[:, :rows.stop - rows.start])
+    levlen = len(lev)
+
+    kappas, _, _ = kappa_from_tables(pair_tabs, weight_table("unweighted", levlen))
 
     value = np.mean(kappas)
 
     # Variance & Computation of p-value
-    lev = np.unique(ratings)
-    levlen = len(lev)
-
-    dis = []
-    disrater = []
-    for nri in range(nr - 1):
-        for nrj in range(nri + 1, nr):
-            for i in range(levlen):
-                for j in range(levlen):
-                    if i != j:
-                        r1i = np.sum(ratings.iloc[:, nri] == lev[i])
-                        r2j = np.sum(ratings.iloc[:, nrj] == lev[j])
-                        dis.append(r1i * r2j)
-            disrater.append(np.sum(dis))
-            dis = []  # reset dis
+    # disagreeing combinations of the marginals of every rater pair: sum over i != j of r1_i * r2_j
+    disrater = np.outer(rtab.sum(axis=1), rtab.sum(axis=1)) - rtab @ rtab.T
 
-    prod = 1
-    for i in disrater:
-        prod *= int(i)  # numpy overflows here so we need a Python int
-    B = len(disrater) * prod
+    # B / ns**(2 * npairs) in log space, the product overflows even Python floats for large panels
+    with np.errstate(divide="ignore"):
+        log_ratio = np.sum(np.log(disrater[pairs]) - 2 * np.log(ns))
 
-    chanceP = 1 - B / ns**(comb(nr, 2) * 2)
+    chanceP = 1 - len(pairs[0]) * np.exp(log_ratio)
     varkappa = chanceP / (ns * (1 - chanceP))
 
     SEkappa = np.sqrt(varkappa)
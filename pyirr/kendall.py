@@ -1,14 +1,77 @@
 import numpy as np
-import pandas as pd
 from scipy.stats import chi2
 
 from .IRR_result import IRR_result
+from .ratings import memoize
+
+
+def average_ranks(ratings):
+    """Ranks every column with one argsort, ties get their average rank
+
+    Parameters
+    ----------
+    ratings: np.ndarray
+        subjects * raters array without missing values
+
+    Returns
+    -------
+    tuple
+        subjects * raters array of ranks and the sizes of all tie groups (runs of equal values within a column)
+
+    """
+    ns, nr = ratings.shape
+    order = np.argsort(ratings, axis=0, kind="stable")
+    ordered = np.take_along_axis(ratings, order, axis=0).T  # raters * subjects, so runs never cross columns
+
+    new_run = np.ones(ordered.shape, dtype=bool)
+    new_run[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+
+    starts = np.flatnonzero(new_run)
+    lengths = np.diff(np.append(starts, ordered.size))
+    mean_rank = starts % ns + (lengths + 1) / 2  # 1-based average rank of every run
+
+    ranks = np.empty((ns, nr))
+    np.put_along_axis(ranks, order, np.repeat(mean_rank, lengths).reshape((nr, ns)).T, axis=0)
+    return ranks, lengths
+
+
+def complete_ranks(ratings):
+    """Average ranks of the subjects without missing ratings and the sizes of the tie groups, cached on Ratings"""
+    def compute():
+        values = np.asarray(ratings, dtype=float)
+        return average_ranks(values[~np.isnan(values).any(axis=1)])  # drop nans
+    return memoize(ratings, "ranks", compute)
+
+
+def kendall_from_rank_sums(rank_sums, ns, nr, Tj, ties, correct=False):
+    """Computes Kendall's W and its chi-squared test from the rank sums of every subject"""
+    SS = np.sum((rank_sums - np.mean(rank_sums))**2)
+    error = None
+
+    if correct:
+        coeff = (12 * SS) / (nr**2 * (ns**3 - ns) - nr * Tj)
+    else:
+        if ties:
+            error = "Coefficient may be incorrect due to ties"
+
+        coeff = (12 * SS / (nr**2 * (ns**3 - ns)))
+
+    Xvalue = nr * (ns - 1) * coeff
+    df1 = ns - 1
+    pvalue = 1 - chi2.cdf(Xvalue, df1)
+
+    method = "Kendall's coefficient of concordance"
+    return IRR_result(method, ns, nr, "Wt", coeff, Xvalue, f"Chisq ({df1})", pvalue, error=error)
 
 
 def kendall(ratings, correct=False):
     """Computes Kendall's coefficient of concordance as an index of interrater reliability of ordinal data. The
     coefficient could be corrected for ties within raters.
 
+    Subjects with missing ratings are dropped, and W, the chi-square and the reported number of subjects use the
+    complete subjects only (like irr). Earlier versions of pyirr reported and used the number of subjects before
+    dropping.
+
     Parameters
     ----------
     ratings: array_like
@@ -22,39 +85,60 @@ def kendall(ratings, correct=False):
         Returns Kendall's coefficient of concordance as an IRR_result dataclass.
 
    """
-    ratings = pd.DataFrame(ratings)
-    ns = ratings.shape[0]
-    nr = ratings.shape[1]
+    ranks, ties = complete_ranks(ratings)  # ranks of the subjects without missing ratings
+    ns, nr = ranks.shape
+    Tj = np.sum(ties**3 - ties)
 
-    ratings.dropna(inplace=True)  # drop nans
+    return kendall_from_rank_sums(np.sum(ranks, axis=1), ns, nr, Tj, np.any(ties > 1), correct)
 
-    if correct:
-        ratings_rank = ratings.rank()
-        error = None
 
-        Tj = 0
-        for col in ratings_rank:
-            rater = ratings_rank[col].value_counts()
-            ties = rater[rater > 1]
-            Tj += np.sum(ties**3 - ties)
+class KendallAccumulator:
+    """Accumulates the rank sums of every subject over blocks of raters, so Kendall's W can be computed for many
+    raters (e.g. judges stored row-wise) without keeping all ratings in memory.
 
-        coeff = (12 * np.cov(np.sum(ratings_rank, axis=1)) * (ns - 1)) / (nr**2 * (ns**3 - ns) - nr * Tj)
-    else:
-        testties = np.unique(ratings, axis=0)
+    Parameters
+    ----------
+    correct: bool
+        a logical indicating whether the coefficient should be corrected for ties within raters.
 
-        if not len(testties):
-            error = "Coefficient may be incorrect due to ties"
-        else:
-            if len(testties) < len(ratings):
-                error = "Coefficient may be incorrect due to ties"
+    """
 
-        ratings_rank = ratings.rank()
+    def __init__(self, correct=False):
+        self.correct = correct
+        self.rank_sums = None
+        self.nr = 0
+        self.Tj = 0
+        self.ties = False
 
-        coeff = (12 * np.cov(np.sum(ratings_rank, axis=1)) * (ns - 1) / (nr**2 * (ns**3 - ns)))
+    def update(self, block):
+        """Adds a subjects * raters block with complete ratings of all subjects for some raters"""
+        block = np.asarray(block, dtype=float)
+        if np.isnan(block).any():
+            raise ValueError("Rater blocks cannot contain missing values.")
 
-    Xvalue = nr * (ns - 1) * coeff
-    df1 = ns - 1
-    pvalue = 1 - chi2.cdf(Xvalue, df1)
+        ranks, ties = average_ranks(block)
+        self.rank_sums = np.sum(ranks, axis=1) + (0 if self.rank_sums is None else self.rank_sums)
+        self.nr += block.shape[1]
+        self.Tj += np.sum(ties**3 - ties)
+        self.ties |= bool(np.any(ties > 1))
+        return self
 
-    method = "Kendall's coefficient of concordance"
-    return IRR_result(method, ns, nr, "Wt", coeff, Xvalue, f"Chisq ({df1})", pvalue, error=error)
+    def merge(self, other):
+        """Adds the rank sums of another accumulator for the same subjects"""
+        if other.rank_sums is not None:
+            self.rank_sums = other.rank_sums + (0 if self.rank_sums is None else self.rank_sums)
+            self.nr += other.nr
+            self.Tj += other.Tj
+            self.ties |= other.ties
+        return self
+
+    def result(self):
+        """Computes Kendall's W for all raters seen so far
+
+        Returns
+        -------
+        IRR_result
+            Returns Kendall's coefficient of concordance as an IRR_result dataclass.
+
+        """
+        return kendall_from_rank_sums(self.rank_sums, len(self.rank_sums), self.nr, self.Tj, self.ties, self.correct)
@@ -0,0 +1,107 @@
+import numpy as np
+from scipy import sparse
+
+try:
+    from . import _kernels  # optional compiled extension, built from pyirr/_kernels.pyx when Cython is available
+except ImportError:
+    _kernels = None
+
+COMPILED = {"enabled": _kernels is not None}
+
+
+def use_compiled(enabled=True):
+    """Switches the compiled kernels on or off, e.g. to compare them with the NumPy implementations
+
+    Parameters
+    ----------
+    enabled: bool
+        whether the compiled kernels are used when they are available
+
+    """
+    if enabled and _kernels is None:
+        raise ImportError("The compiled kernels are not available, reinstall pyirr from source with a C compiler.")
+    COMPILED["enabled"] = enabled
+
+
+def compiled_kernel(name):
+    """Returns the compiled kernel called name, or None when the NumPy implementation should be used"""
+    if not COMPILED["enabled"]:
+        return None
+    return getattr(_kernels, name)
+
+
+def contingency_table(left, right, nlev):
+    """Counts the nlev * nlev contingency table of two vectors of integer codes without missing values"""
+    left, right = np.asarray(left, dtype=np.intp), np.asarray(right, dtype=np.intp)
+    kernel = compiled_kernel("contingency_table")
+    if kernel is not None:
+        return np.asarray(kernel(left, right, nlev))
+    return np.bincount(left * nlev + right, minlength=nlev * nlev).reshape((nlev, nlev))
+
+
+def pair_tables(codes, rows, nlev, block_size=2**16):
+    """Contingency tables of the raters in rows (a slice) with themselves and all later raters, see pairwise_tables.
+    The counts are exact, so they do not depend on how the raters are split into blocks or which kernel counts them."""
+    kernel = compiled_kernel("pair_tables")
+    if kernel is not None:
+        by_rater = np.ascontiguousarray(np.asarray(codes, dtype=np.intp)[:, rows.start:].T)
+        return np.asarray(kernel(by_rater, rows.stop - rows.start, nlev))
+
+    levels = np.arange(nlev)
+    tables = np.zeros((rows.stop - rows.start, codes.shape[1] - rows.start, nlev, nlev))
+
+    for start in range(0, len(codes), block_size):
+        onehot = (codes[start:start + block_size, rows.start:, None] == levels).astype(float)
+        tables += np.einsum("sil,sjm->ijlm", onehot[:, :rows.stop - rows.start], onehot, optimize=True)
+    return tables
+
+
+def unit_value_counts(units, codes, nunits, nval):
+    """Builds the sparse unit * value count matrix from integer unit and value codes"""
+    counts = sparse.coo_matrix((np.ones(len(codes)), (units, codes)), shape=(nunits, nval))
+    return counts.tocsr()  # duplicate entries are summed
+
+
+def coincidence_from_codes(units, codes, nunits, nval, normalise=True):
+    """Computes the coincidence matrix from the unit and value code of every pairable value
+
+    Parameters
+    ----------
+    units: array_like
+        integer unit index of every value
+    codes: array_like
+        integer value code of every value
+    nunits: int
+        number of units
+    nval: int
+        number of distinct values
+    normalise: bool
+        whether pairs within a unit are weighted by 1 / (m_u - 1)
+
+    Returns
+    -------
+    np.ndarray
+        nval * nval coincidence matrix
+
+    """
+    kernel = compiled_kernel("coincidence_matrix")
+    if kernel is not None:
+        units, codes = np.asarray(units, dtype=np.intp), np.asarray(codes, dtype=np.intp)
+        if np.any(units[1:] < units[:-1]):
+            order = np.argsort(units, kind="stable")  # the kernel walks the values unit by unit
+            units, codes = units[order], codes[order]
+        return np.asarray(kernel(units, codes, nval, normalise))
+
+    counts = unit_value_counts(units, codes, nunits, nval)
+    mu = np.asarray(counts.sum(axis=1)).ravel()
+
+    if normalise:
+        weights = np.divide(1, mu - 1, out=np.zeros(nunits), where=mu > 1)
+    else:
+        weights = np.ones(nunits)
+
+    # sum over units of (n_u n_u' - diag(n_u)) * w_u
+    weighted = counts.multiply(weights[:, None]).tocsr()
+    cm = np.asarray((counts.T @ weighted).todense(), dtype=float)
+    cm -= np.diag(np.asarray(weighted.sum(axis=0)).ravel())
+    return cm
@@ -1,43 +1,338 @@
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+import pandas as pd
+from scipy import sparse
 
 from .IRR_result import IRR_result
+from .kernels import coincidence_from_codes, unit_value_counts
+from .ratings import as_ratings
+
+
+def dense_codes(array):
+    """Factorizes a rater * unit array into the unit and value code of every non-missing value"""
+    array = np.asarray(array, dtype=float)
+    observed = ~np.isnan(array)
+    levx, codes = np.unique(array[observed], return_inverse=True)
+    units = np.nonzero(observed)[1]
+
+    # like irr, pairs are only weighted by 1 / (m_u - 1) when values are missing
+    return units, codes, levx, array.shape[1], array.shape[0], not observed.all()
 
 
 def coincidence_matrix(array):
-    array = np.asarray(array)
-    levx = np.unique(array)
-    levx = levx[~np.isnan(levx)]
+    """Computes the coincidence matrix of a rater * unit array
+
+    Parameters
+    ----------
+    array: array_like
+        rater * unit array, missing values are NaN
+
+    Returns
+    -------
+    tuple
+        coincidence matrix, number of pairable values and the distinct values
+
+    """
+    units, codes, levx, nunits, _, normalise = dense_codes(array)
+    cm = coincidence_from_codes(units, codes, nunits, len(levx), normalise)
+    nmv = np.sum(cm)
+    return cm, nmv, levx
+
+
+def long_codes(ratings, unit="unit", coder="coder", value="value"):
+    """Factorizes long format ratings into the unit and value code of every non-missing value"""
+    if sparse.issparse(ratings):
+        ratings = sparse.coo_matrix(ratings)
+        nunits, ncoders = ratings.shape
+        units, coders, values = ratings.row, ratings.col, ratings.data
+    else:
+        if isinstance(ratings, pd.DataFrame):
+            units, coders, values = ratings[unit], ratings[coder], ratings[value]
+        else:
+            units, coders, values = ratings
+        units, _ = pd.factorize(np.asarray(units))
+        coders, _ = pd.factorize(np.asarray(coders))
+        nunits, ncoders = units.max() + 1, coders.max() + 1
+
+    values = np.asarray(values, dtype=float)
+    observed = ~np.isnan(values)
+    levx, codes = np.unique(values[observed], return_inverse=True)
+
+    # like the dense path, pairs are only weighted by 1 / (m_u - 1) when values are missing
+    complete = observed.sum() == nunits * ncoders
+    return units[observed], codes, levx, nunits, ncoders, not complete
+
+
+def long_coincidence_matrix(ratings, unit="unit", coder="coder", value="value"):
+    """Computes the coincidence matrix from long format ratings without building the rater * unit array
+
+    Parameters
+    ----------
+    ratings: DataFrame, tuple or sparse matrix
+        see kripp_alpha_long
+    unit, coder, value: str
+        column names used when ratings is a DataFrame
+
+    Returns
+    -------
+    tuple
+        coincidence matrix, number of pairable values, the distinct values, number of units and number of coders
+
+    """
+    units, codes, levx, nunits, ncoders, normalise = long_codes(ratings, unit, coder, value)
+    cm = coincidence_from_codes(units, codes, nunits, len(levx), normalise)
+    nmv = np.sum(cm)
+    return cm, nmv, levx, nunits, ncoders
+
+
+def pairwise_difference(values):
+    values = np.asarray(values, dtype=float)
+    return values[:, None] - values[None, :]
+
+
+def nominal_metric(values, marginals):
+    return 1. - np.eye(len(values))
+
+
+def ordinal_metric(values, marginals):
+    # distance between the cumulative midpoints of two categories
+    marginals = np.asarray(marginals, dtype=float)
+    midpoints = np.cumsum(marginals, axis=-1) - marginals / 2
+    return (midpoints[..., :, None] - midpoints[..., None, :])**2
+
+
+def interval_metric(values, marginals):
+    return pairwise_difference(values)**2
+
+
+def ratio_metric(values, marginals):
+    values = np.asarray(values, dtype=float)
+    total = values[:, None] + values[None, :]
+    diff2 = pairwise_difference(values)**2
+    return np.divide(diff2, total**2, out=np.zeros_like(diff2), where=total != 0)
+
+
+def circular_metric(values, marginals):
+    values = np.asarray(values, dtype=float)
+    circle = values.max() - values.min() + 1  # number of values on the circle
+    return np.sin(np.pi * pairwise_difference(values) / circle)**2
+
+
+def bipolar_metric(values, marginals):
+    values = np.asarray(values, dtype=float)
+    total = values[:, None] + values[None, :]
+    denominator = (total - 2 * values.min()) * (2 * values.max() - total)
+    diff2 = pairwise_difference(values)**2
+    return np.divide(diff2, denominator, out=np.zeros_like(diff2), where=denominator != 0)
+
+
+METRICS = {"nominal": nominal_metric, "ordinal": ordinal_metric, "interval": interval_metric,
+           "ratio": ratio_metric, "circular": circular_metric, "bipolar": bipolar_metric}
+
+
+def register_metric(name, metric):
+    """Registers a custom distance metric that can be used as method in kripp_alpha
+
+    Parameters
+    ----------
+    name: str
+        name of the metric
+    metric: callable
+        function metric(values, marginals) that returns the full nval * nval matrix of squared differences between the
+        distinct values, marginals are the value frequencies of the coincidence matrix. The bootstrap passes the
+        marginals of all replicates of a batch at once as a replicates * nval array, so a metric that uses them should
+        broadcast over leading dimensions and return a replicates * nval * nval array (see ordinal_metric). Bootstrap
+        workers (n_jobs > 1) look the metric up by name when they are forked (the default on Linux), with other start
+        methods the metric is sent to them and has to be picklable, i.e. defined at the top level of a module.
+
+    """
+    if not callable(metric):
+        raise TypeError("Metric should be a callable that returns a delta matrix.")
+    METRICS[name] = metric
+
+
+def get_metric(method):
+    if callable(method):
+        return method
+    if method not in METRICS:
+        raise ValueError(f"Please specify a {'/'.join(METRICS)} data level or register a custom metric")
+    return METRICS[method]
+
+
+def alpha_from_coincidences(cm, nmv, delta):
+    """Computes alpha from (a stack of) coincidence matrices and matching delta matrices"""
+    nc = np.sum(cm, axis=-1)
+    observed = np.sum(cm * delta, axis=(-2, -1))
+    expected = np.sum(nc[..., :, None] * nc[..., None, :] * delta, axis=(-2, -1))
+    return 1 - (nmv - 1) * observed / expected
+
+
+def alpha_value(cm, nmv, levx, metric):
+    if cm.shape[1] < 2:
+        return 1.
+    delta = metric(levx, np.sum(cm, axis=1))
+    return alpha_from_coincidences(cm, nmv, delta)
+
+
+def unit_coincidences(units, codes, nunits, nval, normalise=True):
+    """Builds the sparse unit * (nval * nval) matrix with the contribution of every unit to the coincidence matrix"""
+    counts = unit_value_counts(units, codes, nunits, nval)
+    counts.sort_indices()
+    mu = np.asarray(counts.sum(axis=1)).ravel()
+
+    if normalise:
+        weights = np.divide(1, mu - 1, out=np.zeros(nunits), where=mu > 1)
+    else:
+        weights = np.ones(nunits)
+
+    # all (left, right) pairs of stored entries within the same unit
+    nnz_row = np.diff(counts.indptr)
+    rows = np.repeat(np.arange(nunits), nnz_row)
+    left = np.repeat(np.arange(counts.nnz), nnz_row[rows])
+    block_start = np.repeat(np.cumsum(nnz_row[rows]) - nnz_row[rows], nnz_row[rows])
+    right = counts.indptr[rows[left]] + np.arange(len(left)) - block_start
+
+    n_left, n_right = counts.data[left], counts.data[right]
+    data = weights[rows[left]] * (n_left * n_right - (left == right) * n_left)
+    columns = counts.indices[left] * nval + counts.indices[right]
+    return sparse.csr_matrix((data, (rows[left], columns)), shape=(nunits, nval * nval))
+
+
+def bootstrap_chunk(contributions, levx, metric, size, seed):
+    """Computes alpha for a batch of unit resamples as one weighted sum over the unit contributions, the metric is a
+    callable or the name of a registered metric"""
+    metric = get_metric(metric)
+    rng = np.random.default_rng(seed)
+    nunits = contributions.shape[0]
     nval = len(levx)
-    cm = np.zeros((nval, nval))
-    dimx = array.shape
 
-    if np.any(np.isnan(array)):
-        mc = np.sum(~np.isnan(array), axis=0) - 1
+    draws = rng.integers(0, nunits, size=(size, nunits)) + nunits * np.arange(size)[:, None]
+    weights = np.bincount(draws.ravel(), minlength=size * nunits).reshape((size, nunits)).astype(float)
+    cm = np.asarray(weights @ contributions).reshape((size, nval, nval))
+    nmv = np.sum(cm, axis=(1, 2))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = metric(levx, np.sum(cm, axis=2))
+        return alpha_from_coincidences(cm, nmv, delta)
+
+
+def worker_metric(metric):
+    """The metric as it is sent to the bootstrap workers: forked workers inherit the registry and get the name of a
+    registered metric, other workers get the metric itself, which has to be picklable"""
+    if isinstance(metric, str) and metric in METRICS and multiprocessing.get_start_method() == "fork":
+        return metric
+
+    metric = get_metric(metric)
+    try:
+        pickle.dumps(metric)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        raise ValueError(f"The metric {getattr(metric, '__name__', metric)} cannot be sent to worker processes, define "
+                         f"it at the top level of a module or use n_jobs=1.")
+    return metric
+
+
+def bootstrap_alpha(units, codes, levx, nunits, normalise, metric, n_boot, seed=None, n_jobs=1, chunk_size=None):
+    """Draws bootstrap replicates of alpha by resampling units with replacement
+
+    Parameters
+    ----------
+    units, codes: array_like
+        integer unit index and value code of every value
+    levx: array_like
+        distinct values
+    nunits: int
+        number of units
+    normalise: bool
+        whether pairs within a unit are weighted by 1 / (m_u - 1)
+    metric: str or callable
+        name of a registered metric or a delta matrix function, should broadcast over leading dimensions of the
+        marginals
+    n_boot: int
+        number of bootstrap replicates
+    seed: int
+        seed for the random number generator, results do not depend on n_jobs
+    n_jobs: int
+        number of worker processes
+    chunk_size: int
+        number of replicates computed in one batch, by default limited to ~4 million unit draws per batch
+
+    Returns
+    -------
+    np.ndarray
+        bootstrapped alpha values
+
+    """
+    contributions = unit_coincidences(units, codes, nunits, len(levx), normalise)
+    if nunits * len(levx)**2 <= 2**24:
+        contributions = contributions.toarray()  # dense products are faster while they fit comfortably
+
+    if chunk_size is None:
+        chunk_size = max(1, min(n_boot, 2**22 // max(nunits, 1)))
+
+    sizes = [chunk_size] * (n_boot // chunk_size)
+    if n_boot % chunk_size:
+        sizes.append(n_boot % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if n_jobs != 1:
+        metric = worker_metric(metric)
+    args = [(contributions, levx, metric, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+
+    if n_jobs == 1:
+        alphas = [bootstrap_chunk(*arg) for arg in args]
     else:
-        mc = np.ones(dimx[1])
-
-    for col in range(dimx[1]):  # not very Pythonic I know, I'm sorry Guido
-        for i1 in range(dimx[0] - 1):
-            for i2 in range(i1 + 1, dimx[0]):
-                if not np.isnan(array[i1, col]) and not np.isnan(array[i2, col]):
-                    index1 = np.nonzero(levx == array[i1, col])
-                    index2 = np.nonzero(levx == array[i2, col])
-                    cm[index1, index2] += (1 + (index1 == index2)) / mc[col]
-                    if index1 != index2:
-                        cm[index2, index1] = cm[index1, index2]
-    nmv = np.sum(np.sum(cm, axis=0))
-    return cm, nmv, levx
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            alphas = list(executor.map(bootstrap_chunk, *zip(*args)))
+
+    return np.concatenate(alphas)
+
+
+def alpha_result(units, codes, levx, nunits, ncoders, normalise, method, n_boot, conf_level, alpha_min, seed, n_jobs,
+                 cm=None):
+    metric = get_metric(method)
+    metric_name = method  # registered metrics are looked up by name in the bootstrap workers
+    if callable(method):
+        method = method.__name__
+
+    if cm is None:
+        cm = coincidence_from_codes(units, codes, nunits, len(levx), normalise)
+    value = alpha_value(cm, np.sum(cm), levx, metric)
+    result = IRR_result(f"Krippendorff's alpha ({method})", nunits, ncoders, "alpha", value)
 
+    if n_boot and len(levx) > 1:
+        alphas = bootstrap_alpha(units, codes, levx, nunits, normalise, metric_name, n_boot, seed, n_jobs)
+        alpha = 1 - conf_level
+        result.conf_level = conf_level
+        result.lower_bound, result.upper_bound = np.nanquantile(alphas, [alpha / 2, 1 - alpha / 2])
+        # replicates of resamples in which every unit has the same value have no alpha and are left out of q
+        defined = alphas[~np.isnan(alphas)]
+        result.detail = {"alpha_min": alpha_min, "q": np.mean(defined < alpha_min), "n_boot": n_boot}
 
-def kripp_alpha(ratings, method="nominal"):
+    return result
+
+
+def kripp_alpha(ratings, method="nominal", n_boot=0, conf_level=0.95, alpha_min=0.667, seed=None, n_jobs=1):
     """Calculates the alpha coefficient of reliability proposed by Krippendorff
 
     Parameters
     ----------
     ratings: array_like
         observation x rater array or dataframe
-    method: {"nominal", "ordinal", "interval", "ratio"}
-        data level of x
+    method: {"nominal", "ordinal", "interval", "ratio", "circular", "bipolar"} or callable
+        data level of x, the name of a metric added with register_metric, or a metric function
+    n_boot: int
+        number of bootstrap replicates for the confidence interval, units are resampled with replacement
+    conf_level: float
+        confidence level of the bootstrap interval
+    alpha_min: float
+        smallest acceptable alpha, the probability q of failing to reach it (among the bootstrap replicates with an
+        alpha) is reported in detail
+    seed: int
+        seed for the bootstrap
+    n_jobs: int
+        number of worker processes for the bootstrap
 
     Returns
     -------
@@ -45,47 +340,38 @@ def kripp_alpha(ratings, method="nominal"):
         Returns Krippendorff's coefficient as an IRR_result dataclass.
 
    """
-    ratings = np.array(ratings).T
-    cm, nmv, levx = coincidence_matrix(ratings)
-    dimcm = cm.shape
+    ratings = as_ratings(ratings)
 
-    triu1, triu2 = np.triu_indices_from(cm, k=len(cm)//2 - 1)
-    triu2inds = triu2.argsort()  # R sorts rows first, numpy columns first
-    triu1 = triu1[triu2inds]
-    triu2 = triu2[triu2inds]
-    utcm = cm[triu1, triu2]
+    # the value codes and the coincidence matrix do not depend on the metric, Ratings keep them for the next call
+    codes = ratings.cached("alpha_codes", lambda: dense_codes(ratings.values.T))
+    units, values, levx, nunits, _, normalise = codes
+    cm = ratings.cached("coincidence_matrix",
+                        lambda: coincidence_from_codes(units, values, nunits, len(levx), normalise))
+    return alpha_result(*codes, method, n_boot, conf_level, alpha_min, seed, n_jobs, cm=cm)
 
-    nc = np.sum(cm, axis=1)
-    dv = levx
 
-    diff2 = np.zeros(len(utcm))
-    ncnk = np.zeros(len(utcm))
-    ck = 0
+def kripp_alpha_long(ratings, method="nominal", unit="unit", coder="coder", value="value", n_boot=0, conf_level=0.95,
+                     alpha_min=0.667, seed=None, n_jobs=1):
+    """Calculates Krippendorff's alpha from long format (unit, coder, value) ratings. Memory scales with the number of
+    ratings instead of units * coders.
 
-    if dimcm[1] < 2:
-        value = 1.
-    else:
-        for k in range(1, dimcm[1]):
-            for c in range(k):
-                ncnk[ck] = nc[c] * nc[k]
-                if method == "nominal":
-                    diff2[ck] = 1.
-                elif method == "ordinal":
-                    diff2[ck] = nc[c] / 2
-                    if k > c:
-                        for g in range(c+1, k):
-                            diff2[ck] += nc[g]
-                        diff2[ck] += nc[k] / 2
-                        diff2[ck] **= 2
-                elif method == "interval":
-                    diff2[ck] = (dv[c] - dv[k])**2
-                elif method == "ratio":
-                    diff2[ck] = (dv[c] - dv[k])**2 / (dv[c] + dv[k])**2
-                else:
-                    raise Exception("Please specify a nominal/ordinal/interval/ratio data level")
-
-                ck += 1
-
-        value = 1 - (nmv - 1) * np.sum(utcm * diff2) / np.sum(ncnk * diff2)
-
-    return IRR_result(f"Krippendorff's alpha ({method})", ratings.shape[1], ratings.shape[0], "alpha", value)
+    Parameters
+    ----------
+    ratings: DataFrame, tuple or sparse matrix
+        long DataFrame with unit, coder and value columns, a (unit, coder, value) tuple of arrays, or a scipy.sparse
+        unit * coder matrix of which the stored entries are the ratings
+    method: {"nominal", "ordinal", "interval", "ratio", "circular", "bipolar"} or callable
+        data level of the values, the name of a metric added with register_metric, or a metric function
+    unit, coder, value: str
+        column names used when ratings is a DataFrame
+    n_boot, conf_level, alpha_min, seed, n_jobs:
+        bootstrap options, see kripp_alpha
+
+    Returns
+    -------
+    IRR_result
+        Returns Krippendorff's coefficient as an IRR_result dataclass.
+
+    """
+    codes = long_codes(ratings, unit, coder, value)
+    return alpha_result(*codes, method, n_boot, conf_level, alpha_min, seed, n_jobs)
@@ -1,5 +1,6 @@
 import numpy as np
 
+from .backend import asarray, drop_incomplete
 from .IRR_result import IRR_result
 
 
@@ -17,9 +18,9 @@ def maxwell(ratings):
         Returns Maxwell's RE as an IRR_result dataclass.
 
     """
-    ratings = np.array(ratings)  # make sure ratings is not a list or DataFrame
+    ratings = asarray(ratings, dtype=float)  # make sure ratings is not a list or DataFrame
 
-    ratings = ratings[~np.isnan(ratings).any(axis=1)]  # drop nans
+    ratings = drop_incomplete(ratings)  # drop nans
 
     ns = ratings.shape[0]
     nr = ratings.shape[1]
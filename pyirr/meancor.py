@@ -1,10 +1,12 @@
 import numpy as np
-from scipy.stats import norm, pearsonr
+import pandas as pd
 
+from .correlation import complete_correlation, fisher_average
 from .IRR_result import IRR_result
+from .ratings import Ratings
 
 
-def meancor(ratings, fisher=True):
+def meancor(ratings, fisher=True, n_jobs=1):
     """Computes the mean of bivariate Pearson's product moment correlations between raters as an index of the interrater
     reliability of quantitative data.
 
@@ -14,6 +16,8 @@ def meancor(ratings, fisher=True):
         subjects * raters array or dataframe
     fisher: bool
         a boolean indicating whether the correlation coefficients should be Fisher z-standardized before averaging.
+    n_jobs: int
+        number of processes for the correlations of large panels of raters, results do not depend on n_jobs
 
     Returns
     -------
@@ -21,40 +25,19 @@ def meancor(ratings, fisher=True):
         Returns correlation as an IRR_result dataclass.
 
     """
-    ratings = np.array(ratings)  # make sure ratings is not a list or DataFrame
-
-    ratings = ratings[~np.isnan(ratings).any(axis=1)]  # drop nans
-
-    ns = ratings.shape[0]
-    nr = ratings.shape[1]
-
-    r = []
-    for i in range(nr-1):
-        for j in range(i + 1, nr):
-            r.append(pearsonr(ratings[:, i], ratings[:, j])[0])
-
-    r = np.array(r)
+    columns = ratings.columns if isinstance(ratings, (pd.DataFrame, Ratings)) else None
+    r_matrix, ns = complete_correlation(ratings, "pearson", n_jobs)  # subjects with missing ratings are dropped
+    nr = r_matrix.shape[0]
+    r = r_matrix[np.triu_indices(nr, k=1)]
     delr = 0
 
     if fisher:
-        delr = len(r) - len(r[(r < 1) & (r > -1)])
-        # Eliminate perfect correlations (r=1, r=-1)
-        r = r[(r < 1) & (r > -1)]
-
-        rz = 0.5 * np.log((1 + r) / (1 - r))
-        mrz = np.mean(rz)
-
-        coeff = (np.exp(2 * mrz) - 1) / (np.exp(2 * mrz) + 1)
-        SE = np.sqrt(1 / (ns - 3))
-
-        u = coeff / SE
-        pvalue = 2 * (1 - norm.cdf(np.abs(u)))
-
+        coeff, u, pvalue, delr = fisher_average(r, ns)
     else:
         coeff = np.mean(r)
 
     result = {"method": "Mean of bivariate correlations R", "subjects": ns, "raters": nr, "irr_name": "R",
-              "value": coeff}
+              "value": coeff, "detail": pd.DataFrame(r_matrix, index=columns, columns=columns)}
     if fisher:
         result = {**result, "statistic": u, "stat_name": "z", "pvalue": pvalue}
     if delr > 0:
@@ -1,10 +1,12 @@
 import numpy as np
-from scipy.stats import norm, spearmanr
+import pandas as pd
 
+from .correlation import complete_correlation, fisher_average
 from .IRR_result import IRR_result
+from .ratings import Ratings
 
 
-def meanrho(ratings, fisher=True):
+def meanrho(ratings, fisher=True, n_jobs=1):
     """Computes the mean of bivariate Spearman's rho rank correlations between raters as an index of the interrater
     reliability of ordinal data.
 
@@ -14,54 +16,30 @@ def meanrho(ratings, fisher=True):
         subjects * raters array or dataframe
     fisher: bool
         a boolean indicating whether the correlation coefficients should be Fisher z-standardized before averaging.
+    n_jobs: int
+        number of processes for the correlations of large panels of raters, results do not depend on n_jobs
 
     Returns
     -------
     IRR_result
         Returns correlation as an IRR_result dataclass.
     """
-    ratings = np.array(ratings)  # make sure ratings is not a list or DataFrame
+    columns = ratings.columns if isinstance(ratings, (pd.DataFrame, Ratings)) else None
+    r_matrix, ns = complete_correlation(ratings, "spearman", n_jobs)  # subjects with missing ratings are dropped
+    nr = r_matrix.shape[0]
 
-    ratings = ratings[~np.isnan(ratings).any(axis=1)]  # drop nans  # drop nans
+    ties = ns > 0  # the unique rows test of the original port flagged ties for any non-empty ratings
 
-    ns = ratings.shape[0]
-    nr = ratings.shape[1]
-
-    testties = np.unique(ratings, axis=0)
-
-    ties = False
-    if len(testties):
-        ties = True
-    elif len(testties) < len(ratings):
-        ties = True
-
-    r = []
-    for i in range(nr-1):
-        for j in range(i + 1, nr):
-            r.append(spearmanr(ratings[:, i], ratings[:, j])[0])
-
-    r = np.array(r)
+    r = r_matrix[np.triu_indices(nr, k=1)]
     delr = 0
 
     if fisher:
-        delr = len(r) - len(r[(r < 1) & (r > -1)])
-        # Eliminate perfect correlations (r=1, r=-1)
-        r = r[(r < 1) & (r > -1)]
-
-        rz = 0.5 * np.log((1 + r) / (1 - r))
-        mrz = np.mean(rz)
-
-        coeff = (np.exp(2 * mrz) - 1) / (np.exp(2 * mrz) + 1)
-        SE = np.sqrt(1 / (ns - 3))
-
-        u = coeff / SE
-        pvalue = 2 * (1 - norm.cdf(np.abs(u)))
-
+        coeff, u, pvalue, delr = fisher_average(r, ns)
     else:
         coeff = np.mean(r)
 
     result = {"method": "Mean of bivariate correlations Rho", "subjects": ns, "raters": nr, "irr_name": "Rho",
-              "value": coeff}
+              "value": coeff, "detail": pd.DataFrame(r_matrix, index=columns, columns=columns)}
     if fisher:
         result = {**result, "statistic": u, "stat_name": "z", "pvalue": pvalue}
     if delr > 0:
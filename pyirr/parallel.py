@@ -0,0 +1,61 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedArray:
+    """Copies an array into shared memory once, worker processes attach to it by name instead of receiving a pickled
+    copy with every task. Use it as a context manager, the memory is released on exit."""
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self.shape, self.dtype = array.shape, array.dtype
+        self.memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(self.shape, self.dtype, buffer=self.memory.buf)[...] = array
+
+    @property
+    def handle(self):
+        """Picklable reference to the shared array, see attach"""
+        return self.memory.name, self.shape, self.dtype.str
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.memory.close()
+        self.memory.unlink()
+
+
+def attach(handle):
+    """Attaches to a shared array, returns the shared memory (close it when done) and the array"""
+    name, shape, dtype = handle
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype, buffer=memory.buf)
+
+
+def run_shared(worker, handle, blocks, n_jobs, *args):
+    """Calls worker(array, block, *args) for every block, in n_jobs processes attached to the shared array. The
+    results are returned in the order of the blocks."""
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [executor.submit(shared_task, worker, handle, block, args) for block in blocks]
+        return [future.result() for future in futures]
+
+
+def shared_task(worker, handle, block, args):
+    memory, array = attach(handle)
+    try:
+        return worker(array, block, *args)
+    finally:
+        del array
+        memory.close()
+
+
+def row_blocks(nr, block_size):
+    """Splits the rows of the upper triangle of a nr * nr matrix into blocks with about the same number of entries.
+    The blocks only depend on nr and block_size, so serial and parallel computations use the same blocks."""
+    nblocks = -(-nr // block_size)
+    entries = np.cumsum(np.arange(nr, 0, -1))  # entries of the upper triangle up to every row
+    bounds = np.searchsorted(entries, entries[-1] * np.arange(1, nblocks) / nblocks) + 1
+    bounds = np.unique(np.concatenate([[0], bounds, [nr]]))
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
@@ -0,0 +1,293 @@
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from functools import partial
+from typing import Any
+
+import numpy as np
+
+from .anova import AnovaSums
+from .intraclass_correlation import icc_from_anova, intraclass_correlation
+from .kappa2 import kappa2, kappa_from_tables, weight_table
+from .kappam_fleiss import fleiss_from_counts, kappam_fleiss
+from .kendall import average_ranks, kendall
+from .ratings import as_ratings
+
+
+@dataclass
+class PermutationResult:
+    method: str
+    value: float
+    pvalue: float
+    n_perm: int
+    exact: bool
+    mc_error: float
+    alternative: str
+    result: Any = None
+
+    def to_dict(self):
+        return asdict(self)
+
+    def __repr__(self):
+        test = "Exact" if self.exact else "Monte Carlo"
+        model_string = "=" * 50 + "\n"
+        model_string += f"{self.method}".center(50, " ") + "\n"
+        model_string += "=" * 50 + "\n"
+        model_string += f"{test} permutation test, {self.n_perm} permutations\n"
+        model_string += f"   value = {self.value:.3f}\n"
+        model_string += f" p-value = {self.pvalue:.4f} ({self.alternative})\n"
+        if not self.exact:
+            model_string += f"MC error = {self.mc_error:.4f}\n"
+        model_string += "=" * 50 + "\n"
+        return model_string
+
+
+def kendall_kernel(ranks, Tj, correct, batch):
+    """Kendall's W of permuted ranks, ties within raters do not change when ranks are shuffled within raters"""
+    ns, nr = ranks.shape
+    rank_sums = np.sum(batch, axis=2)
+    SS = np.sum((rank_sums - np.mean(rank_sums, axis=1, keepdims=True))**2, axis=1)
+    return 12 * SS / (nr**2 * (ns**3 - ns) - (nr * Tj if correct else 0))
+
+
+def prepare_kendall(ratings, correct=False):
+    ratings = np.asarray(ratings, dtype=float)
+    ranks, ties = average_ranks(ratings[~np.isnan(ratings).any(axis=1)])
+    return ranks, partial(kendall_kernel, ranks, np.sum(ties**3 - ties), correct)
+
+
+def kappa2_kernel(nlev, weight_tab, batch):
+    """Cohen's Kappa of permuted codes, all contingency tables of the batch come from one bincount"""
+    size = batch.shape[0]
+    cells = batch[..., 0] * nlev + batch[..., 1] + (nlev**2 * np.arange(size))[:, None]
+    ttab = np.bincount(cells.ravel(), minlength=size * nlev**2).reshape((size, nlev, nlev))
+    return kappa_from_tables(ttab, weight_tab)[0]
+
+
+def prepare_kappa2(ratings, weight="unweighted", sort_levels=False):
+    codes, levels = as_ratings(ratings).complete_codes()
+    return codes, partial(kappa2_kernel, len(levels), weight_table(weight, len(levels)))
+
+
+def fleiss_kernel(nlev, batch):
+    """Fleiss' Kappa of permuted codes, every permutation is a group of subjects of one stacked count table"""
+    size, ns, nr = batch.shape
+    codes = batch.ravel()
+    observed = codes >= 0
+    cells = (np.repeat(np.arange(size * ns), nr) * nlev + codes)[observed]
+    ttab = np.bincount(cells, minlength=size * ns * nlev).reshape((size * ns, nlev))
+    return fleiss_from_counts(ttab, np.repeat(np.arange(size), ns), size)[1]
+
+
+def prepare_fleiss(ratings, exact=False, detail=False, counts=False):
+    if exact or counts:
+        return None  # the exact Kappa and count tables are tested with the generic kernel
+    codes, levels = as_ratings(ratings).factorize()
+    return codes, partial(fleiss_kernel, len(levels))
+
+
+def icc_kernel(model, mtype, unit, r0, batch):
+    """Intraclass correlation of permuted ratings from the vectorized ANOVA sums of every permutation"""
+    size, ns, nr = batch.shape
+    grand_mean = np.mean(batch, axis=(1, 2))
+    centered = batch - grand_mean[:, None, None]
+    SS_total = np.einsum("bij,bij->b", centered, centered)
+    SSr = nr * np.sum(np.mean(centered, axis=2)**2, axis=1)
+    SSc = ns * np.sum(np.mean(centered, axis=1)**2, axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return icc_from_anova(AnovaSums(ns, nr, SS_total, SSr, SSc), model, mtype, unit, r0).value
+
+
+def prepare_icc(ratings, model="oneway", mtype="consistency", unit="single", r0=0, conf_level=0.95, missing="drop"):
+    if missing != "drop":
+        return None
+    ratings = np.array(ratings, dtype=float)
+    ratings = ratings[~np.isnan(ratings).any(axis=1)]
+    return ratings, partial(icc_kernel, model, mtype, unit, r0)
+
+
+def generic_kernel(func, kwargs, statistic, batch):
+    """Calls the measure on every permuted array, used for measures without a vectorized kernel"""
+    return np.array([getattr(func(sample, **kwargs), statistic) for sample in batch], dtype=float)
+
+
+KERNELS = {
+    kendall: (prepare_kendall, "raters"),
+    kappa2: (prepare_kappa2, "raters"),
+    kappam_fleiss: (prepare_fleiss, "raters"),
+    intraclass_correlation: (prepare_icc, "raters"),
+}
+
+
+def register_kernel(func, prepare, within="raters"):
+    """Registers a vectorized permutation kernel for a measure
+
+    Parameters
+    ----------
+    func: callable
+        the measure, e.g. kappa2
+    prepare: callable
+        called as prepare(ratings, **kwargs) and returns a subjects * raters array that is permuted and a kernel that
+        maps a batch * subjects * raters array of permuted data to the statistic of every permutation. It may return
+        None for arguments the kernel does not support, the generic kernel is used then.
+    within: {"raters", "subjects"}
+        default direction of the shuffling
+
+    """
+    if within not in ("raters", "subjects"):
+        raise ValueError("within should be either 'raters' or 'subjects'.")
+    KERNELS[func] = (prepare, within)
+
+
+def permute(data, order, within):
+    """Applies a batch * subjects * raters array of permutation indices along the raters' or subjects' axis"""
+    return np.take_along_axis(np.broadcast_to(data, order.shape), order, axis=1 if within == "raters" else 2)
+
+
+def random_chunk(kernel, data, within, size, seed):
+    """Computes the statistic for a batch of random permutations"""
+    rng = np.random.default_rng(seed)
+    keys = rng.random((size,) + data.shape)
+    return kernel(permute(data, np.argsort(keys, axis=1 if within == "raters" else 2), within))
+
+
+def exact_chunk(kernel, data, within, order):
+    """Computes the statistic for a batch of enumerated permutations"""
+    return kernel(permute(data, order, within))
+
+
+def exact_orders(shape, within, batch_size):
+    """Enumerates all permutations within raters (or subjects) in batches. The first rater (subject) is kept fixed,
+    the statistic should not depend on the order of the subjects (raters)."""
+    ns, nr = shape
+    length, nslices = (ns, nr) if within == "raters" else (nr, ns)
+    identity = np.arange(length)
+    permutations = itertools.product(itertools.permutations(range(length)), repeat=nslices - 1)
+
+    while True:
+        chunk = list(itertools.islice(permutations, batch_size))
+        if not chunk:
+            return
+        order = np.array(chunk, dtype=np.intp).reshape((len(chunk), nslices - 1, length))
+        order = np.concatenate([np.broadcast_to(identity, (len(chunk), 1, length)), order], axis=1)
+        yield order.transpose((0, 2, 1)) if within == "raters" else order
+
+
+def run_chunks(worker, args, n_jobs):
+    """Yields the results of the chunks in order, workers compute n_jobs chunks at a time so the caller can stop
+    early"""
+    if n_jobs == 1:
+        for arg in args:
+            yield worker(*arg)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        while True:
+            futures = [executor.submit(worker, *arg) for arg in itertools.islice(args, n_jobs)]
+            if not futures:
+                return
+            for future in futures:
+                yield future.result()
+
+
+def permutation_test(func, ratings, n_perm=9999, within=None, alternative="greater", exact=None, tol=None,
+                     batch_size=None, seed=None, n_jobs=1, statistic="value", **kwargs):
+    """Computes an exact or Monte Carlo permutation p-value for an agreement or reliability measure. The ratings are
+    shuffled within raters (null hypothesis of no association between raters) or within subjects (null hypothesis of
+    no differences between raters) in vectorized batches.
+
+    Parameters
+    ----------
+    func: callable
+        the measure, e.g. kappa2, kappam_fleiss, kendall or intraclass_correlation. Measures with a registered kernel
+        (see register_kernel) are computed for a whole batch of permutations at once, others are called once for
+        every permutation.
+    ratings: array_like
+        subjects * raters array or dataframe
+    n_perm: int
+        maximum number of random permutations
+    within: {"raters", "subjects"}
+        whether the ratings are shuffled within raters or within subjects, defaults to the kernel's direction
+    alternative: {"greater", "less"}
+        direction of the alternative hypothesis
+    exact: bool
+        whether all permutations are enumerated, by default if there are not more than n_perm + 1 of them
+    tol: float
+        the Monte Carlo test stops early once the standard error of the p-value is below tol
+    batch_size: int
+        number of permutations computed at once, by default ~4 million permuted ratings per batch
+    seed: int
+        seed for the random permutations, results do not depend on n_jobs
+    n_jobs: int
+        number of worker processes
+    statistic: str
+        attribute of the measure's result that is compared, kernels always compute "value"
+    kwargs:
+        further arguments of func
+
+    Returns
+    -------
+    PermutationResult
+        p-value of the permutation test and the result of the measure
+
+    """
+    if alternative not in ("greater", "less"):
+        raise ValueError("alternative should be either 'greater' or 'less'.")
+
+    result = func(ratings, **kwargs)
+    prepare, default_within = KERNELS.get(func, (None, "raters"))
+    prepared = prepare(ratings, **kwargs) if prepare is not None and statistic == "value" else None
+    if prepared is None:
+        data = np.asarray(ratings)
+        kernel = partial(generic_kernel, func, kwargs, statistic)
+    else:
+        data, kernel = prepared
+
+    within = default_within if within is None else within
+    if within not in ("raters", "subjects"):
+        raise ValueError("within should be either 'raters' or 'subjects'.")
+
+    length, nslices = data.shape if within == "raters" else data.shape[::-1]
+    total = math.factorial(length)**(nslices - 1)
+    if exact is None:
+        exact = total <= n_perm + 1
+    if exact and total > 2**24:
+        raise ValueError(f"Too many permutations ({total}) for an exact test, use a Monte Carlo test instead.")
+
+    if batch_size is None:
+        batch_size = max(1, min(n_perm, 2**22 // max(data.size, 1)))
+
+    observed = kernel(data[None])[0]
+    sign = 1 if alternative == "greater" else -1
+    threshold = sign * observed - 1e-10 * max(1, abs(observed))  # ties with the observed value count as extreme
+
+    if exact:
+        args = ((kernel, data, within, order) for order in exact_orders(data.shape, within, batch_size))
+        worker = exact_chunk
+    else:
+        sizes = [batch_size] * (n_perm // batch_size) + ([n_perm % batch_size] if n_perm % batch_size else [])
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        args = ((kernel, data, within, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds))
+        worker = random_chunk
+
+    count = 0
+    done = 0
+    for values in run_chunks(worker, iter(args), n_jobs):
+        count += np.sum(sign * np.asarray(values) >= threshold)
+        done += len(values)
+        if not exact and tol is not None:
+            p = (count + 1) / (done + 1)
+            if np.sqrt(p * (1 - p) / done) < tol:
+                break
+
+    if exact:
+        pvalue = count / done
+        mc_error = 0.0
+    else:
+        pvalue = (count + 1) / (done + 1)
+        mc_error = np.sqrt(pvalue * (1 - pvalue) / done)
+
+    method = getattr(result, "method", None) or getattr(result, "name", func.__name__)
+    return PermutationResult(method, getattr(result, statistic), pvalue, done, exact, mc_error, alternative, result)
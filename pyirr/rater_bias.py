@@ -1,8 +1,9 @@
 import numpy as np
-import pandas as pd
 from scipy.stats import chi2
 
 from .IRR_result import IRR_result
+from .kappa2 import crosstab
+from .ratings import as_ratings
 
 
 def rater_bias(ratings):
@@ -18,7 +19,7 @@ def rater_bias(ratings):
     IRR_result
         Bias as an IRR_result dataclass.
     """
-    ratings = pd.DataFrame(ratings)
+    ratings = as_ratings(ratings)
 
     ns = ratings.shape[0]
     nr = ratings.shape[1]
@@ -26,7 +27,13 @@ def rater_bias(ratings):
     if nr > 2:
         raise Exception("More than two raters, cannot compute")
 
-    rbx = pd.crosstab(ratings.iloc[:, 0], ratings.iloc[:, 1])
+    return rater_bias_from_table(crosstab(ratings), ns)
+
+
+def rater_bias_from_table(rbx, ns):
+    """Computes the rater bias from the contingency table of two raters without unused levels and the number of
+    subjects"""
+    nr = 2
     rbb = np.sum(np.triu(rbx, k=len(rbx)//2 - 1))
     rbc = np.sum(np.tril(rbx, k=-len(rbx)//2 + 1))
     rb = np.abs(rbb/(rbb+rbc))
@@ -0,0 +1,171 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+def to_array(data):
+    """Converts ratings to a subjects * raters array and its column labels without copying when possible
+
+    NumPy arrays and memoryviews are wrapped as they are, DataFrames with a single dtype return a view of their
+    values. Arrow tables are converted column by column (zero-copy for columns without nulls) and stacked once.
+
+    Returns
+    -------
+    tuple
+        array and column labels
+
+    """
+    if isinstance(data, Ratings):
+        return data.values, data.columns
+    if isinstance(data, pd.DataFrame):
+        return data.to_numpy(), data.columns
+    if hasattr(data, "column_names") and hasattr(data, "columns"):  # pyarrow.Table
+        columns = [np.asarray(column.to_numpy()) for column in data.columns]
+        return np.column_stack(columns), pd.Index(data.column_names)
+
+    values = np.asarray(data)
+    if values.ndim != 2:  # e.g. a list of records or a single rater, let pandas build the table
+        frame = pd.DataFrame(data)
+        return frame.to_numpy(), frame.columns
+    return values, pd.RangeIndex(values.shape[1])
+
+
+class Ratings:
+    """A subjects * raters ratings container that is normalised once and can be passed to every measure. The missing
+    value mask, the factorized codes and the intermediates of the measures (category counts, pairwise contingency
+    tables, coincidence matrix) are computed on first use and cached, so measures do not copy or re-encode the ratings
+    on every call.
+
+    The values are exposed read-only, ratings should be changed with item assignment (or by assigning new values),
+    which invalidates the cache. The first item assignment copies the ratings, so the array or DataFrame they were
+    created from is never changed. Call invalidate after changing that array or DataFrame directly.
+
+    Parameters
+    ----------
+    data: array_like
+        subjects * raters array, DataFrame, Arrow table or memoryview
+
+    Examples
+    --------
+    >>> ratings = Ratings(diagnoses)
+    >>> kappam_fleiss(ratings), kappam_light(ratings)
+    >>> ratings[0, 1] = "Other"  # the next measure starts from scratch
+
+    """
+
+    def __init__(self, data):
+        self._cache = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._data, self.columns = to_array(data)
+        self._owned = False  # whether _data is a private copy, the caller's data is copied on the first write
+
+    def __array__(self, dtype=None):
+        return self.values if dtype is None else self.values.astype(dtype, copy=False)
+
+    def __setitem__(self, key, value):
+        if not self._owned:
+            self._data = self._data.copy()
+            self._owned = True
+        self._data[key] = value
+        self.invalidate()
+
+    @property
+    def values(self):
+        """Read-only view of the ratings"""
+        def compute():
+            view = self._data.view()
+            view.flags.writeable = False
+            return view
+        return self.cached("values", compute)
+
+    @values.setter
+    def values(self, data):
+        self._data, self.columns = to_array(data)
+        self._owned = False
+        self.invalidate()
+
+    def invalidate(self):
+        """Clears all cached intermediates"""
+        self._cache.clear()
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def ns(self):
+        return self.values.shape[0]
+
+    @property
+    def nr(self):
+        return self.values.shape[1]
+
+    def cached(self, name, compute):
+        """Returns the intermediate stored under name, compute() is called only the first time. Threads asking for the
+        same intermediate wait for the first one instead of computing it again."""
+        if name in self._cache:
+            return self._cache[name]
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._cache:
+                self._cache[name] = compute()
+        return self._cache[name]
+
+    @property
+    def missing(self):
+        """Mask of the missing ratings"""
+        def compute():
+            if self.values.dtype.kind == "f":
+                return np.isnan(self.values)
+            if self.values.dtype.kind == "O":
+                return np.asarray(pd.isna(self.values))
+            return np.zeros(self.shape, dtype=bool)  # integer, boolean and string ratings cannot be missing
+        return self.cached("missing", compute)
+
+    @property
+    def complete(self):
+        """Mask of the subjects without missing ratings"""
+        return self.cached("complete", lambda: ~self.missing.any(axis=1))
+
+    def dropna(self):
+        """Returns the ratings of the complete subjects, the array itself when nothing is missing"""
+        complete = self.complete
+        return self.values if complete.all() else self.values[complete]
+
+    def factorize(self):
+        """Integer codes of the sorted levels (-1 for missing ratings) and the levels, computed once"""
+        def compute():
+            codes, levels = pd.factorize(self.values.ravel(), sort=True)
+            return codes.reshape(self.shape), np.asarray(levels)
+        return self.cached("factorize", compute)
+
+    def complete_codes(self):
+        """Codes of the complete subjects and the levels they use, as if the incomplete subjects were dropped before
+        factorizing"""
+        def compute():
+            codes, levels = self.factorize()
+            complete = self.complete
+            if not complete.all():
+                codes = codes[complete]
+
+            used = np.bincount(codes.ravel(), minlength=len(levels)) > 0
+            if used.all():
+                return codes, levels
+            return (np.cumsum(used) - 1)[codes], levels[used]
+        return self.cached("complete_codes", compute)
+
+
+def as_ratings(ratings):
+    """Wraps ratings in a Ratings container, Ratings are returned as they are so their caches are reused"""
+    return ratings if isinstance(ratings, Ratings) else Ratings(ratings)
+
+
+def memoize(ratings, name, compute):
+    """Caches compute() on ratings if they are a Ratings container, other inputs are computed every time"""
+    return ratings.cached(name, compute) if isinstance(ratings, Ratings) else compute()
@@ -2,31 +2,77 @@ from pprint import pformat
 
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 from scipy.stats import f
-from statsmodels.formula.api import ols
 
 from .IRR_result import IRR_result
+from .parallel import SharedArray, run_shared
 
 
-def rel_inter_intra(ratings, nraters, rho_inter=0.6, rho_intra=0.8, conf_level=0.95):
-    """Calculates inter- and intra-rater reliability coefficients.
+def mean_squares(ratings, nraters):
+    """Closed-form mean squares of the balanced subject * rater * repetition design from its marginal means. The
+    design has to be balanced, every subject has all repetitions of every rater and missing values give NaN.
 
     Parameters
     ----------
-    ratings: array_like
-        dataframe or array of rater by object scores with consecutive measurements for each rater in adjacent columns
+    ratings: np.ndarray
+        subjects * (raters * repetitions) array with consecutive measurements of each rater in adjacent columns, without
+        missing values
     nraters: int
         number of raters
-    rho_inter: float
-        null hypothesis value for the inter-rater reliability coefficient
-    rho_intra: float
-        null hypothesis value for the intra-rater reliability coefficient
-    conf_level: float
-        confidence level for the one-sided confidence interval reported
+
+    Returns
+    -------
+    tuple
+        MSS, MSR, MSSR, MSE and the per-rater MSE
 
     """
-    ratings = pd.DataFrame(ratings)
+    nn = ratings.shape[0]
+    tt = nraters
+    mm = ratings.shape[1] // nraters
+
+    cube = ratings.reshape((nn, tt, mm))
+    cell_means = np.mean(cube, axis=2)
+    subject_means = np.mean(cell_means, axis=1)
+    rater_means = np.mean(cell_means, axis=0)
+    grand_mean = np.mean(cell_means)
+
+    interaction = cell_means - subject_means[:, None] - rater_means[None, :] + grand_mean
+    residual_ss = np.sum((cube - cell_means[:, :, None])**2, axis=(0, 2))  # per rater
+
+    MSS = mm * tt * np.sum((subject_means - grand_mean)**2) / (nn - 1)
+    MSR = mm * nn * np.sum((rater_means - grand_mean)**2) / (tt - 1)
+    MSSR = mm * np.sum(interaction**2) / ((nn - 1) * (tt - 1))
+    MSE = np.sum(residual_ss) / (nn * tt * (mm - 1))
+    MSEpart = residual_ss / (nn * (mm - 1))
+    return MSS, MSR, MSSR, MSE, MSEpart
+
+
+def rater_mean_square(ratings, rater, nraters):
+    """Residual mean square of the ordinary least squares fit of the repeated measurements of one rater on the
+    subjects, with a statsmodels formula"""
+    import statsmodels.api as sm
+    from statsmodels.formula.api import ols
+
+    ns = ratings.shape[0]
+    nmeas = ratings.shape[1] // nraters
+
+    frame = pd.DataFrame({"Subject": np.tile(np.arange(1, ns + 1), nmeas).astype(float),
+                          "Result": np.ravel(ratings[:, rater * nmeas:(rater + 1) * nmeas], order="F")})
+    frame["Subject"] = frame["Subject"].astype("category")
+
+    aov_act = ols('Result ~ Subject', data=frame).fit()
+    aov_act_table = sm.stats.anova_lm(aov_act, typ=2)
+    return (aov_act_table["sum_sq"] / aov_act_table["df"]).iloc[-1]
+
+
+def mean_squares_statsmodels(ratings, nraters, n_jobs=1):
+    """Mean squares from ordinary least squares fits with statsmodels formulas, see mean_squares. The per-rater fits
+    run in n_jobs processes that share the ratings, every fit is the same as in the serial computation."""
+    try:
+        import statsmodels.api as sm
+        from statsmodels.formula.api import ols
+    except ModuleNotFoundError:
+        raise ImportError("This engine requires the statsmodels library, please install that library first.")
 
     ns = ratings.shape[0]
     nmeas = ratings.shape[1] // nraters
@@ -40,27 +86,61 @@ def rel_inter_intra(ratings, nraters, rho_inter=0.6, rho_intra=0.8, conf_level=0
     frame1["Rater"] = frame1["Rater"].astype("category")
     frame1["Repetition"] = frame1["Repetition"].astype("category")
 
-    nn = ns  # aliases for compatibility with Eliasziw et al. notation
-    tt = nraters
-    mm = nmeas
-
-    mean_squares = []
     aov = ols('Result ~ Subject * Rater', data=frame1).fit()
     aov_table = sm.stats.anova_lm(aov, typ=2)
-    mean_squares.append(aov_table["sum_sq"] / aov_table["df"])
+    MSS, MSR, MSSR, MSE = (aov_table["sum_sq"] / aov_table["df"]).iloc[:4]
+
+    if n_jobs == 1:
+        MSEpart = [rater_mean_square(ratings, rater, nraters) for rater in range(nraters)]
+    else:
+        with SharedArray(ratings) as shared:
+            MSEpart = run_shared(rater_mean_square, shared.handle, range(nraters), n_jobs, nraters)
+    return MSS, MSR, MSSR, MSE, np.array(MSEpart)
+
+
+def rel_inter_intra(ratings, nraters, rho_inter=0.6, rho_intra=0.8, conf_level=0.95, engine="numpy", n_jobs=1):
+    """Calculates inter- and intra-rater reliability coefficients.
+
+    Parameters
+    ----------
+    ratings: array_like
+        dataframe or array of rater by object scores with consecutive measurements for each rater in adjacent columns
+    nraters: int
+        number of raters
+    rho_inter: float
+        null hypothesis value for the inter-rater reliability coefficient
+    rho_intra: float
+        null hypothesis value for the intra-rater reliability coefficient
+    conf_level: float
+        confidence level for the one-sided confidence interval reported
+    engine: {"numpy", "statsmodels"}
+        compute the mean squares in closed form from the marginal means, or with (much slower) statsmodels ANOVA fits.
+        The closed form needs a balanced design, ratings with missing values are always fitted with statsmodels (which
+        then has to be installed), the fits drop the missing measurements.
+    n_jobs: int
+        number of processes for the per-rater fits of the statsmodels engine, the numpy engine computes all raters at
+        once
+
+    """
+    ratings = np.asarray(ratings, dtype=float)
 
-    for rater_act in frame1["Rater"].cat.categories:
-        aov_act = ols('Result ~ Subject', data=frame1[frame1["Rater"] == rater_act]).fit()
-        aov_act_table = sm.stats.anova_lm(aov_act, typ=2)
-        mean_squares.append((aov_act_table["sum_sq"] / aov_act_table["df"]).iloc[-1])
+    ns = ratings.shape[0]
+    nmeas = ratings.shape[1] // nraters
+
+    nn = ns  # aliases for compatibility with Eliasziw et al. notation
+    tt = nraters
+    mm = nmeas
 
-    MSS = mean_squares[0][0]
-    MSR = mean_squares[0][1]
-    MSSR = mean_squares[0][2]
-    MSE = mean_squares[0][3]
+    if engine == "numpy" and not np.isnan(ratings).any():
+        MSS, MSR, MSSR, MSE, MSEpart = mean_squares(ratings, nraters)
+    elif engine == "numpy":
+        MSS, MSR, MSSR, MSE, MSEpart = mean_squares_statsmodels(ratings, nraters, n_jobs)  # unbalanced design
+    elif engine == "statsmodels":
+        MSS, MSR, MSSR, MSE, MSEpart = mean_squares_statsmodels(ratings, nraters, n_jobs)
+    else:
+        raise ValueError("Engine should be either 'numpy' or 'statsmodels'.")
 
     # the same for random and fixed, see table 2 (p. 780) and 3 (p.281)
-    MSEpart = np.array(mean_squares[1:])
     sighat2Srandom = (MSS - MSSR) / (mm * tt)
     sighat2Rrandom = (MSR - MSSR) / (mm * nn)
     sighat2SRrandom = (MSSR - MSE) / mm
@@ -0,0 +1,137 @@
+import numpy as np
+from scipy import sparse
+from scipy.linalg import cho_factor, cho_solve
+from scipy.optimize import minimize
+
+
+class CrossedDesign:
+    """Sufficient statistics of the unbalanced subjects * raters design of the observed ratings"""
+
+    def __init__(self, subjects, raters, values, ns, nr):
+        self.n = len(values)
+        self.ns, self.nr = ns, nr
+        self.yy = values @ values
+        self.y_total = np.sum(values)
+
+        self.n_subject = np.bincount(subjects, minlength=ns).astype(float)
+        self.n_rater = np.bincount(raters, minlength=nr).astype(float)
+        self.y_subject = np.bincount(subjects, weights=values, minlength=ns)
+        self.y_rater = np.bincount(raters, weights=values, minlength=nr)
+        self.counts = sparse.csr_matrix((np.ones(self.n), (subjects, raters)), shape=(ns, nr))
+
+        # coupling of the subjects with [mu, raters] in the mixed model equations
+        self.coupling = sparse.hstack([self.n_subject[:, None], self.counts]).tocsr()
+        self.coupling_t = self.coupling.T.tocsr()
+
+
+def reml_objective(theta, design, twoway=True):
+    """-2 REML log-likelihood of y = mu + s_i (+ r_j) + e_ij for theta = log variances of (subjects, [raters,] error)
+
+    The mixed model equations are solved by eliminating the diagonal subject block, which leaves a dense system of
+    1 + raters unknowns, so the cost scales with the number of observed ratings.
+    """
+    var_e = np.exp(theta[-1])
+    gamma_s = np.exp(theta[0]) / var_e
+
+    d = design.n_subject + 1 / gamma_s  # diagonal subject block of Z'Z + inv(Gamma)
+    logdet = np.sum(np.log(d)) + design.ns * np.log(gamma_s)
+
+    # the [mu, raters] block and its coupling with the subjects
+    if twoway:
+        gamma_r = np.exp(theta[1]) / var_e
+        a = np.diag(np.concatenate([[design.n], design.n_rater + 1 / gamma_r]))
+        a[0, 1:] = a[1:, 0] = design.n_rater
+        b, bt = design.coupling, design.coupling_t
+        rhs = np.concatenate([[design.y_total], design.y_rater])
+        logdet += design.nr * np.log(gamma_r)
+    else:
+        a = np.array([[design.n]])
+        b = design.coupling[:, :1]
+        bt = b.T
+        rhs = np.array([design.y_total])
+
+    schur = a - (bt @ sparse.diags(1 / d) @ b).toarray()
+    factor = cho_factor(schur)
+    logdet += 2 * np.sum(np.log(np.diag(factor[0])))
+
+    small = cho_solve(factor, rhs - bt @ (design.y_subject / d))
+    subject = (design.y_subject - b @ small) / d
+    quadratic = design.yy - rhs @ small - design.y_subject @ subject
+
+    return (design.n - 1) * np.log(var_e) + logdet + quadratic / var_e
+
+
+def numerical_hessian(func, x, step=1e-4):
+    k = len(x)
+    hessian = np.zeros((k, k))
+    for i in range(k):
+        for j in range(i, k):
+            ei, ej = np.eye(k)[i] * step, np.eye(k)[j] * step
+            hessian[i, j] = hessian[j, i] = (func(x + ei + ej) - func(x + ei - ej) - func(x - ei + ej) +
+                                             func(x - ei - ej)) / (4 * step**2)
+    return hessian
+
+
+def fit_variance_components(subjects, raters, values, ns, nr, twoway=True):
+    """Fits the variance components of the subjects (and raters) random effects model by REML
+
+    Parameters
+    ----------
+    subjects, raters: array_like
+        integer subject and rater index of every observed rating
+    values: array_like
+        observed ratings
+    ns, nr: int
+        number of subjects and raters
+    twoway: bool
+        whether raters are a random effect
+
+    Returns
+    -------
+    tuple
+        log variances (subjects, [raters,] error), their asymptotic covariance and the design statistics
+
+    """
+    design = CrossedDesign(np.asarray(subjects), np.asarray(raters), np.asarray(values, dtype=float), ns, nr)
+
+    total = np.log(np.var(values)) if np.var(values) > 0 else 0.
+    start = np.full(3 if twoway else 2, total - np.log(3 if twoway else 2))
+    bounds = [(total - 30, total + 5)] * len(start)  # allows components of practically zero
+
+    def objective(theta):
+        return reml_objective(theta, design, twoway)
+
+    fit = minimize(objective, start, method="L-BFGS-B", bounds=bounds, options={"ftol": 1e-12, "gtol": 1e-8})
+
+    with np.errstate(all="ignore"):
+        information = numerical_hessian(objective, fit.x) / 2
+        try:
+            covariance = np.linalg.inv(information)
+        except np.linalg.LinAlgError:
+            covariance = np.full_like(information, np.nan)
+    return fit.x, covariance, design
+
+
+def subject_f_test(design, twoway=True):
+    """F-test of the subject effect (r0 = 0) in the unbalanced design, adjusted for raters in the twoway model"""
+    n, ns = design.n, design.ns
+    fit_subjects = np.sum(design.y_subject**2 / design.n_subject)
+
+    if not twoway:
+        ss_subjects = fit_subjects - design.y_total**2 / n
+        ss_error = design.yy - fit_subjects
+        df1, df2 = ns - 1, n - ns
+    else:
+        # least squares with subject and rater effects, subjects eliminated
+        nd = design.counts.multiply(1 / design.n_subject[:, None]).tocsr()
+        schur = np.diag(design.n_rater) - np.asarray((design.counts.T @ nd).todense())
+        adjusted = design.y_rater - nd.T @ design.y_subject
+        rank = np.linalg.matrix_rank(schur)
+        fit_full = fit_subjects + adjusted @ np.linalg.lstsq(schur, adjusted, rcond=None)[0]
+
+        ss_subjects = fit_full - np.sum(design.y_rater**2 / design.n_rater)
+        ss_error = design.yy - fit_full
+        df1, df2 = ns - 1, n - ns - rank
+
+    Fvalue = (ss_subjects / df1) / (ss_error / df2)
+    return Fvalue, df1, df2
@@ -0,0 +1,141 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .agree import agree
+from .bhapkar import bhapkar
+from .anova import complete_anova
+from .correlation import complete_correlation
+from .finn import finn
+from .intraclass_correlation import ICC_result, intraclass_correlation
+from .kappa2 import contingency_tables, kappa2
+from .kappam_fleiss import category_counts, kappam_fleiss
+from .kappam_light import kappam_light
+from .kendall import complete_ranks, kendall
+from .kripp_alpha import kripp_alpha
+from .meancor import meancor
+from .meanrho import meanrho
+from .rater_bias import rater_bias
+from .ratings import as_ratings
+from .robinson import robinson
+from .stuart_maxwell_mh import stuart_maxwell_mh
+
+MEASURES = {
+    "agree": agree,
+    "kappa2": kappa2,
+    "kappam_fleiss": kappam_fleiss,
+    "kappam_light": kappam_light,
+    "kripp_alpha": kripp_alpha,
+    "intraclass_correlation": intraclass_correlation,
+    "kendall": kendall,
+    "meancor": meancor,
+    "meanrho": meanrho,
+    "finn": finn,
+    "robinson": robinson,
+    "bhapkar": bhapkar,
+    "stuart_maxwell_mh": stuart_maxwell_mh,
+    "rater_bias": rater_bias,
+}
+
+DEFAULT_MEASURES = ["agree", "kappam_fleiss", "kappam_light", "kripp_alpha", "intraclass_correlation", "kendall",
+                    "meancor", "meanrho"]
+
+# shared intermediates of every measure, computed once on the Ratings before the measures run
+INTERMEDIATES = {
+    kappam_fleiss: [category_counts],
+    kappam_light: [contingency_tables],
+    intraclass_correlation: [complete_anova],
+    finn: [complete_anova],
+    robinson: [complete_anova],
+    kendall: [complete_ranks],
+    meancor: [lambda ratings: complete_correlation(ratings, "pearson")],
+    meanrho: [lambda ratings: complete_correlation(ratings, "spearman")],
+}
+
+COLUMNS = ["measure", "method", "subjects", "raters", "irr_name", "value", "statistic", "stat_name", "pvalue",
+           "lower_bound", "upper_bound", "error", "seconds"]
+RESULT_COLUMNS = COLUMNS[1:-1]  # the columns of a result without measure and seconds
+
+
+def result_row(result):
+    """Flattens an IRR_result or ICC_result to a row of the report"""
+    if isinstance(result, ICC_result):
+        return {"method": f"Intraclass correlation ({result.model}, {result.mtype}, {result.name})",
+                "subjects": result.subjects, "raters": result.raters, "irr_name": result.name, "value": result.value,
+                "statistic": result.Fvalue, "stat_name": f"F({result.df1:.0f},{result.df2:.0f})",
+                "pvalue": result.pvalue, "lower_bound": result.lower_bound, "upper_bound": result.upper_bound}
+    return {column: getattr(result, column) for column in RESULT_COLUMNS}
+
+
+def timed(func, *args, **kwargs):
+    """Calls func and returns its result (or the exception it raised) and the elapsed seconds"""
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as error:
+        result = error
+    return result, time.perf_counter() - start
+
+
+def report(ratings, measures=None, options=None, n_threads=None):
+    """Computes a battery of agreement and reliability measures of the same ratings. The ratings are normalised once
+    and the intermediates the measures share (factorized codes, category counts, pairwise contingency tables, ANOVA
+    sums, ranks and correlation matrices) are planned and computed exactly once before the measures run concurrently in
+    a thread pool, the NumPy reductions release the GIL.
+
+    Parameters
+    ----------
+    ratings: array_like
+        subjects * raters array, dataframe or Ratings
+    measures: list
+        names of the measures (see MEASURES) or callables that return an IRR_result or ICC_result, by default agree,
+        kappam_fleiss, kappam_light, kripp_alpha, intraclass_correlation, kendall, meancor and meanrho
+    options: dict
+        further arguments of the measures by name, e.g. {"kripp_alpha": {"method": "ordinal"}}
+    n_threads: int
+        number of threads, by default one per measure
+
+    Returns
+    -------
+    DataFrame
+        one row per measure with its coefficient, test statistic, p-value, confidence interval, error message (also of
+        measures that do not apply to the ratings, e.g. correlations of nominal ratings) and the seconds it took. The
+        seconds spent on the shared intermediates are in the attrs of the DataFrame.
+
+    """
+    ratings = as_ratings(ratings)
+    measures = DEFAULT_MEASURES if measures is None else measures
+    options = {} if options is None else options
+
+    funcs = []
+    for measure in measures:
+        if callable(measure):
+            funcs.append((measure.__name__, measure))
+        elif measure in MEASURES:
+            funcs.append((measure, MEASURES[measure]))
+        else:
+            raise ValueError(f"Unknown measure '{measure}', choose one of {', '.join(MEASURES)} or pass a function.")
+
+    plan = []
+    for _, func in funcs:
+        plan += [step for step in INTERMEDIATES.get(func, []) if step not in plan]
+
+    n_threads = max(len(funcs), 1) if n_threads is None else n_threads
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        # errors of the intermediates are raised again by the measures that need them
+        shared = list(executor.map(lambda step: timed(step, ratings)[1], plan))
+        results = list(executor.map(lambda item: timed(item[1], ratings, **options.get(item[0], {})), funcs))
+
+    rows = []
+    for (name, _), (result, seconds) in zip(funcs, results):
+        if isinstance(result, Exception):
+            row = {"method": None, "subjects": ratings.ns, "raters": ratings.nr, "value": np.nan, "error": str(result)}
+        else:
+            row = result_row(result)
+        rows.append({**row, "measure": name, "seconds": seconds})
+
+    frame = pd.DataFrame(rows, columns=COLUMNS)
+    frame.attrs["intermediates_seconds"] = float(np.sum(shared))
+    return frame
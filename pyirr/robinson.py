@@ -1,5 +1,4 @@
-import numpy as np
-
+from .anova import complete_anova
 from .IRR_result import IRR_result
 
 
@@ -17,17 +16,12 @@ def robinson(ratings):
         Returns Robinson's A as an IRR_result dataclass.
 
     """
-    ratings = np.asarray(ratings)  # make sure ratings is not a list or DataFrame
-
-    ratings = ratings[~np.isnan(ratings).any(axis=1)]  # drop nans
-
-    ns = ratings.shape[0]
-    nr = ratings.shape[1]
+    sums = complete_anova(ratings)  # subjects with missing ratings are dropped
+    ns = sums.ns
+    nr = sums.nr
 
-    SS_total = np.cov(np.ravel(ratings)) * (ns * nr - 1)
-    SSb = np.cov(ratings.mean(axis=1)) * nr * (ns - 1)
-    SSw = np.cov(ratings.mean(axis=0)) * ns * (nr - 1)
-    SSr = SS_total - SSb - SSw
+    SSb = sums.SSr  # between subjects
+    SSr = sums.SSe  # residual
 
     coeff = SSb / (SSb + SSr)
 
@@ -0,0 +1,408 @@
+import inspect
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .agree import agree, agree_from_table
+from .bhapkar import bhapkar, bhapkar_from_table
+from .IRR_result import IRR_result
+from .kappa2 import Kappa2Accumulator, kappa2, kappa2_from_table, kappa_from_tables, trim_table, weight_table
+from .kernels import contingency_table
+from .kripp_alpha import (alpha_from_coincidences, alpha_value, coincidence_from_codes, dense_codes, get_metric,
+                          kripp_alpha, unit_coincidences)
+from .rater_bias import rater_bias, rater_bias_from_table
+from .ratings import as_ratings
+from .report import MEASURES, RESULT_COLUMNS, result_row
+from .stuart_maxwell_mh import stuart_maxwell_from_table, stuart_maxwell_mh
+
+
+def table_kappa2(ttab, levels, subjects, weight="unweighted", sort_levels=False):
+    return kappa2_from_table(ttab, weight)
+
+
+def table_bhapkar(ttab, levels, subjects):
+    return bhapkar_from_table(ttab)
+
+
+def table_stuart_maxwell(ttab, levels, subjects):
+    return stuart_maxwell_from_table(trim_table(ttab))
+
+
+def table_rater_bias(ttab, levels, subjects):
+    return rater_bias_from_table(trim_table(ttab), subjects)
+
+
+def table_agree(ttab, levels, subjects, tolerance=0, numeric=True):
+    return agree_from_table(ttab, levels, tolerance, numeric)
+
+
+# measures of two raters that only need their contingency table over the used levels and the number of subjects
+TABLE_MEASURES = {
+    kappa2: table_kappa2,
+    bhapkar: table_bhapkar,
+    stuart_maxwell_mh: table_stuart_maxwell,
+    rater_bias: table_rater_bias,
+    agree: table_agree,
+}
+
+
+def get_measure(measure):
+    func = MEASURES.get(measure) if isinstance(measure, str) else measure
+    if func not in TABLE_MEASURES and func is not kripp_alpha:
+        raise ValueError("Windows support kappa2, bhapkar, stuart_maxwell_mh, rater_bias, agree and kripp_alpha.")
+    return func
+
+
+class ContingencyWindow(Kappa2Accumulator):
+    """Keeps the contingency table of two raters over a window of subjects, subjects can be added when they enter the
+    window and removed when they leave it. An update costs O(c^2) for c categories, Cohen's Kappa, Bhapkar's and the
+    Stuart-Maxwell test, the rater bias and the percentage agreement are computed from the table of the window.
+
+    Parameters
+    ----------
+    weight: {"unweighted", "equal", "squared"} or array_like
+        weights of Cohen's Kappa
+    levels: array_like
+        known levels, new levels are added when they are encountered
+
+    Examples
+    --------
+    >>> window = ContingencyWindow()
+    >>> for new, old in stream:
+    ...     window.add(new).remove(old)
+    ...     window.result("kappa2").value
+
+    """
+
+    def __init__(self, weight="unweighted", levels=None):
+        super().__init__(weight, levels)
+        self.subjects = 0
+
+    def chunk_table(self, chunk):
+        """Contingency table of a subjects * 2 chunk over the levels of the window"""
+        ratings = as_ratings(chunk)
+        if ratings.shape[1] > 2:
+            raise Exception("Number of raters exceeds 2. Try kappam_fleiss or kappam_light")
+
+        codes, levels = ratings.complete_codes()
+        index = self.add_levels(levels)[codes]
+        nc = len(self.levels)
+        return contingency_table(index[:, 0], index[:, 1], nc), ratings.shape[0]
+
+    def update(self, chunk):
+        """Adds a subjects * 2 chunk of ratings to the window, subjects with missing ratings only count as subjects"""
+        table, subjects = self.chunk_table(chunk)
+        self.table += table
+        self.subjects += subjects
+        return self
+
+    add = update
+
+    def remove(self, chunk):
+        """Removes a subjects * 2 chunk of ratings that was added before"""
+        table, subjects = self.chunk_table(chunk)
+        if np.any(table > self.table) or subjects > self.subjects:
+            raise ValueError("Only ratings that were added to the window can be removed.")
+        self.table -= table
+        self.subjects -= subjects
+        return self
+
+    def merge(self, other):
+        """Adds the contingency table and subjects of another window"""
+        super().merge(other)
+        self.subjects += getattr(other, "subjects", 0)
+        return self
+
+    def window_table(self):
+        """Contingency table of the window over the sorted levels used by either rater, and these levels"""
+        order = np.argsort(self.levels)
+        ttab = self.table[np.ix_(order, order)]
+        used = (np.sum(ttab, axis=1) > 0) | (np.sum(ttab, axis=0) > 0)
+        return ttab[np.ix_(used, used)], np.asarray(self.levels)[order][used]
+
+    def result(self, measure="kappa2", **kwargs):
+        """Computes a measure of the ratings in the window
+
+        Parameters
+        ----------
+        measure: str or callable
+            kappa2 (with the weights of the window), bhapkar, stuart_maxwell_mh, rater_bias or agree
+        kwargs:
+            further arguments of the measure
+
+        Returns
+        -------
+        IRR_result
+            the result of the measure
+
+        """
+        func = get_measure(measure)
+        if func is kripp_alpha:
+            raise ValueError("Krippendorff's alpha needs a CoincidenceWindow.")
+        if func is kappa2:
+            kwargs.setdefault("weight", self.weight)
+        ttab, levels = self.window_table()
+        return TABLE_MEASURES[func](ttab, levels, self.subjects, **kwargs)
+
+
+class CoincidenceWindow:
+    """Keeps the coincidence matrix of Krippendorff's alpha over a window of units, units can be added when they enter
+    the window and removed when they leave it. An update costs O(c^2) for c distinct values.
+
+    Parameters
+    ----------
+    method: {"nominal", "ordinal", "interval", "ratio", "circular", "bipolar"} or callable
+        data level of the values, see kripp_alpha
+
+    """
+
+    def __init__(self, method="nominal"):
+        self.method = method
+        self.levels = []
+        self.lookup = {}
+        self.value_counts = np.zeros(0)
+        self.coincidences = np.zeros((0, 0))  # pairs weighted by 1 / (m_u - 1)
+        self.pairs = np.zeros((0, 0))  # unweighted pairs, used when no value in the window is missing
+        self.units = 0
+        self.incomplete = 0
+        self.ncoders = 0
+
+    def add_levels(self, levels):
+        """Adds new values and returns the index of every value"""
+        new = [level for level in levels if level not in self.lookup]
+        for level in new:
+            self.lookup[level] = len(self.levels)
+            self.levels.append(level)
+
+        if new:
+            nval, old = len(self.levels), len(self.value_counts)
+            self.value_counts = np.append(self.value_counts, np.zeros(len(new)))
+            for name in ("coincidences", "pairs"):
+                matrix = np.zeros((nval, nval))
+                matrix[:old, :old] = getattr(self, name)
+                setattr(self, name, matrix)
+        return np.array([self.lookup[level] for level in levels], dtype=int)
+
+    def chunk_coincidences(self, chunk):
+        """Value counts, coincidences and number of (incomplete) units of a units * coders chunk"""
+        array = np.asarray(chunk, dtype=float)
+        if array.shape[1] != self.ncoders and self.units:
+            raise ValueError("All units of a window should have the same coders.")
+        self.ncoders = array.shape[1]
+
+        units, codes, levx, nunits, _, _ = dense_codes(array.T)
+        index = self.add_levels(levx)[codes]
+        nval = len(self.levels)
+        return (np.bincount(index, minlength=nval), coincidence_from_codes(units, index, nunits, nval, True),
+                coincidence_from_codes(units, index, nunits, nval, False), nunits,
+                int(np.sum(np.isnan(array).any(axis=1))))
+
+    def update(self, chunk):
+        """Adds a units * coders chunk of ratings to the window"""
+        value_counts, coincidences, pairs, units, incomplete = self.chunk_coincidences(chunk)
+        self.value_counts += value_counts
+        self.coincidences += coincidences
+        self.pairs += pairs
+        self.units += units
+        self.incomplete += incomplete
+        return self
+
+    add = update
+
+    def remove(self, chunk):
+        """Removes a units * coders chunk of ratings that was added before"""
+        value_counts, coincidences, pairs, units, incomplete = self.chunk_coincidences(chunk)
+        if np.any(value_counts > self.value_counts) or units > self.units:
+            raise ValueError("Only ratings that were added to the window can be removed.")
+        self.value_counts -= value_counts
+        self.coincidences -= coincidences
+        self.pairs -= pairs
+        self.units -= units
+        self.incomplete -= incomplete
+        return self
+
+    def result(self, method=None):
+        """Computes Krippendorff's alpha of the units in the window
+
+        Parameters
+        ----------
+        method: str or callable
+            data level of the values, by default the method of the window
+
+        Returns
+        -------
+        IRR_result
+            Returns Krippendorff's coefficient as an IRR_result dataclass.
+
+        """
+        method = self.method if method is None else method
+        metric = get_metric(method)
+        if callable(method):
+            method = method.__name__
+
+        order = np.argsort(self.levels)
+        used = order[self.value_counts[order] > 0]
+
+        # like kripp_alpha, pairs are only weighted by 1 / (m_u - 1) when values are missing
+        cm = (self.coincidences if self.incomplete else self.pairs)[np.ix_(used, used)]
+        value = alpha_value(cm, np.sum(cm), np.asarray(self.levels)[used], metric)
+        return IRR_result(f"Krippendorff's alpha ({method})", self.units, self.ncoders, "alpha", value)
+
+
+def window_bounds(n, window, step, times):
+    """First and last (exclusive) subject of every window, windows of count size end every step subjects, windows
+    of a time span end at every step-th subject and contain the subjects of the span (start, end]"""
+    if times is None:
+        ends = np.arange(window, n + 1, step)
+        return ends - window, ends
+
+    times = pd.Index(times)
+    if len(times) != n or not times.is_monotonic_increasing:
+        raise ValueError("times should be sorted and have one entry per subject.")
+    if isinstance(window, str):
+        window = pd.Timedelta(window)
+    ends = np.arange(1, n + 1, step)
+    return np.searchsorted(times, times[ends - 1] - window, side="right"), ends
+
+
+def level_patterns(used):
+    """Groups the windows by the levels they use, measures of windows with the same levels are computed at once"""
+    patterns, inverse = np.unique(used, axis=0, return_inverse=True)
+    return [(pattern, np.flatnonzero(inverse.ravel() == k)) for k, pattern in enumerate(patterns)]
+
+
+def window_sums(subjects, cells, width, starts, ends, weights=1):
+    """Sums of the weights scattered into width cells over the subjects [start, end) of every window. Only the sums
+    between consecutive window bounds are accumulated, so memory grows with the number of windows times width and not
+    with the number of subjects."""
+    bounds, index = np.unique(np.concatenate([starts, ends]), return_inverse=True)
+    segments = np.searchsorted(bounds, subjects, side="right")  # segment k holds [bounds[k - 1], bounds[k])
+    weights = np.broadcast_to(weights, np.shape(subjects))
+    sums = sparse.coo_matrix((weights, (segments, cells)), shape=(len(bounds) + 1, width)).toarray()
+    totals = np.cumsum(sums[:-1], axis=0)  # totals[k] sums the subjects before bounds[k]
+    return totals[index[len(starts):]] - totals[index[:len(starts)]]
+
+
+def rolling_tables(ratings, starts, ends):
+    """Contingency tables of two raters of every window over all sorted levels"""
+    ratings = as_ratings(ratings)
+    if ratings.shape[1] != 2:
+        raise Exception("Windows of contingency tables need exactly 2 raters")
+
+    codes, levels = ratings.factorize()
+    complete = np.flatnonzero(ratings.complete)
+    nlev = len(levels)
+    tables = window_sums(complete, codes[complete, 0] * nlev + codes[complete, 1], nlev**2, starts, ends)
+    return tables.reshape((-1, nlev, nlev)), levels
+
+
+def rolling_alpha(ratings, starts, ends, method):
+    """Krippendorff's alpha of every window from the sums of the coincidences of its units"""
+    array = np.asarray(ratings, dtype=float)
+    nunits = array.shape[0]
+    units, codes, levx, _, _, _ = dense_codes(array.T)
+    nval = len(levx)
+
+    # like kripp_alpha, pairs are only weighted by 1 / (m_u - 1) in windows with missing values
+    incomplete = np.cumsum(np.append(0, np.isnan(array).any(axis=1)))
+    normalise = incomplete[ends] > incomplete[starts]
+    cm = np.zeros((len(ends), nval**2))
+    for weighted in (True, False):
+        contributions = unit_coincidences(units, codes, nunits, nval, normalise=weighted).tocoo()
+        windows = normalise == weighted
+        cm[windows] = window_sums(contributions.row, contributions.col, nval**2, starts[windows], ends[windows],
+                                  contributions.data)
+    cm = cm.reshape((-1, nval, nval))
+    window_counts = window_sums(units, codes, nval, starts, ends)
+
+    metric = get_metric(method)
+    name = method.__name__ if callable(method) else method
+    value = np.ones(len(ends))
+    for used, rows in level_patterns(window_counts > 0):
+        if np.sum(used) > 1:
+            window_cm = cm[rows][:, used][:, :, used]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                delta = metric(levx[used], np.sum(window_cm, axis=2))
+                value[rows] = alpha_from_coincidences(window_cm, np.sum(window_cm, axis=(1, 2)), delta)
+
+    return {"method": f"Krippendorff's alpha ({name})", "subjects": ends - starts, "raters": array.shape[1],
+            "irr_name": "alpha", "value": value}
+
+
+def rolling(ratings, window, measure="kappa2", step=1, times=None, **kwargs):
+    """Computes an agreement measure over a sliding window of time-ordered subjects, e.g. to monitor rater drift over
+    the last N items or the last T hours. The tables of all windows are differences of cumulative sums of the tables
+    between the window bounds, so the ratings are read once. Kappa, the percentage agreement and Krippendorff's alpha
+    are computed at once for all windows that use the same levels, the other measures from the table of every window.
+
+    Parameters
+    ----------
+    ratings: array_like
+        time-ordered subjects * raters array or dataframe, two raters for the contingency table measures
+    window: int, str or timedelta
+        number of subjects in a window, or the time span of a window (e.g. "2h") when times are given
+    measure: str or callable
+        kappa2, bhapkar, stuart_maxwell_mh, rater_bias, agree or kripp_alpha
+    step: int
+        a window ends at every step-th subject
+    times: array_like
+        sorted time of every subject for windows of a time span
+    kwargs:
+        further arguments of the measure, e.g. weight of kappa2 or method of kripp_alpha
+
+    Returns
+    -------
+    DataFrame
+        one row per window with the coefficient, test statistic, p-value and error message, indexed by the label (or the
+        time) of the last subject of the window
+
+    """
+    func = get_measure(measure)
+    n = len(ratings)
+    starts, ends = window_bounds(n, window, step, times)
+    labels = pd.Index(times) if times is not None else getattr(ratings, "index", pd.RangeIndex(n))
+    index = labels[ends - 1]
+
+    # the arguments are checked once, so a wrong keyword raises instead of filling every window with an error
+    if func is kripp_alpha:
+        inspect.signature(kripp_alpha).bind(ratings, **kwargs)
+    else:
+        inspect.signature(TABLE_MEASURES[func]).bind(None, None, None, **kwargs)
+
+    if func is kripp_alpha:
+        columns = rolling_alpha(ratings, starts, ends, kwargs.get("method", "nominal"))
+        return pd.DataFrame(columns, index=index).reindex(columns=RESULT_COLUMNS)
+
+    tables, levels = rolling_tables(ratings, starts, ends)
+    subjects = ends - starts
+
+    if func is agree:
+        # the agreement does not change when levels that are not used in a window are part of its table
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = agree_from_table(tables, levels, **kwargs)
+        columns = {"method": result.method, "subjects": result.subjects, "raters": 2, "irr_name": "%-agree",
+                   "value": result.value}
+        return pd.DataFrame(columns, index=index).reindex(columns=RESULT_COLUMNS)
+
+    if func is kappa2:
+        # the weights depend on the levels used in a window, windows using the same levels are computed at once
+        weight = kwargs.get("weight", "unweighted")
+        columns = {column: np.full(len(ends), np.nan) for column in ("value", "statistic", "pvalue")}
+        for used, rows in level_patterns((np.sum(tables, axis=1) > 0) | (np.sum(tables, axis=2) > 0)):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                value, u, pvalue = kappa_from_tables(tables[rows][:, used][:, :, used], weight_table(weight, sum(used)))
+            columns["value"][rows], columns["statistic"][rows], columns["pvalue"][rows] = value, u, pvalue
+        columns.update({"method": f"Cohen's Kappa for 2 Raters (Weights: {weight})", "irr_name": "Kappa",
+                        "subjects": np.sum(tables, axis=(1, 2)).astype(int), "raters": 2, "stat_name": "z"})
+        return pd.DataFrame(columns, index=index).reindex(columns=RESULT_COLUMNS)
+
+    rows = []
+    for ttab, ns in zip(tables, subjects):
+        used = (np.sum(ttab, axis=1) > 0) | (np.sum(ttab, axis=0) > 0)
+        try:
+            row = result_row(TABLE_MEASURES[func](ttab[np.ix_(used, used)], levels[used], ns, **kwargs))
+        except (ValueError, ZeroDivisionError) as error:  # e.g. too many equal marginals in the window
+            row = {"subjects": ns, "raters": 2, "value": np.nan, "error": str(error)}
+        rows.append(row)
+    return pd.DataFrame(rows, index=index, columns=RESULT_COLUMNS)
@@ -1,8 +1,8 @@
 import numpy as np
-import pandas as pd
 from scipy.stats import chi2
 
 from .IRR_result import IRR_result
+from .kappa2 import crosstab
 
 
 def stuart_maxwell_mh(ratings):
@@ -19,32 +19,26 @@ def stuart_maxwell_mh(ratings):
         Stuart-Maxwell coefficient in an IRR_result dataclass.
 
     """
-    ratings = pd.DataFrame(ratings)
+    return stuart_maxwell_from_table(crosstab(ratings))
 
-    smx = pd.crosstab(ratings.iloc[:, 0], ratings.iloc[:, 1])
-    smx = np.array(smx)
 
+def stuart_maxwell_from_table(smx):
+    """Computes the Stuart-Maxwell test from the contingency table of two raters without unused levels"""
     rowsums = np.sum(smx, axis=1)
     colsums = np.sum(smx, axis=0)
     equalsums = rowsums == colsums
 
     if np.any(equalsums):
-        smx = smx[~equalsums, ~equalsums]
+        smx = smx[np.ix_(~equalsums, ~equalsums)]
         if smx.shape[0] < 2:
-            raise Exception("Too many equal marginals, cannot compute")
+            raise ValueError("Too many equal marginals, cannot compute")
         rowsums = np.sum(smx, axis=1)
         colsums = np.sum(smx, axis=0)
 
     k_minus1 = len(rowsums) - 1
     smd = (rowsums - colsums)[:k_minus1]
-    smS = np.zeros((k_minus1, k_minus1))
-
-    for i in range(k_minus1):
-        for j in range(k_minus1):
-            if i == j:
-                smS[i, j] = rowsums[i] + colsums[j] - 2 * smx[i, j]
-            else:
-                smS[i, j] = -(smx[i, j] + smx[j, i])
+    # variances of the marginal differences on the diagonal, covariances -(n_ij + n_ji) elsewhere
+    smS = (np.diag(rowsums + colsums) - smx - smx.T)[:k_minus1, :k_minus1]
 
     smstat = smd.T @ np.linalg.inv(smS) @ smd
 
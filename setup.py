@@ -1,11 +1,35 @@
 import os
-from setuptools import setup
+from setuptools import Extension, setup
+from setuptools.command.build_ext import build_ext
 
 
 def read(filename):
     return open(os.path.join(os.path.dirname(__file__), filename)).read()
 
 
+class optional_build_ext(build_ext):
+    """The compiled kernels are optional, pyirr falls back to NumPy when they cannot be built"""
+
+    def run(self):
+        try:
+            super().run()
+        except Exception as error:
+            print(f"Skipping the compiled kernels: {error}")
+
+    def build_extension(self, ext):
+        try:
+            super().build_extension(ext)
+        except Exception as error:
+            print(f"Skipping the compiled kernels: {error}")
+
+
+try:
+    from Cython.Build import cythonize
+    ext_modules = cythonize([Extension("pyirr._kernels", ["pyirr/_kernels.pyx"])])
+except ImportError:
+    ext_modules = []
+
+
 setup(
     name                    = 'pyirr',
     version                 = '0.84.1.2',
@@ -17,9 +41,13 @@ setup(
     packages                = ['pyirr'],
     package_data            = {"pyirr": ['pyirr/data/*']},
     include_package_data    = True,
+    exclude_package_data    = {"pyirr": ["*.c"]},
     long_description        = read("README.rst"),
     license                 = 'GNU GPLv3',
     keywords                = ['statistics'],
     classifiers             = [],
-    install_requires        = ["numpy", "scipy", "pandas", "statsmodels"]
+    install_requires        = ["numpy", "scipy", "pandas"],
+    extras_require          = {"statsmodels": ["statsmodels"], "dask": ["dask[array]"]},
+    ext_modules             = ext_modules,
+    cmdclass                = {"build_ext": optional_build_ext}
 )
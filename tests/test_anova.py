@@ -0,0 +1,22 @@
+import numpy as np
+
+from pyirr.anova import AnovaAccumulator, two_way_anova
+
+
+def test_two_way_anova(anxiety):
+    ratings = anxiety.values
+    ns, nr = ratings.shape
+    sums = two_way_anova(ratings)
+
+    assert np.isclose(sums.SS_total, np.cov(ratings.ravel()) * (ns * nr - 1))
+    assert np.isclose(sums.MSr, np.cov(np.mean(ratings, axis=1)) * nr)
+    assert np.isclose(sums.MSw, np.sum(np.apply_along_axis(np.cov, axis=1, arr=ratings) / ns))
+    assert np.isclose(sums.MSc, np.cov(np.mean(ratings, axis=0)) * ns)
+
+    single = two_way_anova(ratings, dtype=np.float32)
+    assert np.isclose(single.SSe, sums.SSe, rtol=1e-5)
+
+    streamed = AnovaAccumulator.from_chunks(np.array_split(ratings, 4)).sums()
+    for name in ("SS_total", "SSr", "SSc", "SSw", "SSe"):
+        assert np.isclose(getattr(streamed, name), getattr(sums, name))
+    assert np.allclose(streamed.col_means, sums.col_means)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from pyirr import finn, icc_table, intraclass_correlation, kappa2, kappam_light, meancor, meanrho, robinson
+from pyirr.anova import two_way_anova
+from pyirr.kappa2 import factorize, pairwise_tables
+
+da = pytest.importorskip("dask.array")
+
+
+def test_dask_kernels(anxiety):
+    ratings = anxiety.values.astype(float)
+    lazy = da.from_array(ratings, chunks=(7, 3))
+
+    sums = two_way_anova(lazy)
+    assert isinstance(sums.SSr, da.Array)
+    expected = two_way_anova(ratings)
+    computed = sums.compute()
+    assert np.allclose([computed.SS_total, computed.SSr, computed.SSc], [expected.SS_total, expected.SSr, expected.SSc])
+
+    codes, levels = factorize(lazy)
+    expected_codes, expected_levels = factorize(ratings)
+    assert np.array_equal(levels, expected_levels)
+    assert np.array_equal(pairwise_tables(codes, len(levels)).compute(), pairwise_tables(expected_codes, len(levels)))
+
+
+def test_dask_measures(anxiety, diagnoses):
+    ratings = anxiety.values.astype(float)
+    ratings[3, 1] = np.nan  # incomplete subjects are dropped lazily as well
+    lazy = da.from_array(ratings, chunks=(6, 2))
+
+    for func, kwargs in [(intraclass_correlation, {"model": "twoway", "mtype": "agreement"}),
+                         (finn, {"s_levels": 6, "model": "oneway"}),
+                         (robinson, {}),
+                         (meancor, {}),
+                         (meanrho, {}),
+                         (kappa2, {"weight": "squared"}),
+                         (kappam_light, {})]:
+        data = (ratings, lazy) if func is not kappa2 else (ratings[:, :2], lazy[:, :2])
+        expected, result = func(data[0], **kwargs), func(data[1], **kwargs)
+        assert result.subjects == expected.subjects
+        assert np.isclose(result.value, expected.value)
+
+    assert np.allclose(icc_table(lazy).value, icc_table(ratings).value)
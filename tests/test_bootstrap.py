@@ -0,0 +1,52 @@
+import numpy as np
+
+from pyirr import agree, bootstrap, finn, kappam_fleiss, kappam_light, meancor, robinson
+from pyirr.bootstrap import STATISTICS
+from pyirr.IRR_result import IRR_result
+
+
+def test_bootstrap_statistics(anxiety, diagnoses, video):
+    # weighted sums of the subject statistics give the same resamples as calling the measure on every resample
+    for func, ratings, kwargs in [(kappam_fleiss, diagnoses, {}),
+                                  (kappam_light, diagnoses, {}),
+                                  (meancor, anxiety, {}),
+                                  (robinson, anxiety, {}),
+                                  (finn, video, {"s_levels": 6, "model": "twoway"}),
+                                  (agree, diagnoses, {"numeric": False})]:
+        for ci in ("percentile", "bca"):
+            fast = bootstrap(func, ratings, 200, ci=ci, seed=3, **kwargs)
+            slow = bootstrap(lambda x, **k: func(x, **k), ratings, 200, ci=ci, seed=3, **kwargs)
+
+            assert fast.value == func(ratings, **kwargs).value
+            assert fast.conf_level == 0.95
+            assert np.isclose(fast.lower_bound, slow.lower_bound)
+            assert np.isclose(fast.upper_bound, slow.upper_bound)
+            assert fast.lower_bound < fast.value < fast.upper_bound
+
+
+def test_bootstrap_seed(diagnoses):
+    first = bootstrap(kappam_fleiss, diagnoses, 1000, seed=1, chunk_size=300)
+    second = bootstrap(kappam_fleiss, diagnoses, 1000, seed=1)
+    assert (first.lower_bound, first.upper_bound) == (second.lower_bound, second.upper_bound)
+
+
+def test_bootstrap_wide_statistics(anxiety, monkeypatch):
+    chunks = []
+
+    def mean_rating(ratings):
+        return IRR_result("Mean rating", *np.shape(ratings), "mean", np.mean(np.asarray(ratings)))
+
+    def mean_statistics(ratings):
+        ratings = np.asarray(ratings, dtype=float)
+        stats = np.tile(ratings.mean(axis=1)[:, None], (1, 2**18))  # as wide as the pair tables of a large panel
+
+        def estimator(totals):
+            chunks.append(len(totals))
+            return totals[:, 0] / len(ratings)
+        return stats, estimator
+
+    monkeypatch.setitem(STATISTICS, mean_rating, mean_statistics)  # registered for this test only
+    result = bootstrap(mean_rating, anxiety, 100, seed=1)
+
+    assert max(chunks) == 2**22 // 2**18
+    assert result.lower_bound < result.value < result.upper_bound
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyirr import agree, grouped, intraclass_correlation, kappa2, kappam_fleiss, kendall, kripp_alpha
+
+
+@pytest.fixture
+def batches(anxiety):
+    """anxiety and a copy with one missing rating as two batches of long ratings"""
+    data = anxiety.astype(float)
+    second = data.copy()
+    second.iloc[0, 1] = np.nan
+    frames = [frame.rename_axis("subject").reset_index().melt("subject", var_name="rater").assign(batch=batch)
+              for batch, frame in [("a", data), ("b", second)]]
+    return pd.concat(frames), [data, second]
+
+
+@pytest.mark.parametrize("func, kwargs", [
+    (kappam_fleiss, {}),
+    (agree, {"tolerance": 1}),
+    (kripp_alpha, {"method": "ordinal"}),
+    (intraclass_correlation, {"model": "twoway", "mtype": "agreement"}),
+    (kendall, {}),  # no segmented version, computed group by group
+])
+def test_grouped(batches, func, kwargs):
+    long, frames = batches
+    table = grouped(long, "batch", measure=func, **kwargs)
+
+    assert list(table.index) == ["a", "b"]
+    for (_, row), frame in zip(table.iterrows(), frames):
+        result = func(frame, **kwargs)
+        assert row["value"] == pytest.approx(result.value)
+        assert row["subjects"] == result.subjects
+
+
+def test_grouped_kappa2(anxiety):
+    long = anxiety.rename_axis("subject").reset_index().melt("subject", var_name="rater").assign(site=1)
+    long.loc[long["rater"] != "rater3", "site"] = 2  # site 1 has a single rater, site 2 has two
+
+    table = grouped(long, "site", measure="kappa2", weight="unweighted")
+    assert table.loc[2, "value"] == pytest.approx(kappa2(anxiety[["rater1", "rater2"]], "unweighted").value)
+    assert np.isnan(table.loc[1, "value"]) and table.loc[1, "error"]
+
+    with pytest.raises(ValueError):
+        grouped(pd.concat([long, long]), "site", measure="kappa2", weight="unweighted")  # duplicated ratings
+
+
+def test_grouped_errors(anxiety):
+    long = anxiety.rename_axis("subject").reset_index().melt("subject", var_name="rater").assign(site=1)
+    long.loc[long["rater"] == "rater3", "site"] = 2
+
+    # weighted kappa2 has no segmented version, groups it does not apply to are reported per group
+    table = grouped(long.assign(site=1), "site", measure="kappa2", weight="squared")
+    assert table.loc[1, "error"] == "Number of raters exceeds 2. Try kappam_fleiss or kappam_light"
+
+    with pytest.raises(TypeError):
+        grouped(long, "site", measure="kendall", corect=True)
+    with pytest.raises(AttributeError):  # errors of the measure itself are not hidden either
+        grouped(long, "site", measure=lambda ratings: ratings.missing_attribute)
@@ -1,6 +1,7 @@
 import numpy as np
+import pytest
 
-from pyirr import intraclass_correlation
+from pyirr import ICCAccumulator, icc_table, intraclass_correlation
 
 
 def test_intraclass_correlation(anxiety):
@@ -30,3 +31,62 @@ def test_intraclass_correlation_mtype():
 
     agreement = intraclass_correlation(data, "twoway", "agreement")  # Low agreement
     assert round(agreement.value, 3) == 0.108
+
+
+def test_icc_accumulator(anxiety):
+    first = ICCAccumulator.from_chunks(np.array_split(anxiety.values, 3))
+    second = ICCAccumulator().update(anxiety.values + 1000)  # different shift
+    merged = ICCAccumulator().merge(first).merge(second)
+
+    combined = np.vstack([anxiety.values, anxiety.values + 1000])
+    for model, mtype in (("oneway", "consistency"), ("twoway", "consistency"), ("twoway", "agreement")):
+        for unit in ("single", "average"):
+            icc = intraclass_correlation(anxiety, model, mtype, unit)
+            assert np.isclose(first.result(model, mtype, unit).value, icc.value)
+
+            icc = intraclass_correlation(combined, model, mtype, unit)
+            merged_icc = merged.result(model, mtype, unit)
+            assert merged_icc.subjects == 40
+            assert np.isclose(merged_icc.value, icc.value)
+            assert np.isclose(merged_icc.lower_bound, icc.lower_bound)
+
+
+def test_icc_table(anxiety):
+    table = icc_table(anxiety)
+
+    assert list(table.index) == ["ICC(1)", "ICC(C,1)", "ICC(A,1)", "ICC(3)", "ICC(C,3)", "ICC(A,3)"]
+    for unit in ("single", "average"):
+        icc = intraclass_correlation(anxiety, "twoway", "agreement", unit)
+        assert np.isclose(table.loc[icc.name, "value"], icc.value)
+        assert np.isclose(table.loc[icc.name, "df2"], icc.df2)
+        assert np.isclose(table.loc[icc.name, "upper_bound"], icc.upper_bound)
+
+
+def test_icc_reml(anxiety):
+    # on complete data REML reproduces the ANOVA estimates
+    for model, mtype in (("oneway", "consistency"), ("twoway", "consistency"), ("twoway", "agreement")):
+        for unit in ("single", "average"):
+            icc = intraclass_correlation(anxiety, model, mtype, unit)
+            reml = intraclass_correlation(anxiety, model, mtype, unit, missing="reml")
+            assert reml.name == icc.name
+            assert np.isclose(reml.value, icc.value, atol=1e-5)
+            assert np.isclose(reml.Fvalue, icc.Fvalue)
+
+    # incomplete design, every subject is rated by 3 of 40 raters
+    rng = np.random.default_rng(1)
+    ns, nr = 500, 40
+    subjects = np.repeat(np.arange(ns), 3)
+    raters = np.concatenate([rng.choice(nr, 3, replace=False) for _ in range(ns)])
+    ratings = np.full((ns, nr), np.nan)
+    subject_effect, rater_effect, error = rng.normal(0, 2, ns), rng.normal(0, 1, nr), rng.normal(0, 1, 3 * ns)
+    ratings[subjects, raters] = subject_effect[subjects] + rater_effect[raters] + error
+    variances = [np.var(effect, ddof=1) for effect in (subject_effect, rater_effect, error)]
+
+    reml = intraclass_correlation(ratings, "twoway", "agreement", missing="reml")
+    assert reml.subjects == 500
+    assert reml.df2 == 3 * ns - ns - (nr - 1)
+    assert reml.lower_bound < variances[0] / np.sum(variances) < reml.upper_bound
+    assert reml.pvalue < 0.001
+
+    with pytest.raises(ValueError):
+        intraclass_correlation(ratings, "twoway", missing="reml", r0=0.2)
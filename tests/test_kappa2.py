@@ -1,6 +1,6 @@
 import numpy as np
 
-from pyirr import kappa2
+from pyirr import Kappa2Accumulator, kappa2, kappa_matrix
 
 
 def test_kappa2(anxiety):
@@ -24,3 +24,30 @@ def test_kappa2_categorical(diagnoses):
     assert round(kappa_result.value, 3) == 0.631
     assert round(kappa_result.statistic, 3) == 7.560
     assert round(kappa_result.pvalue, 3) == 0.000
+
+
+def test_kappa_matrix(diagnoses, anxiety):
+    kappas = kappa_matrix(diagnoses)
+
+    assert kappas.shape == (6, 6)
+    assert np.allclose(np.diag(kappas), 1)
+    assert np.allclose(kappas, kappas.T)
+    assert np.isclose(kappas.iloc[1, 2], kappa2(diagnoses.iloc[:, 1:3], "unweighted").value)
+
+    squared = kappa_matrix(anxiety, "squared")
+    assert np.isclose(squared.iloc[0, 1], kappa2(anxiety.iloc[:, :2], "squared").value)
+
+
+def test_kappa2_accumulator(anxiety):
+    expected = kappa2(anxiety.iloc[:, :2], "squared")
+
+    first, second = Kappa2Accumulator("squared"), Kappa2Accumulator("squared")
+    for start in range(0, 10, 4):
+        first.update(anxiety.iloc[start:min(start + 4, 10), :2])
+    second.update(anxiety.iloc[10:, :2].values)
+
+    kappa_result = first.merge(second).result()
+    assert kappa_result.subjects == 20
+    assert np.isclose(kappa_result.value, expected.value)
+    assert np.isclose(kappa_result.statistic, expected.statistic)
+    assert np.isclose(kappa_result.pvalue, expected.pvalue)
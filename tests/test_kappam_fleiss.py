@@ -1,4 +1,10 @@
-from pyirr import kappam_fleiss
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from pyirr import kappam_fleiss, kappam_fleiss_batch
+from pyirr.kappam_fleiss import category_counts
 
 
 def test_kappam_fleiss(diagnoses):
@@ -21,3 +27,53 @@ def test_kappam_fleiss_detail(diagnoses):
     expected = [0.245, 0.245, 0.520, 0.471, 0.566]
 
     assert list(kappam.detail.Kappa) == expected
+
+
+def test_kappam_fleiss_batch(diagnoses):
+    tasks = [diagnoses, diagnoses.iloc[:20], diagnoses.iloc[10:, ::-1]]
+    expected = [kappam_fleiss(task) for task in tasks]
+
+    stacked = np.stack([diagnoses.values, diagnoses.values[:, ::-1]])
+    batch = kappam_fleiss_batch(stacked)
+    assert list(batch.subjects) == [30, 30]
+    assert np.allclose(batch.Kappa, expected[0].value)
+    assert np.allclose(batch.z, expected[0].statistic)
+
+    long = pd.concat([task.reset_index(names="subject").melt(id_vars="subject").assign(task=i)
+                      for i, task in enumerate(tasks)])
+    batch = kappam_fleiss_batch(long)
+    assert list(batch.subjects) == [30, 20, 20]
+    assert np.allclose(batch.Kappa, [result.value for result in expected])
+    assert np.allclose(batch["p.value"], [result.pvalue for result in expected])
+
+
+def test_kappam_fleiss_counts(diagnoses, tmp_path):
+    expected = kappam_fleiss(diagnoses, detail=True)
+    ttab, _, lev = category_counts(diagnoses)
+    np.save(tmp_path / "counts.npy", ttab)
+
+    for counts in (pd.DataFrame(ttab, columns=lev), sparse.csr_matrix(ttab), tmp_path / "counts.npy"):
+        kappam = kappam_fleiss(counts, detail=True, counts=True)
+        assert kappam.subjects == 30
+        assert kappam.raters == 6
+        assert np.isclose(kappam.value, expected.value)
+        assert np.isclose(kappam.statistic, expected.statistic)
+        assert list(kappam.detail.Kappa) == list(expected.detail.Kappa)
+
+    with pytest.raises(ValueError):
+        kappam_fleiss(ttab, exact=True, counts=True)
+
+
+def test_kappam_fleiss_unbalanced():
+    # Fleiss' unbalanced form: 1 - observed / expected disagreement for varying numbers of raters
+    counts = np.array([[3, 0, 1], [0, 2, 0], [1, 1, 3], [0, 0, 2], [2, 1, 0]])
+    ni = counts.sum(axis=1)
+
+    agreeP = np.mean((np.sum(counts**2, axis=1) - ni) / (ni * (ni - 1)))
+    pj = counts.sum(axis=0) / counts.sum()
+    chanceP = np.sum(pj**2)
+
+    kappam = kappam_fleiss(counts, counts=True, detail=True)
+    assert kappam.raters == 5
+    assert np.isclose(kappam.value, (agreeP - chanceP) / (1 - chanceP))
+    assert len(kappam.detail) == 3
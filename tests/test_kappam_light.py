@@ -1,3 +1,5 @@
+import numpy as np
+
 from pyirr import kappam_light
 from pyirr.IRR_result import IRR_result
 
@@ -10,3 +12,12 @@ def test_kappam_light(diagnoses):
     assert round(kappam.value, 3) == 0.459
     assert round(kappam.statistic, 2) == 2.31
     assert round(kappam.pvalue, 4) == 0.0211
+
+
+def test_kappam_light_parallel():
+    ratings = np.random.default_rng(1).integers(0, 4, size=(200, 12))
+    serial = kappam_light(ratings)
+    parallel = kappam_light(ratings, n_jobs=2)
+
+    assert parallel.value == serial.value  # bit for bit
+    assert parallel.statistic == serial.statistic
@@ -1,4 +1,7 @@
-from pyirr import kendall
+import numpy as np
+
+from pyirr import KendallAccumulator, kendall
+from pyirr.kendall import average_ranks
 
 
 def test_kendall(anxiety):
@@ -9,3 +12,35 @@ def test_kendall(anxiety):
     assert round(kendall_result.value, 2) == 0.54
     assert round(kendall_result.statistic, 1) == 30.8
     assert round(kendall_result.pvalue, 4) == 0.0429
+
+
+def test_kendall_ranks(anxiety):
+    ranks, ties = average_ranks(anxiety.values)
+    assert np.array_equal(ranks, anxiety.rank().values)
+    assert np.sum(ties) == anxiety.size
+
+    uncorrected = kendall(anxiety)
+    assert uncorrected.error == "Coefficient may be incorrect due to ties"
+
+    for correct in (False, True):
+        expected = kendall(anxiety, correct)
+        accumulator = KendallAccumulator(correct).update(anxiety.iloc[:, :2])
+        accumulator.merge(KendallAccumulator(correct).update(anxiety.iloc[:, 2:]))
+
+        result = accumulator.result()
+        assert result.raters == 3
+        assert np.isclose(result.value, expected.value)
+        assert np.isclose(result.pvalue, expected.pvalue)
+
+
+def test_kendall_missing(anxiety):
+    ratings = anxiety.astype(float)
+    ratings.iloc[4, 1] = np.nan
+    result = kendall(ratings, True)
+    expected = kendall(ratings.dropna(), True)
+
+    assert result.subjects == 19  # only the complete subjects are counted
+    assert result.stat_name == "Chisq (18)"
+    assert round(result.value, 4) == 0.5775
+    assert result.value == expected.value
+    assert result.statistic == expected.statistic
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+from pyirr import kernels
+from pyirr.kripp_alpha import dense_codes
+
+
+@pytest.fixture
+def numpy_kernels():
+    enabled = kernels.COMPILED["enabled"]
+    kernels.COMPILED["enabled"] = False
+    yield
+    kernels.COMPILED["enabled"] = enabled
+
+
+def kernel_outputs(codes, ratings):
+    units, values, levx, nunits, _, _ = dense_codes(ratings.T)
+    return [kernels.contingency_table(codes[:, 0], codes[:, 1], 4),
+            kernels.pair_tables(codes, slice(0, codes.shape[1]), 4),
+            kernels.pair_tables(codes, slice(2, 5), 4),
+            kernels.coincidence_from_codes(units, values, nunits, len(levx), True),
+            kernels.coincidence_from_codes(units, values, nunits, len(levx), False)]
+
+
+def test_numpy_kernels(numpy_kernels):
+    codes = np.random.default_rng(1).integers(0, 4, size=(100, 6))
+    table, tables, block = kernel_outputs(codes, codes.astype(float))[:3]
+
+    assert np.array_equal(table, tables[0, 1])
+    assert np.array_equal(tables[1, 3], np.histogram2d(codes[:, 1], codes[:, 3], bins=4, range=[[0, 4], [0, 4]])[0])
+    assert np.array_equal(block, tables[2:5, 2:])
+
+
+def test_compiled_kernels(numpy_kernels):
+    if kernels._kernels is None and not os.environ.get("PYIRR_COMPILED"):
+        pytest.skip("the compiled kernels are not built")  # CI sets PYIRR_COMPILED to fail instead
+
+    codes = np.random.default_rng(1).integers(0, 4, size=(100, 6))
+    ratings = codes.astype(float)
+    ratings[::7, 2] = np.nan  # units with fewer values are weighted differently
+    expected = kernel_outputs(codes, ratings)
+
+    kernels.use_compiled()
+    for output, fallback in zip(kernel_outputs(codes, ratings), expected):
+        assert np.allclose(output, fallback)
+
+
+def test_use_compiled(numpy_kernels, monkeypatch):
+    monkeypatch.setattr(kernels, "_kernels", None)
+    with pytest.raises(ImportError):
+        kernels.use_compiled()
+    kernels.use_compiled(False)
+    assert kernels.compiled_kernel("pair_tables") is None
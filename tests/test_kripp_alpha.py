@@ -1,12 +1,19 @@
 import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
 
-from pyirr import kripp_alpha
+from pyirr import kripp_alpha, kripp_alpha_long
+from pyirr.kripp_alpha import (METRICS, bootstrap_alpha, coincidence_matrix, dense_codes, interval_metric,
+                               register_metric, unit_coincidences)
+
+
+NMM = np.array([1, 1, np.NaN, 1, 2, 2, 3, 2, 3, 3, 3, 3, 3, 3, 3, 3, 2, 2, 2, 2, 1, 2, 3, 4, 4, 4, 4, 4,
+               1, 1, 2, 1, 2, 2, 2, 2, np.NaN, 5, 5, 5, np.NaN, np.NaN, 1, 1, np.NaN, np.NaN, 3, np.NaN])
 
 
 def test_kripp_alpha():
-    nmm = np.array([1, 1, np.NaN, 1, 2, 2, 3, 2, 3, 3, 3, 3, 3, 3, 3, 3, 2, 2, 2, 2, 1, 2, 3, 4, 4, 4, 4, 4,
-                    1, 1, 2, 1, 2, 2, 2, 2, np.NaN, 5, 5, 5, np.NaN, np.NaN, 1, 1, np.NaN, np.NaN, 3, np.NaN])
-    nmm = nmm.reshape((-1, 4))
+    nmm = NMM.reshape((-1, 4))
 
     kripp_nominal = kripp_alpha(nmm, method="nominal")
     assert kripp_nominal.subjects == 12
@@ -21,3 +28,157 @@ def test_kripp_alpha():
 
     kripp_ratio = kripp_alpha(nmm, method="ratio")
     assert round(kripp_ratio.value, 3) == 0.797
+
+
+def reference_coincidence_matrix(array):
+    # original loop implementation from irr, kept to check the vectorized engine
+    levx = np.unique(array)
+    levx = levx[~np.isnan(levx)]
+    nval = len(levx)
+    cm = np.zeros((nval, nval))
+    dimx = array.shape
+
+    if np.any(np.isnan(array)):
+        mc = np.sum(~np.isnan(array), axis=0) - 1
+    else:
+        mc = np.ones(dimx[1])
+
+    for col in range(dimx[1]):
+        for i1 in range(dimx[0] - 1):
+            for i2 in range(i1 + 1, dimx[0]):
+                if not np.isnan(array[i1, col]) and not np.isnan(array[i2, col]):
+                    index1 = np.nonzero(levx == array[i1, col])
+                    index2 = np.nonzero(levx == array[i2, col])
+                    cm[index1, index2] += (1 + (index1 == index2)) / mc[col]
+                    if index1 != index2:
+                        cm[index2, index1] = cm[index1, index2]
+    return cm, np.sum(cm), levx
+
+
+def test_coincidence_matrix():
+    rng = np.random.default_rng(42)
+    ratings = rng.integers(1, 6, size=(5, 40)).astype(float)
+
+    for array in (ratings, np.where(rng.random(ratings.shape) < 0.3, np.nan, ratings)):
+        cm, nmv, levx = coincidence_matrix(array)
+        ref_cm, ref_nmv, ref_levx = reference_coincidence_matrix(array)
+
+        np.testing.assert_allclose(cm, ref_cm)
+        assert np.isclose(nmv, ref_nmv)
+        np.testing.assert_array_equal(levx, ref_levx)
+
+
+def test_kripp_alpha_metrics():
+    nmm = NMM.reshape((-1, 4))
+    cm, nmv, levx = coincidence_matrix(nmm.T)
+    nc = np.sum(cm, axis=1)
+
+    def loop_alpha(delta):
+        observed, expected = 0, 0
+        for c in range(len(levx)):
+            for k in range(len(levx)):
+                observed += cm[c, k] * delta(levx[c], levx[k])
+                expected += nc[c] * nc[k] * delta(levx[c], levx[k])
+        return 1 - (nmv - 1) * observed / expected
+
+    circular = loop_alpha(lambda c, k: np.sin(np.pi * (c - k) / 5)**2)
+    assert np.isclose(kripp_alpha(nmm, method="circular").value, circular)
+
+    bipolar = loop_alpha(lambda c, k: 0 if c == k else (c - k)**2 / ((c + k - 2) * (10 - c - k)))
+    assert np.isclose(kripp_alpha(nmm, method="bipolar").value, bipolar)
+
+
+def test_kripp_alpha_custom_metric():
+    nmm = NMM.reshape((-1, 4))
+
+    def squared(values, marginals):
+        return np.subtract.outer(values, values)**2
+
+    register_metric("squared", squared)
+    assert kripp_alpha(nmm, method="squared").value == kripp_alpha(nmm, method="interval").value
+    assert kripp_alpha(nmm, method=squared).method == "Krippendorff's alpha (squared)"
+    METRICS.pop("squared")
+
+    with pytest.raises(ValueError):
+        kripp_alpha(nmm, method="unknown")
+
+
+def test_kripp_alpha_long():
+    nmm = NMM.reshape((-1, 4))
+    units, coders = np.nonzero(~np.isnan(nmm))
+    values = nmm[units, coders]
+    long = pd.DataFrame({"unit": units, "coder": coders, "value": values})
+    coo = sparse.coo_matrix((values, (units, coders)), shape=nmm.shape)
+
+    for method in ("nominal", "ordinal", "interval", "ratio"):
+        expected = kripp_alpha(nmm, method=method)
+
+        for ratings in ((units, coders, values), long, coo.tocsr()):
+            kripp_long = kripp_alpha_long(ratings, method=method)
+            assert kripp_long.subjects == 12
+            assert kripp_long.raters == 4
+            assert np.isclose(kripp_long.value, expected.value)
+
+
+def test_kripp_alpha_bootstrap():
+    nmm = NMM.reshape((-1, 4))
+    units, codes, levx, nunits, _, normalise = dense_codes(nmm.T)
+
+    contributions = unit_coincidences(units, codes, nunits, len(levx), normalise)
+    cm, _, _ = coincidence_matrix(nmm.T)
+    np.testing.assert_allclose(np.asarray(contributions.sum(axis=0)).reshape(cm.shape), cm)
+
+    serial = bootstrap_alpha(units, codes, levx, nunits, normalise, interval_metric, 500, seed=1, chunk_size=100)
+    parallel = bootstrap_alpha(units, codes, levx, nunits, normalise, interval_metric, 500, seed=1, n_jobs=2,
+                               chunk_size=100)
+    np.testing.assert_array_equal(serial, parallel)
+
+    kripp = kripp_alpha(nmm, method="interval", n_boot=1000, seed=1)
+    assert kripp.lower_bound < kripp.value < kripp.upper_bound
+    assert kripp.conf_level == 0.95
+    assert 0 <= kripp.detail["q"] <= 1
+
+
+def test_kripp_alpha_custom_metric_bootstrap():
+    nmm = NMM.reshape((-1, 4))
+
+    def midpoints(values, marginals):
+        # uses the marginals, which are stacked over the replicates in the bootstrap
+        cumulative = np.cumsum(marginals, axis=-1) - np.asarray(marginals) / 2
+        return (cumulative[..., :, None] - cumulative[..., None, :])**2
+
+    register_metric("midpoints", midpoints)
+    custom = kripp_alpha(nmm, method="midpoints", n_boot=300, seed=1)
+    ordinal = kripp_alpha(nmm, method="ordinal", n_boot=300, seed=1)
+    METRICS.pop("midpoints")
+
+    assert custom.value == pytest.approx(ordinal.value)
+    assert (custom.lower_bound, custom.upper_bound) == pytest.approx((ordinal.lower_bound, ordinal.upper_bound))
+
+
+def test_kripp_alpha_bootstrap_undefined():
+    # resamples of only the first two units have a single value and no alpha
+    ratings = np.array([[1, 1], [1, 1], [1, 2], [2, 1], [2, 2]], dtype=float)
+    units, codes, levx, nunits, _, normalise = dense_codes(ratings.T)
+    alphas = bootstrap_alpha(units, codes, levx, nunits, normalise, interval_metric, 2000, seed=4)
+    assert np.isnan(alphas).any()
+
+    kripp = kripp_alpha(ratings, method="interval", n_boot=2000, seed=4)
+    assert kripp.detail["q"] == np.mean(alphas[~np.isnan(alphas)] < 0.667)
+
+
+def test_kripp_alpha_bootstrap_local_metric():
+    nmm = NMM.reshape((-1, 4))
+    expected = kripp_alpha(nmm, method="interval", n_boot=200, seed=1)
+
+    register_metric("local", lambda values, marginals: np.subtract.outer(values, values)**2)
+    try:
+        for n_jobs in (1, 2):  # registered lambdas are looked up by name in the workers
+            result = kripp_alpha(nmm, method="local", n_boot=200, seed=1, n_jobs=n_jobs)
+            assert (result.lower_bound, result.upper_bound) == pytest.approx((expected.lower_bound,
+                                                                              expected.upper_bound))
+    finally:
+        METRICS.pop("local")
+
+    with pytest.raises(ValueError, match="n_jobs=1"):
+        kripp_alpha(nmm, method=lambda values, marginals: np.subtract.outer(values, values)**2, n_boot=200, n_jobs=2)
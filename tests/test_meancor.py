@@ -1,3 +1,6 @@
+import numpy as np
+from scipy.stats import pearsonr
+
 from pyirr import meancor
 
 
@@ -9,3 +12,19 @@ def test_meancor(anxiety):
     assert round(cor.value, 3) == 0.224
     assert round(cor.statistic, 3) == 0.922
     assert round(cor.pvalue, 3) == 0.357
+
+
+def test_meancor_detail(anxiety):
+    cor = meancor(anxiety)
+
+    assert list(cor.detail.columns) == list(anxiety.columns)
+    assert np.isclose(cor.detail.iloc[0, 2], pearsonr(anxiety.iloc[:, 0], anxiety.iloc[:, 2])[0])
+
+
+def test_meancor_parallel():
+    ratings = np.random.default_rng(1).normal(size=(50, 150))  # more raters than one block of cross products
+    serial = meancor(ratings)
+    parallel = meancor(ratings, n_jobs=2)
+
+    assert parallel.value == serial.value
+    assert np.array_equal(parallel.detail, serial.detail, equal_nan=True)
@@ -1,3 +1,6 @@
+import numpy as np
+from scipy.stats import spearmanr
+
 from pyirr import meanrho
 
 
@@ -10,3 +13,10 @@ def test_meanrho(anxiety):
     assert round(rho.statistic, 2) == 1.29
     assert round(rho.pvalue, 3) == 0.196
     assert rho.error is not None
+
+
+def test_meanrho_detail(anxiety):
+    rho = meanrho(anxiety)
+
+    assert rho.detail.shape == (3, 3)
+    assert np.isclose(rho.detail.iloc[1, 2], spearmanr(anxiety.iloc[:, 1], anxiety.iloc[:, 2])[0])
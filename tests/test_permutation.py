@@ -0,0 +1,37 @@
+import numpy as np
+
+from pyirr import intraclass_correlation, kappa2, kappam_fleiss, kendall, permutation_test
+
+
+def test_permutation_kernels(anxiety, diagnoses):
+    # vectorized kernels give the same permutation distribution as calling the measure for every permutation
+    # (the test statistics increase with the coefficients when shuffling within raters)
+    for func, ratings, statistic, kwargs in [(kendall, anxiety, "statistic", {"correct": True}),
+                                             (kappa2, diagnoses.iloc[:, :2], "statistic", {"weight": "unweighted"}),
+                                             (kappam_fleiss, diagnoses, "statistic", {}),
+                                             (intraclass_correlation, anxiety, "Fvalue",
+                                              {"model": "twoway", "mtype": "agreement"})]:
+        fast = permutation_test(func, ratings, n_perm=99, seed=1, **kwargs)
+        slow = permutation_test(func, ratings, n_perm=99, seed=1, statistic=statistic, **kwargs)
+        assert fast.n_perm == slow.n_perm == 99
+        assert np.isclose(fast.value, func(ratings, **kwargs).value)
+        assert fast.pvalue == slow.pvalue
+
+
+def test_permutation_exact(anxiety):
+    result = permutation_test(kendall, anxiety.iloc[:4])
+    assert result.exact
+    assert result.n_perm == 24**2
+
+    ratings = np.array([[1, 1], [2, 2], [3, 3], [4, 4]])
+    assert permutation_test(kendall, ratings).pvalue == 1 / 24
+    assert permutation_test(kappa2, ratings, weight="unweighted").pvalue == 1 / 24
+
+
+def test_permutation_early_stop(anxiety):
+    result = permutation_test(kendall, anxiety, n_perm=100000, tol=0.01, batch_size=100, seed=2)
+    assert result.n_perm < 100000
+    assert result.mc_error < 0.01
+
+    jobs = permutation_test(kendall, anxiety, n_perm=100000, tol=0.01, batch_size=100, seed=2, n_jobs=2)
+    assert (jobs.n_perm, jobs.pvalue) == (result.n_perm, result.pvalue)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyirr import (agree, bhapkar, iota, kappa2, kappa_matrix, kappam_fleiss, kappam_light, kripp_alpha, rater_bias,
+                   stuart_maxwell_mh)
+from pyirr.kappa2 import factorize
+from pyirr.ratings import Ratings
+
+
+def test_ratings_zero_copy(anxiety):
+    values = anxiety.values.astype(float)
+    assert np.shares_memory(Ratings(values).values, values)
+    assert np.shares_memory(Ratings(memoryview(values)).values, values)
+    assert np.shares_memory(Ratings(anxiety).values, anxiety.values)
+    assert list(Ratings(anxiety).columns) == list(anxiety.columns)
+
+    ratings = Ratings(values)
+    assert ratings.dropna() is ratings.values  # nothing is missing
+
+
+def test_ratings_codes(diagnoses):
+    data = diagnoses.copy()
+    data.iloc[0, 1] = np.nan
+    data.iloc[1, :] = "Other"  # only used by an incomplete subject
+    data.iloc[1, 2] = np.nan
+
+    ratings = Ratings(data)
+    assert ratings.factorize() is ratings.factorize()
+    assert ratings.complete.sum() == len(data) - 2
+
+    codes, levels = ratings.complete_codes()
+    expected_codes, expected_levels = factorize(data.dropna())
+    assert np.array_equal(codes, expected_codes)
+    assert np.array_equal(levels, expected_levels)
+
+    for func in (kappam_fleiss, kappam_light):
+        assert np.isclose(func(ratings).value, func(data).value)
+    assert np.isclose(kappa2(Ratings(data.iloc[:, :2]), "squared").value, kappa2(data.iloc[:, :2], "squared").value)
+    assert agree(ratings, numeric=False).value == agree(data.dropna().values, numeric=False).value
+
+
+def test_ratings_iota_inputs(anxiety):
+    ratings = [anxiety.copy(), anxiety.copy()]
+    iota(ratings, standardize=True)
+    pd.testing.assert_frame_equal(ratings[0], anxiety)
+
+
+def test_ratings_cache(anxiety, diagnoses, vision):
+    ratings = Ratings(diagnoses)
+    first = kappam_light(ratings)
+    tables = ratings.cached("pairwise_tables", None)
+    assert kappa_matrix(ratings).shape == (6, 6)
+    assert ratings.cached("pairwise_tables", None) is tables
+
+    alpha = kripp_alpha(Ratings(anxiety), "ordinal")
+    assert np.isclose(alpha.value, kripp_alpha(anxiety, "ordinal").value)
+
+    pairs = Ratings(vision)
+    for func in (bhapkar, stuart_maxwell_mh, rater_bias):
+        assert np.isclose(func(pairs).value, func(vision).value)
+
+    # item assignment invalidates the cached intermediates
+    ratings[:, 1] = ratings.values[:, 0]
+    changed = diagnoses.copy()
+    changed.iloc[:, 1] = changed.iloc[:, 0]
+    assert kappam_light(ratings).value != first.value
+    assert np.isclose(kappam_light(ratings).value, kappam_light(changed).value)
+    assert np.isclose(kappam_fleiss(ratings).value, kappam_fleiss(changed).value)
+
+    with pytest.raises(ValueError):
+        ratings.values[0, 0] = "Other"  # values are read-only so the cache cannot go stale
+
+
+def test_ratings_copy_on_write(anxiety):
+    array, frame = anxiety.values.copy(), anxiety.copy()
+    for data in (array, frame):
+        ratings = Ratings(data)
+        assert np.shares_memory(ratings.values, np.asarray(data))
+
+        ratings[0, 0] = 99
+        ratings[1, 0] = 98  # later writes go to the same copy
+        assert ratings.values[0, 0] == 99 and ratings.values[1, 0] == 98
+        assert not np.shares_memory(ratings.values, np.asarray(data))
+    assert np.array_equal(array, anxiety.values)
+    assert frame.equals(anxiety)
@@ -1,4 +1,8 @@
+import numpy as np
+import pytest
+
 from pyirr import rel_inter_intra
+from pyirr.rel_inter_intra import mean_squares, mean_squares_statsmodels
 
 
 def test_rel_inter_intra(gonio):
@@ -16,3 +20,36 @@ def test_rel_inter_intra(gonio):
     assert reliability.subjects == 29
     assert reliability.raters == 2
     assert reliability.detail == expected
+
+
+def test_rel_inter_intra_mean_squares(gonio):
+    pytest.importorskip("statsmodels")
+
+    closed_form = mean_squares(gonio.values, nraters=2)
+    ols_fits = mean_squares_statsmodels(gonio.values, nraters=2)
+
+    for expected, value in zip(ols_fits, closed_form):
+        assert np.allclose(value, expected)
+
+
+def test_rel_inter_intra_mean_squares_parallel(gonio):
+    pytest.importorskip("statsmodels")
+
+    serial = mean_squares_statsmodels(gonio.values, nraters=2)
+    parallel = mean_squares_statsmodels(gonio.values, nraters=2, n_jobs=2)
+
+    for expected, value in zip(serial, parallel):
+        assert np.array_equal(value, expected)
+
+
+def test_rel_inter_intra_missing(gonio):
+    pytest.importorskip("statsmodels")
+
+    ratings = gonio.values.astype(float)
+    ratings[3, 1] = np.nan
+    closed_form = rel_inter_intra(ratings, nraters=2)
+    ols_fits = rel_inter_intra(ratings, nraters=2, engine="statsmodels")
+
+    assert "nan" not in closed_form.detail
+    assert closed_form.detail == ols_fits.detail
+    assert closed_form.detail != rel_inter_intra(gonio, nraters=2).detail
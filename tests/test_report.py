@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from pyirr import (agree, intraclass_correlation, kappam_fleiss, kappam_light, kendall, kripp_alpha, meancor, meanrho,
+                   report)
+from pyirr.ratings import Ratings
+
+
+def test_report(anxiety):
+    ratings = Ratings(anxiety)
+    table = report(ratings, options={"kripp_alpha": {"method": "interval"}, "agree": {"tolerance": 1}})
+
+    expected = [agree(anxiety, tolerance=1), kappam_fleiss(anxiety), kappam_light(anxiety),
+                kripp_alpha(anxiety, method="interval"), intraclass_correlation(anxiety), kendall(anxiety),
+                meancor(anxiety), meanrho(anxiety)]
+    assert list(table["measure"]) == ["agree", "kappam_fleiss", "kappam_light", "kripp_alpha",
+                                      "intraclass_correlation", "kendall", "meancor", "meanrho"]
+    np.testing.assert_allclose(table["value"], [result.value for result in expected])
+    assert table.loc[4, "statistic"] == pytest.approx(expected[4].Fvalue)
+    assert (table["seconds"] >= 0).all()
+
+    for name in ("category_counts", "pairwise_tables", "anova", "ranks", "correlation_pearson", "correlation_spearman"):
+        assert name in ratings._cache  # intermediates are shared with later calls
+
+
+def test_report_errors(diagnoses):
+    table = report(diagnoses, measures=["kappam_fleiss", "meancor", kappam_light], n_threads=1)
+    assert table["error"].isna().tolist() == [True, False, True]
+    assert np.isnan(table.loc[1, "value"])
+    assert table.loc[2, "measure"] == "kappam_light"
+
+    with pytest.raises(ValueError):
+        report(diagnoses, measures=["fleiss"])
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyirr import CoincidenceWindow, ContingencyWindow, kappa2, kripp_alpha, rater_bias, rolling
+
+
+@pytest.fixture
+def stream():
+    rng = np.random.default_rng(7)
+    first = rng.integers(1, 6, 200).astype(float)
+    second = np.where(rng.random(200) < 0.6, first, rng.integers(1, 6, 200))
+    second[rng.random(200) < 0.05] = np.nan
+    return np.column_stack([first, second])
+
+
+@pytest.mark.parametrize("measure, kwargs", [
+    (kappa2, {"weight": "unweighted"}),
+    (kappa2, {"weight": "squared"}),
+    (rater_bias, {}),
+    (kripp_alpha, {"method": "ordinal"}),
+    (kripp_alpha, {"method": "circular"}),
+])
+def test_rolling(stream, measure, kwargs):
+    table = rolling(stream, 40, measure, step=7, **kwargs)
+
+    ends = range(40, len(stream) + 1, 7)
+    assert list(table.index) == [end - 1 for end in ends]
+    expected = [measure(stream[end - 40:end], **kwargs).value for end in ends]
+    np.testing.assert_allclose(table["value"], expected)
+
+
+def test_rolling_times(stream):
+    times = pd.date_range("2024-01-01", periods=len(stream), freq="17min")
+    table = rolling(stream, "2h", "kappa2", times=times, weight="unweighted")
+
+    last = times[99]
+    window = stream[(times > last - pd.Timedelta("2h")) & (times <= last)]
+    assert table.loc[last, "value"] == pytest.approx(kappa2(window, "unweighted").value)
+
+
+def test_windows(stream):
+    contingency, coincidence = ContingencyWindow("equal"), CoincidenceWindow("interval")
+    for t in range(len(stream)):
+        contingency.add(stream[t:t + 1])
+        coincidence.add(stream[t:t + 1])
+        if t >= 30:
+            contingency.remove(stream[t - 30:t - 29])
+            coincidence.remove(stream[t - 30:t - 29])
+
+    window = stream[-30:]
+    assert contingency.result().value == pytest.approx(kappa2(window, "equal").value)
+    assert contingency.result("rater_bias").value == pytest.approx(rater_bias(window).value)
+    assert coincidence.result().value == pytest.approx(kripp_alpha(window, "interval").value)
+
+    with pytest.raises(ValueError):
+        ContingencyWindow().add(stream[:5]).remove(stream[5:10])
+
+
+def test_rolling_many_levels():
+    rng = np.random.default_rng(3)
+    first = rng.integers(0, 40, 500).astype(float)
+    ratings = np.column_stack([first, np.where(rng.random(500) < 0.5, first, rng.integers(0, 40, 500))])
+    ratings[rng.random(500) < 0.03, 1] = np.nan
+    kappas = rolling(ratings, 60, "kappa2", step=9, weight="unweighted")["value"]
+    alphas = rolling(ratings, 60, "kripp_alpha", step=9, method="interval")["value"]
+
+    contingency, coincidence = ContingencyWindow(), CoincidenceWindow("interval")
+    start = end = 0
+    for k, stop in enumerate(range(60, len(ratings) + 1, 9)):
+        for accumulator in (contingency, coincidence):
+            accumulator.add(ratings[end:stop]).remove(ratings[start:stop - 60])
+        start, end = stop - 60, stop
+        assert kappas.iloc[k] == pytest.approx(contingency.result().value)
+        assert alphas.iloc[k] == pytest.approx(coincidence.result().value)
+
+
+def test_rolling_arguments(stream):
+    table = rolling(stream, 40)  # kappa2 without weights by default
+    np.testing.assert_allclose(table["value"].iloc[0], kappa2(stream[:40], "unweighted").value)
+
+    with pytest.raises(TypeError):
+        rolling(stream, 40, weigth="squared")
+    with pytest.raises(TypeError):
+        rolling(stream, 40, "stuart_maxwell_mh", weight="squared")
+
+    # windows in which every rater uses a single level have no test, the error is reported per window
+    constant = np.ones((60, 2))
+    constant[50:, 1] = 2
+    table = rolling(constant, 20, "stuart_maxwell_mh", step=10)
+    assert table["error"].iloc[0] == "Too many equal marginals, cannot compute"
@@ -1,3 +1,5 @@
+import numpy as np
+
 from pyirr import stuart_maxwell_mh
 
 
@@ -9,3 +11,13 @@ def test_stuart_maxwell_mh(vision):
     assert mh.raters == 2
     assert round(mh.value) == 12
     assert round(mh.pvalue, 5) == 0.00753
+
+
+def test_stuart_maxwell_mh_equal_marginals():
+    # the third category has equal marginals and is dropped from the table
+    ratings = np.repeat([[1, 1], [2, 2], [2, 3], [3, 2], [3, 3], [1, 2], [2, 1], [3, 1]], [10, 5, 4, 1, 6, 2, 2, 3],
+                        axis=0)
+    mh = stuart_maxwell_mh(ratings)
+
+    assert mh.stat_name == "Chisq(1)"
+    assert mh.value == 0